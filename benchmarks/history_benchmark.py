@@ -0,0 +1,80 @@
+"""Time price trend queries on a year of daily runs in the price history.
+
+Run from the repository root::
+
+    python benchmarks/history_benchmark.py [days] [terms]
+
+A temporary history is filled with one run per day for ``days`` days (365 by
+default), each holding a few products per website for ``terms`` search terms
+(200 by default). The seconds taken to ingest the runs and the milliseconds a
+30-day and a full-range ``trend`` query take are printed.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_history import PriceHistory
+from prices import combine_prices, with_price_dtypes
+from scraper import DELIVERY_PINCODE, WEBSITES, store_pincode
+
+PRODUCTS_PER_SITE = 3
+
+
+def daily_prices(day, terms, rng):
+    """Return a run's typed prices for every term and website, scraped on `day`."""
+    rows = len(terms) * len(WEBSITES) * PRODUCTS_PER_SITE
+    # DMart and JioMart are priced for a delivery pincode, the other websites are not
+    pincodes = [store_pincode(website, DELIVERY_PINCODE) for website in WEBSITES]
+    frame = pd.DataFrame({
+        'Search Term': np.repeat(terms, len(WEBSITES) * PRODUCTS_PER_SITE),
+        'Source': np.tile(np.repeat(WEBSITES, PRODUCTS_PER_SITE), len(terms)),
+        'Pincode': np.tile(np.repeat(pincodes, PRODUCTS_PER_SITE), len(terms)),
+        'Product': [f"Product {index % PRODUCTS_PER_SITE}" for index in range(rows)],
+        'Pack': '1 kg',
+        'Pack Qty': 1.0,
+        'Pack Unit': 'kg',
+        'Price': rng.uniform(20, 120, rows).round(),
+        'MRP': np.nan,
+        'Offer': None,
+        'Scraped At': day.strftime('%Y-%m-%dT09:00:00'),
+    })
+    frame['Price per kg'] = frame['Price']
+    return combine_prices([with_price_dtypes(frame)])
+
+
+def timed_ms(query, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = query()
+    return (time.perf_counter() - start) / repeat * 1000, len(result)
+
+
+def main(days=365, term_count=200):
+    rng = np.random.default_rng(0)
+    terms = [f"vegetable {index}" for index in range(term_count)]
+    today = pd.Timestamp.now().normalize()
+    with tempfile.TemporaryDirectory() as folder:
+        history = PriceHistory(os.path.join(folder, 'prices.sqlite3'))
+        seconds = 0.0
+        rows = 0
+        for offset in range(days):
+            prices = daily_prices(today - pd.Timedelta(days=days - 1 - offset), terms, rng)
+            start = time.perf_counter()
+            rows += history.ingest(f"run-{offset}", prices)
+            seconds += time.perf_counter() - start
+        print(f"Ingested {days} runs, {rows} rows in {seconds:.2f} s")
+
+        for window in (30, days):
+            ms, result_rows = timed_ms(lambda: history.trend(terms[term_count // 2], window))
+            print(f"Trend over {window} days: {ms:.2f} ms ({result_rows} rows)")
+        history.close()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,74 @@
+"""Time matching product titles to Master_List terms.
+
+Run from the repository root::
+
+    python benchmarks/matching_benchmark.py [products] [terms]
+
+Synthetic titles in the websites' styles ("Fresho Tomato - Hybrid, 1 kg",
+"Tamatar Desi 500 g") are matched against a list of terms (1,000 by default)
+built from the vegetables in ``SYNONYMS`` and common varieties. The seconds
+taken to build the index and to match ``products`` titles (50,000 by default)
+are printed, along with how many titles found their vegetable.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from product_matching import SYNONYMS, MatchIndex
+
+VARIETIES = ['', 'Hybrid', 'Local', 'Desi', 'Organic', 'Red', 'Green', 'Baby', 'Cherry', 'English', 'Ooty', 'Nashik']
+
+BRANDS = ['Fresho', 'DMart Fresh', 'Hyperpure', 'Farm Fresh', '']
+
+PACKS = ['1 kg', '500 g', '250 g', '2 x 1 kg', '1 pc', '5 kg']
+
+
+def master_terms(count):
+    """Return `count` distinct terms: vegetables and their varieties, numbered once the list runs out."""
+    names = [f"{variety} {vegetable.title()}".strip() for vegetable in SYNONYMS for variety in VARIETIES]
+    return [name if index < len(names) else f"{name} {index // len(names)}"
+            for index, name in enumerate(names * (count // len(names) + 1))][:count]
+
+
+def product_titles(count, rng):
+    """Return `count` titles and the term each one was made from."""
+    vegetables = list(SYNONYMS)
+    picks = rng.integers(len(vegetables), size=count)
+    titles, expected = [], []
+    for index, pick in enumerate(picks):
+        vegetable = vegetables[pick]
+        variety = VARIETIES[index % len(VARIETIES)]
+        # Every third title uses the vegetable's other name
+        name = SYNONYMS[vegetable][0].title() if index % 3 == 0 else vegetable.title()
+        titles.append(f"{BRANDS[index % len(BRANDS)]} {name} - {variety}, {PACKS[index % len(PACKS)]}".strip())
+        expected.append(f"{variety} {vegetable.title()}".strip())
+    return pd.Series(titles, dtype='string'), expected
+
+
+def main(products=50000, terms=1000):
+    rng = np.random.default_rng(0)
+    term_list = master_terms(terms)
+    titles, expected = product_titles(products, rng)
+
+    start = time.perf_counter()
+    index = MatchIndex(term_list)
+    built = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = index.match(titles)
+    matched = time.perf_counter() - start
+
+    correct = (matches['Vegetable'].astype(object) == pd.Series(expected)).sum()
+    print(f"Index of {len(index.terms)} terms built in {built:.3f} s")
+    print(f"Matched {len(titles)} titles ({titles.nunique()} distinct) in {matched:.3f} s")
+    print(f"{correct} of {len(titles)} titles matched the term they were made from "
+          f"(mean score {matches['Match Score'].mean():.2f})")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
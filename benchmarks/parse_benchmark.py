@@ -0,0 +1,59 @@
+"""Time the one-pass page parsers against the saved result pages.
+
+Run from the repository root::
+
+    python benchmarks/parse_benchmark.py [repeats]
+
+Each parser is timed on ``fixtures/pages/<website>/tomato.html`` with lxml and
+with Python's built-in html.parser, and the average milliseconds per term is
+printed for both.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsers
+from fixture_server import FIXTURES_FOLDER
+
+PAGE_PARSERS = {
+    'Agmarknet': lambda html: parsers.parse_agmarknet_details(html),
+    'BigBasket': lambda html: (parsers.parse_bigbasket_cards(html), parsers.parse_bigbasket_dropdown(html)),
+    'DMart': lambda html: (parsers.parse_dmart_card(html), parsers.parse_dmart_dropdown(html)),
+    'Hyperpure': lambda html: parsers.parse_hyperpure(html, 'tomato'),
+    'JioMart': lambda html: parsers.parse_jiomart_card(html, 'tomato'),
+}
+
+
+def time_parser(parse, html, repeats):
+    """Return the average milliseconds one call of `parse` takes on `html`."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        parse(html)
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def main(repeats=200):
+    backends = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        backends.insert(0, 'lxml')
+    except ImportError:
+        print("lxml is not installed, timing html.parser only")
+
+    print(f"{'Website':<12}" + ''.join(f"{backend + ' ms/term':>22}" for backend in backends))
+    for website, parse in PAGE_PARSERS.items():
+        page_path = os.path.join(FIXTURES_FOLDER, 'pages', website.lower(), 'tomato.html')
+        with open(page_path, encoding='utf-8') as f:
+            html = f.read()
+
+        timings = []
+        for backend in backends:
+            parsers.HTML_PARSER = backend
+            timings.append(time_parser(parse, html, repeats))
+        print(f"{website:<12}" + ''.join(f"{timing:>22.3f}" for timing in timings))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,65 @@
+"""Time the typed price normalization on a large batch of scraped rows.
+
+Run from the repository root::
+
+    python benchmarks/price_benchmark.py [rows]
+
+The rows scraped from the saved result pages are repeated until each website
+has ``rows`` of them (50,000 by default), and the seconds ``normalize_prices``
+takes are printed per website.
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsers
+from fixture_server import FIXTURES_FOLDER
+from prices import normalize_prices
+
+
+def read_page(website, term='tomato'):
+    with open(os.path.join(FIXTURES_FOLDER, 'pages', website.lower(), f'{term}.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+def sample_rows():
+    """Return a few rows per website shaped like the ones the scrapers store."""
+    dmart_html = read_page('DMart')
+    dmart = parsers.parse_dmart_card(dmart_html)
+    bigbasket_html = read_page('BigBasket')
+    agmarknet = parsers.parse_agmarknet_commodities(read_page('Agmarknet'))
+    return {
+        'Agmarknet': [{'Search Term': 'tomato', 'Agmarknet_Commodity': commodity, 'Agmarknet_Variety': variety,
+                       'Agmarknet_MAX': max_price, 'Agmarknet_MIN': min_price, 'Agmarknet_Modal': modal_price}
+                      for commodity, details in agmarknet.items() if details
+                      for variety, max_price, min_price, modal_price in details],
+        'BigBasket': [{'Search Term': 'tomato', 'BigBasket_Title': card['title'], 'BigBasket_Price': card['price'],
+                       'BigBasket_Original_Price': card['original_price'], 'BigBasket_Discount': card['discount'],
+                       'BigBasket_Pack_Size': (card['pack_sizes'] or ['N/A'])[0],
+                       'BigBasket_Dropdown_Prices': parsers.parse_bigbasket_dropdown(bigbasket_html)}
+                      for card in parsers.parse_bigbasket_cards(bigbasket_html)],
+        'DMart': [{'Search Term': 'tomato', 'DMart_Title': dmart['title'], 'DMart_MRP': dmart['mrp'],
+                   'DMart_Price': dmart['price'], 'DMart_Offer': dmart['offer'],
+                   'DMart_Dropdown_Options': ', '.join(parsers.parse_dmart_dropdown(dmart_html))}],
+        'Hyperpure': parsers.parse_hyperpure(read_page('Hyperpure'), 'tomato'),
+        'JioMart': [parsers.parse_jiomart_card(read_page('JioMart'), 'tomato')],
+    }
+
+
+def main(rows=50000):
+    print(f"{'Website':<12}{'Rows':>10}{'Typed Rows':>12}{'Seconds':>10}")
+    for website, sample in sample_rows().items():
+        # Vary the terms and titles so the batch is not one repeated value
+        frame = pd.DataFrame(sample * (rows // len(sample) + 1)).head(rows)
+        frame['Search Term'] = frame['Search Term'] + (frame.index % 1000).astype(str)
+        start = time.perf_counter()
+        typed = normalize_prices(website, frame)
+        print(f"{website:<12}{len(frame):>10}{len(typed):>12}{time.perf_counter() - start:>10.3f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,305 @@
+"""Replay the saved website pages through the real scrapers in headless Chromium.
+
+Run from the repository root::
+
+    python benchmarks/scrape_benchmark.py [--websites DMart JioMart] [--repeat 3] [--json results.json]
+    python benchmarks/scrape_benchmark.py --compare
+    python benchmarks/scrape_benchmark.py --engine cdp
+    python benchmarks/scrape_benchmark.py --engine both --parallel 4 --terms tomato onion potato carrot
+
+The pages under ``fixtures/pages`` are served by the local stand-in from
+``fixture_server.py`` and every ``scrape_*`` function is pointed at it through
+``<WEBSITE>_SITE_URL``, so no network access is needed. Chromium and
+ChromeDriver must be installed; ChromeDriver is found through
+``CHROMEDRIVER_PATH`` or the ``PATH``.
+
+For each website the benchmark reports terms per second, the time breakdown
+from the run report (page load, waits, extraction, writing), and the peak
+resident memory of the browser processes. It also reports the peak Python heap
+of the harness and how long the browser took to start.
+
+``--compare`` runs everything twice, first loading every image, font and
+tracker (``BLOCK_RESOURCES=0``) and then with resource blocking on. It prints
+the before/after seconds and browser memory per website.
+
+``--engine cdp`` scrapes on a tab of one Chromium driven over the DevTools
+protocol (``TabRunner``) instead of a Selenium browser; ``--engine both`` runs
+both and compares them the same way.
+
+``--parallel N`` splits each website's terms the way ``--shards N`` does in a
+run: across N Selenium browsers, or across N tabs of the one CDP browser that
+take their terms from a shared queue. With ``--engine both`` this compares the
+throughput and memory of N browsers against N tabs.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper
+from fixture_server import FIXTURES_FOLDER, serve_fixtures
+from output_store import RunStore
+from scraper import (
+    DELIVERY_PINCODE,
+    MAX_SHARDS,
+    SITE_COLUMNS,
+    WEBSITES,
+    DriverPool,
+    TabRunner,
+    plan_site_tasks,
+    rate_limits,
+    run_report,
+    run_site,
+    store_pincode
+)
+
+DEFAULT_TERMS = ['tomato', 'onion']
+
+STEP_COLUMNS = ['Throttle (s)', 'Page Load (s)', 'Waits (s)', 'Extract (s)', 'Write (s)', 'Other (s)']
+
+
+def process_tree_rss_mb(pid):
+    """Return the resident memory of a process and all its descendants in MB (Linux only)."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The parent pid is the second field after the parenthesised command name
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+class PeakRss:
+    """Samples the resident memory of process trees on a background thread and keeps the peak of their sum."""
+
+    def __init__(self, pids, interval=0.2):
+        self.pids = pids
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, sum(process_tree_rss_mb(pid) for pid in self.pids))
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def browser_pids(pool, count):
+    """Start `count` browsers in the pool and return the pids of the ChromeDriver behind each one."""
+    pids = []
+    with ExitStack() as stack:
+        for _ in range(count):
+            driver = stack.enter_context(pool.acquire())
+            try:
+                pids.append(driver.service.process.pid)
+            except AttributeError:
+                pass
+    return pids
+
+
+def benchmark_website(scrape, pids, website, terms):
+    """Scrape `terms` on one website against the stand-in with `scrape(website, terms, store)` and return its row."""
+    with tempfile.TemporaryDirectory() as folder:
+        store = RunStore(folder, terms, SITE_COLUMNS)
+        run_report.reset()
+        start = time.perf_counter()
+        if not pids:
+            scrape(website, terms, store)
+            rss = 0.0
+        else:
+            with PeakRss(pids) as sampler:
+                scrape(website, terms, store)
+            rss = sampler.peak
+        elapsed = time.perf_counter() - start
+
+        breakdown = next((row for row in run_report.site_rows() if row['Website'] == website), {})
+        terms_done = len(store.completed_terms(website, store_pincode(website, DELIVERY_PINCODE)))
+        return {
+            'Website': website,
+            'Terms': terms_done,
+            'Rows': store.row_count(website),
+            'Seconds': round(elapsed, 3),
+            'Terms/s': round(terms_done / elapsed, 3) if elapsed else 0.0,
+            **{column: breakdown.get(column, 0.0) for column in STEP_COLUMNS},
+            'Failed': breakdown.get('Failed', 0),
+            'Browser RSS (MB)': round(rss, 1),
+        }
+
+
+def print_table(rows):
+    columns = list(rows[0])
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def run_benchmark(base_url, websites, terms, repeat, engine='selenium', parallel=1):
+    """Scrape every website `repeat` times on `parallel` fresh browsers (or tabs) and return the results."""
+    tracemalloc.start()
+    if engine == 'cdp':
+        runner = TabRunner(parallel)
+        close = runner.close
+        start = time.perf_counter()
+        pids = [runner.start().process.pid]
+        startup = time.perf_counter() - start
+        submit = runner.submit
+    else:
+        pool = DriverPool(parallel, origins=[base_url])
+        executor = ThreadPoolExecutor(max_workers=parallel)
+
+        def close():
+            executor.shutdown()
+            pool.close()
+
+        start = time.perf_counter()
+        pids = browser_pids(pool, parallel)
+        startup = time.perf_counter() - start
+
+        def submit(website, terms, store):
+            return executor.submit(run_site, pool, website, terms, store)
+
+    def scrape(website, terms, store):
+        # Shards as in a run: tabs share one queue of terms, browsers get a slice each
+        tasks = plan_site_tasks({(website, DELIVERY_PINCODE): terms}, parallel, shared=engine == 'cdp')
+        rate_limits.start_run({website: len(tasks)})
+        for future in [submit(website, chunk, store) for _, _, _, chunk in tasks]:
+            future.result()
+
+    try:
+        rows = []
+        for _ in range(max(1, repeat)):
+            for website in websites:
+                rows.append(benchmark_website(scrape, pids, website, terms))
+    finally:
+        close()
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'startup_seconds': round(startup, 3),
+            'python_peak_mb': round(python_peak / 1024 / 1024, 1),
+            'websites': rows}
+
+
+def print_results(results):
+    print_table(results['websites'])
+    print(f"Browser startup: {results['startup_seconds']:.2f} s, "
+          f"peak Python heap: {results['python_peak_mb']:.1f} MB")
+
+
+def compare_rows(before, after):
+    """Return per-website before/after seconds and browser memory, averaged over the repeats."""
+    rows = []
+    for website in dict.fromkeys(row['Website'] for row in before):
+        old = [row for row in before if row['Website'] == website]
+        new = [row for row in after if row['Website'] == website]
+        old_seconds = sum(row['Seconds'] for row in old) / len(old)
+        new_seconds = sum(row['Seconds'] for row in new) / len(new)
+        rows.append({
+            'Website': website,
+            'Seconds Before': round(old_seconds, 3),
+            'Seconds After': round(new_seconds, 3),
+            'Speed-up': f"{old_seconds / new_seconds:.2f}x" if new_seconds else 'n/a',
+            'RSS Before (MB)': max(row['Browser RSS (MB)'] for row in old),
+            'RSS After (MB)': max(row['Browser RSS (MB)'] for row in new),
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against recorded pages.")
+    parser.add_argument('--websites', nargs='+', choices=WEBSITES, default=WEBSITES)
+    parser.add_argument('--terms', nargs='+', default=DEFAULT_TERMS)
+    parser.add_argument('--repeat', type=int, default=1, help="times each website is scraped")
+    parser.add_argument('--compare', action='store_true',
+                        help="run without and then with resource blocking and compare the two")
+    parser.add_argument('--engine', choices=['selenium', 'cdp', 'both'], default='selenium',
+                        help="scrape with Selenium, on a CDP tab, or both and compare them")
+    parser.add_argument('--parallel', type=int, default=1, choices=range(1, MAX_SHARDS + 1), metavar='N',
+                        help="browsers, or tabs with the CDP engine, sharing each website's terms")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    server, base_url = serve_fixtures(FIXTURES_FOLDER, kind='pages')
+    for website in WEBSITES:
+        os.environ[f"{website.upper()}_SITE_URL"] = f"{base_url}/{website.lower()}/"
+    # Locations set on the fixture pages stay out of the real saved sessions
+    sessions_folder = tempfile.TemporaryDirectory(ignore_cleanup_errors=True)
+    scraper.sessions_path = os.path.join(sessions_folder.name, 'locations.sqlite3')
+
+    # (output name, BLOCK_RESOURCES, engine) of each benchmark run
+    engine = 'selenium' if args.engine == 'both' else args.engine
+    if args.compare:
+        runs = [('no_blocking', '0', engine), ('blocking', '1', engine)]
+    elif args.engine == 'both':
+        runs = [('selenium', os.environ.get('BLOCK_RESOURCES', '1'), 'selenium'),
+                ('cdp', os.environ.get('BLOCK_RESOURCES', '1'), 'cdp')]
+    else:
+        mode = os.environ.get('BLOCK_RESOURCES', '1')
+        runs = [('blocking' if mode != '0' else 'no_blocking', mode, engine)]
+    output = {'terms': args.terms, 'parallel': args.parallel}
+    try:
+        for name, mode, run_engine in runs:
+            # The browser reads this when it starts, so each mode gets a fresh one
+            os.environ['BLOCK_RESOURCES'] = mode
+            print(f"Resource blocking {'on' if mode != '0' else 'off'}, {run_engine} engine:")
+            output[name] = run_benchmark(base_url, args.websites, args.terms, args.repeat, run_engine,
+                                         args.parallel)
+            print_results(output[name])
+    finally:
+        server.shutdown()
+        sessions_folder.cleanup()
+
+    if args.compare:
+        output['comparison'] = compare_rows(output['no_blocking']['websites'], output['blocking']['websites'])
+        print("Before/after resource blocking:")
+        print_table(output['comparison'])
+    elif args.engine == 'both':
+        output['comparison'] = compare_rows(output['selenium']['websites'], output['cdp']['websites'])
+        print(f"{args.parallel} Selenium browser(s) (before) against {args.parallel} CDP tab(s) (after):")
+        print_table(output['comparison'])
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+    rows = [row for name, _, _ in runs for row in output[name]['websites']]
+    return 1 if any(row['Terms'] < len(args.terms) for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,356 @@
+"""Drive tabs of one headless Chromium over the DevTools protocol with asyncio.
+
+Every Selenium call is a blocking HTTP round trip to ChromeDriver, so a thread
+drives one page at a time and each worker needs a browser of its own. Here
+Chromium is started with ``--remote-debugging-port`` and a single WebSocket
+(``wsproto`` over asyncio streams) carries the commands of every tab: each tab
+is a flattened CDP session, commands are matched to their replies by id, and
+any number of coroutines can wait on their own tabs at once. Ten tabs cost one
+browser process plus a renderer each, instead of ten browsers and drivers.
+
+Chromium normally slows down tabs that are not in front: their timers fire at
+most once a second and their rendering is paused. Every tab here is scraped at
+once, so the browser is started with that throttling off and each tab is told
+it has focus.
+
+``Browser.start()`` launches Chromium and ``Browser.new_tab()`` opens a ``Tab``
+(in its own cookie jar when given a context from ``Browser.new_context()``)
+with the few primitives the scrapers need: navigate, evaluate JavaScript,
+click, type, press Enter, read HTML, block URLs and get or set cookies.
+"""
+import asyncio
+import contextlib
+import itertools
+import json
+import shutil
+import tempfile
+import urllib.parse
+
+from wsproto import ConnectionType, WSConnection
+from wsproto.connection import ConnectionState
+from wsproto.events import (
+    AcceptConnection,
+    BytesMessage,
+    CloseConnection,
+    Ping,
+    RejectConnection,
+    Request,
+    TextMessage
+)
+
+# Seconds Chromium may take to start and print its DevTools address
+LAUNCH_TIMEOUT = 30
+
+# Seconds a single protocol command may take before it counts as failed
+COMMAND_TIMEOUT = 30
+
+# Bytes read from the socket at a time; large enough for a page's HTML in a few reads
+READ_SIZE = 1 << 20
+
+# Keep background tabs running at full speed
+BACKGROUND_TAB_ARGUMENTS = [
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+]
+
+
+class CdpError(Exception):
+    """Raised when Chromium rejects a command, a script throws, or the connection is lost."""
+
+
+class CdpConnection:
+    """One WebSocket to Chromium, shared by every tab's session."""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._expected = {}
+        self._ws = WSConnection(ConnectionType.CLIENT)
+        self._reader = None
+        self._writer = None
+        self._reading = None
+        self._accepted = None
+        self._message = []
+
+    async def connect(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self._reader, self._writer = await asyncio.open_connection(parts.hostname, parts.port)
+        self._accepted = asyncio.get_running_loop().create_future()
+        self._reading = asyncio.create_task(self._read())
+        self._writer.write(self._ws.send(Request(host=parts.netloc, target=parts.path)))
+        await asyncio.wait_for(self._accepted, LAUNCH_TIMEOUT)
+
+    async def _read(self):
+        try:
+            while True:
+                data = await self._reader.read(READ_SIZE)
+                self._ws.receive_data(data or None)
+                for event in self._ws.events():
+                    self._handle(event)
+                if not data:
+                    break
+        except Exception as e:
+            self._fail(CdpError(f"DevTools connection failed: {e}"))
+        else:
+            self._fail(CdpError("DevTools connection closed"))
+
+    def _handle(self, event):
+        if isinstance(event, AcceptConnection):
+            self._accepted.set_result(True)
+        elif isinstance(event, RejectConnection):
+            self._fail(CdpError(f"DevTools refused the connection ({event.status_code})"))
+        elif isinstance(event, Ping):
+            self._writer.write(self._ws.send(event.response()))
+        elif isinstance(event, CloseConnection):
+            if self._ws.state is ConnectionState.REMOTE_CLOSING:
+                self._writer.write(self._ws.send(event.response()))
+        elif isinstance(event, (TextMessage, BytesMessage)):
+            # Large replies arrive in several frames
+            self._message.append(event.data if isinstance(event.data, str) else event.data.decode())
+            if event.message_finished:
+                message = json.loads(''.join(self._message))
+                self._message = []
+                if 'id' in message:
+                    futures = [self._pending.pop(message['id'], None)]
+                else:
+                    # Every coroutine waiting on this event gets it; each removes its own future (see `expect`)
+                    futures = self._expected.get((message.get('sessionId'), message.get('method')), [])
+                for future in futures:
+                    if future is not None and not future.done():
+                        future.set_result(message)
+
+    def _fail(self, error):
+        if self._accepted is not None and not self._accepted.done():
+            self._accepted.set_exception(error)
+        expected = [future for futures in self._expected.values() for future in futures]
+        for future in [*self._pending.values(), *expected]:
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+        self._expected.clear()
+
+    @contextlib.contextmanager
+    def expect(self, method, session_id=None):
+        """Yield a future for the next `method` event of a session; enter it before the command that causes it.
+
+        Any number of callers may wait on the same event at once, and each future is
+        forgotten when its block exits, whether or not the event arrived.
+        """
+        key = (session_id, method)
+        future = asyncio.get_running_loop().create_future()
+        self._expected.setdefault(key, []).append(future)
+        try:
+            yield future
+        finally:
+            future.cancel()
+            waiters = self._expected.get(key, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._expected.pop(key, None)
+
+    async def send(self, method, params=None, session_id=None, timeout=COMMAND_TIMEOUT):
+        """Send a command, to a tab's session if `session_id` is given, and return its result."""
+        if self._ws.state is not ConnectionState.OPEN or self._reading.done():
+            raise CdpError("DevTools connection is closed")
+        message_id = next(self._ids)
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id is not None:
+            message['sessionId'] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        self._writer.write(self._ws.send(TextMessage(data=json.dumps(message))))
+        await self._writer.drain()
+        try:
+            reply = await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(message_id, None)
+        if 'error' in reply:
+            raise CdpError(f"{method} failed: {reply['error'].get('message')}")
+        return reply.get('result', {})
+
+    async def close(self):
+        if self._writer is None:
+            return
+        try:
+            self._writer.write(self._ws.send(CloseConnection(code=1000)))
+            await self._writer.drain()
+        except Exception:
+            pass
+        self._writer.close()
+        if self._reading is not None:
+            self._reading.cancel()
+
+
+class Tab:
+    """One page of the browser, driven through its own CDP session."""
+
+    def __init__(self, connection, target_id, session_id):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+
+    async def send(self, method, params=None, timeout=COMMAND_TIMEOUT):
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    async def goto(self, url, timeout=COMMAND_TIMEOUT):
+        """Navigate to `url` and wait for its load event, like ``driver.get``."""
+        async with self.navigation(timeout):
+            result = await self.send('Page.navigate', {'url': url}, timeout)
+            if result.get('errorText'):
+                raise CdpError(f"Could not open {url}: {result['errorText']}")
+
+    @contextlib.asynccontextmanager
+    async def navigation(self, timeout=COMMAND_TIMEOUT):
+        """Wait at the end of the block for the page load a command in it started, such as a form post."""
+        with self.connection.expect('Page.loadEventFired', self.session_id) as loaded:
+            yield
+            await asyncio.wait_for(loaded, timeout)
+
+    async def evaluate(self, expression, timeout=COMMAND_TIMEOUT):
+        """Return the value of a JavaScript expression, awaiting it if it is a promise."""
+        result = await self.send('Runtime.evaluate', {'expression': expression, 'returnByValue': True,
+                                                      'awaitPromise': True}, timeout)
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            raise CdpError(details.get('exception', {}).get('description') or details.get('text'))
+        return result.get('result', {}).get('value')
+
+    async def call(self, function, *args):
+        """Call a JavaScript function source with JSON-serializable arguments and return its value."""
+        return await self.evaluate(f"({function}).apply(null, {json.dumps(args)})")
+
+    async def click(self, selector):
+        """Click the first element matching a CSS selector."""
+        await self.call("function (selector) {"
+                        " var element = document.querySelector(selector);"
+                        " if (!element) { throw new Error('No element matches ' + selector); }"
+                        " element.click(); }", selector)
+
+    async def type(self, selector, text):
+        """Clear the first element matching a CSS selector and type `text` into it, firing input events."""
+        await self.call("function (selector) {"
+                        " var element = document.querySelector(selector);"
+                        " if (!element) { throw new Error('No element matches ' + selector); }"
+                        " element.focus(); element.value = ''; }", selector)
+        await self.send('Input.insertText', {'text': text})
+
+    async def press_enter(self):
+        """Press and release Enter in the focused element."""
+        key = {'key': 'Enter', 'code': 'Enter', 'windowsVirtualKeyCode': 13, 'nativeVirtualKeyCode': 13}
+        await self.send('Input.dispatchKeyEvent', {'type': 'keyDown', 'text': '\r', **key})
+        await self.send('Input.dispatchKeyEvent', {'type': 'keyUp', **key})
+
+    async def html(self, selector=None):
+        """Return the outer HTML of the first element matching `selector`, or of the whole page, or None."""
+        if selector is None:
+            return await self.evaluate("document.documentElement.outerHTML")
+        return await self.call("function (selector) {"
+                               " var element = document.querySelector(selector);"
+                               " return element ? element.outerHTML : null; }", selector)
+
+    async def block_urls(self, patterns):
+        """Stop the tab fetching URLs matching any of the wildcard `patterns`."""
+        await self.send('Network.enable')
+        await self.send('Network.setBlockedURLs', {'urls': list(patterns)})
+
+    async def cookies(self):
+        return (await self.send('Network.getCookies')).get('cookies', [])
+
+    async def set_cookies(self, cookies):
+        """Set cookies given as ``Network.CookieParam`` dicts, each with its domain."""
+        await self.send('Network.setCookies', {'cookies': list(cookies)})
+
+    async def delete_cookies(self, cookies):
+        """Delete the named cookies, each matched by name, domain and path."""
+        for cookie in cookies:
+            await self.send('Network.deleteCookies', {'name': cookie['name'], 'domain': cookie.get('domain'),
+                                                      'path': cookie.get('path', '/')})
+
+    async def close(self):
+        try:
+            await self.connection.send('Target.closeTarget', {'targetId': self.target_id})
+        except (CdpError, asyncio.TimeoutError) as e:
+            print(f"Failed to close tab: {e}")
+
+
+class Browser:
+    """A headless Chromium process and the DevTools connection its tabs share."""
+
+    def __init__(self, binary=None, arguments=()):
+        self.binary = binary or shutil.which('chromium')
+        self.arguments = list(arguments)
+        self.connection = None
+        self.process = None
+        self._profile = None
+        self._draining = None
+
+    async def start(self):
+        if not self.binary:
+            raise CdpError("Chromium was not found on the PATH")
+        self._profile = tempfile.TemporaryDirectory(prefix='cdp-profile-')
+        self.process = await asyncio.create_subprocess_exec(
+            self.binary, *self.arguments, *BACKGROUND_TAB_ARGUMENTS, '--remote-debugging-port=0', f'--user-data-dir={self._profile.name}',
+            'about:blank', stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        try:
+            url = await asyncio.wait_for(self._devtools_url(), LAUNCH_TIMEOUT)
+        except (asyncio.TimeoutError, CdpError):
+            await self.close()
+            raise
+        # Chromium keeps logging to stderr; reading it stops a full pipe from stalling the browser
+        self._draining = asyncio.create_task(self._drain())
+        self.connection = CdpConnection()
+        await self.connection.connect(url)
+        return self
+
+    async def _devtools_url(self):
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                raise CdpError("Chromium exited before it was ready")
+            text = line.decode(errors='replace').strip()
+            if text.startswith('DevTools listening on '):
+                return text[len('DevTools listening on '):]
+
+    async def _drain(self):
+        while await self.process.stderr.read(READ_SIZE):
+            pass
+
+    async def new_context(self):
+        """Create a browser context, an incognito-like profile with its own cookies and storage, and return its id."""
+        result = await self.connection.send('Target.createBrowserContext', {'disposeOnDetach': True})
+        return result['browserContextId']
+
+    async def new_tab(self, url='about:blank', context=None):
+        """Open a tab, in the browser context `context` if given, and attach a session to it."""
+        params = {'url': url}
+        if context is not None:
+            params['browserContextId'] = context
+        target_id = (await self.connection.send('Target.createTarget', params))['targetId']
+        session_id = (await self.connection.send('Target.attachToTarget', {'targetId': target_id,
+                                                                           'flatten': True}))['sessionId']
+        tab = Tab(self.connection, target_id, session_id)
+        await tab.send('Page.enable')
+        await tab.send('Runtime.enable')
+        # Pages that wait for focus or visibility would otherwise stall in every tab but one
+        await tab.send('Emulation.setFocusEmulationEnabled', {'enabled': True})
+        return tab
+
+    async def close(self):
+        if self.connection is not None:
+            try:
+                await self.connection.send('Browser.close', timeout=5)
+            except (CdpError, asyncio.TimeoutError):
+                pass
+            await self.connection.close()
+        if self.process is not None and self.process.returncode is None:
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self._draining is not None:
+            self._draining.cancel()
+        if self._profile is not None:
+            self._profile.cleanup()
@@ -0,0 +1,118 @@
+"""Run the scrapers from the command line, e.g. from a nightly cron job.
+
+    python cli.py Master_List.xlsx --websites DMart JioMart --workers 3 --output-dir out/
+
+The run uses the same engine as the Streamlit app but never imports Streamlit.
+A JSON summary (per-website progress, output files, wait and cache tables) is
+printed to stdout when the run ends. The exit status is 0 if every selected
+website finished, 1 if the run failed or any website failed, and 130 if it was
+interrupted with Ctrl+C. With --plan the Master_List is only read and the work
+plan (searches per website and pincode, estimated seconds) is printed instead.
+"""
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+
+from jobs import ScrapeJob
+from master_list import read_master_list, work_plan
+from scraper import (
+    DEFAULT_MAX_WORKERS,
+    DELIVERY_PINCODE,
+    ENGINES,
+    MAX_SHARDS,
+    WEBSITES,
+    output_folder,
+    parse_pincodes,
+    run_scrape
+)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Scrape vegetable prices without the Streamlit UI.")
+    parser.add_argument('master_list',
+                        help="Master_List.xlsx with a 'Vegetables' column and optional "
+                             "'Websites', 'Priority' and 'Pincode' columns")
+    parser.add_argument('--websites', nargs='+', choices=WEBSITES, default=WEBSITES,
+                        help="websites to scrape (default: all)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help="parallel browsers, or tabs with --engine cdp")
+    parser.add_argument('--shards', type=int, default=1, choices=range(1, MAX_SHARDS + 1), metavar='N',
+                        help="browsers per website, or tabs sharing its terms with --engine cdp")
+    parser.add_argument('--output-dir', default=output_folder, help="folder the workbooks are written to")
+    parser.add_argument('--chunks-dir', default=None,
+                        help="folder for the resumable per-term chunks (default: <output-dir>/chunks)")
+    parser.add_argument('--api', action='store_true', help="use the fast API search where available")
+    parser.add_argument('--resume', action='store_true', help="reuse the searches an interrupted run finished")
+    parser.add_argument('--force-refresh', action='store_true', help="ignore cached prices")
+    parser.add_argument('--engine', choices=ENGINES, default='selenium',
+                        help="'cdp' scrapes on tabs of one browser over the DevTools protocol")
+    parser.add_argument('--pincodes', nargs='+', default=[DELIVERY_PINCODE], metavar='PINCODE',
+                        help=f"delivery pincodes to price DMart and JioMart for (default: {DELIVERY_PINCODE})")
+    parser.add_argument('--plan', action='store_true',
+                        help="print the searches the run would make and its estimated time, then exit")
+    return parser
+
+
+def summarize(job):
+    """Return the machine-readable summary of a finished job."""
+    snapshot = job.snapshot()
+    return {
+        'id': snapshot['id'],
+        'state': snapshot['state'],
+        'error': snapshot['error'],
+        'seconds': round(snapshot['elapsed'], 2),
+        'websites': snapshot['progress'],
+        'files': snapshot['files'],
+        'tables': {title.rstrip(':'): table.to_dict('records') for title, table in snapshot['tables'].items()},
+    }
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    pincodes = parse_pincodes(' '.join(args.pincodes))
+    if not pincodes:
+        parser.error("--pincodes needs at least one six-digit pincode")
+    master_list = read_master_list(args.master_list)
+    print(f"{args.master_list}: {master_list.summary()}", file=sys.stderr)
+    for issue in master_list.issues:
+        print(issue, file=sys.stderr)
+
+    plan, seconds = work_plan(master_list, args.websites, pincodes, args.shards, max(1, args.workers), args.api,
+                              args.force_refresh)
+    if args.plan:
+        json.dump({'terms': len(master_list.terms), 'duplicates': master_list.duplicates,
+                   'issues': master_list.issues, 'estimated_seconds': seconds, 'plan': plan.to_dict('records')},
+                  sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write('\n')
+        return 0
+    print(f"Estimated run time: {seconds} seconds for {plan['Searches'].sum()} searches", file=sys.stderr)
+
+    chunks_dir = args.chunks_dir or os.path.join(args.output_dir, 'chunks')
+
+    job = ScrapeJob(run_scrape, args.websites, master_list.terms, max(1, args.workers), args.shards, args.api,
+                    args.resume, args.force_refresh, output_dir=args.output_dir, chunks_dir=chunks_dir,
+                    engine=args.engine, pincodes=pincodes, term_websites=master_list.term_websites,
+                    term_pincodes=master_list.term_pincodes)
+    # Ctrl+C stops the scrapers the same way the Stop button does
+    signal.signal(signal.SIGINT, lambda signum, frame: job.stop())
+    # Progress messages go to stderr so stdout carries only the summary
+    with contextlib.redirect_stdout(sys.stderr):
+        job.run()
+
+    summary = summarize(job)
+    json.dump(summary, sys.stdout, indent=2, ensure_ascii=False)
+    sys.stdout.write('\n')
+
+    if job.state == 'stopped':
+        return 130
+    if job.state == 'failed' or any(site['Status'] != 'done' for site in summary['websites'].values()):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""A local stand-in for the shop websites that serves recorded responses from disk.
+
+Fixtures live under ``fixtures/<kind>/<website>/<term>.<ext>`` where the term is
+lower-cased with spaces replaced by underscores, and a request without a term
+gets the website's ``index`` page. A request is routed by its
+first path segment (the website) and the search term it carries, so the
+same server can stand in for every website at once::
+
+    server, base_url = serve_fixtures()
+    os.environ['BIGBASKET_API_BASE_URL'] = f"{base_url}/bigbasket"
+
+Unknown terms get a 404, which exercises the Selenium fallback.
+
+Recorded pages reference images, fonts and third-party scripts under
+``<website>/assets/``. These are not stored; the server makes up filler of a
+realistic size after a short delay. That gives the pages the weight of the live
+sites, so the benchmark can measure what blocking them saves.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+FIXTURES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Query parameters the websites use to carry the search term
+TERM_PARAMS = ['slug', 'query', 'q', 'searchTerm']
+
+# Content type and size of the made-up assets, by file extension
+ASSET_TYPES = {
+    '.jpg': ('image/jpeg', 150 * 1024),
+    '.png': ('image/png', 60 * 1024),
+    '.webp': ('image/webp', 80 * 1024),
+    '.woff2': ('font/woff2', 90 * 1024),
+    '.js': ('application/javascript', 120 * 1024),
+}
+
+# Seconds an asset takes to arrive, standing in for a CDN round trip
+ASSET_LATENCY = 0.05
+
+
+def fixture_name(term):
+    """Return the file name stem used for a search term's fixture; a website's home page is 'index'."""
+    return term.strip().lower().replace(' ', '_') or 'index'
+
+
+def request_term(path, query, body):
+    """Find the search term in a request's JSON body, query string or last path segment."""
+    if body:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = {}
+        if isinstance(payload, dict) and payload.get('query'):
+            return payload['query']
+
+    params = parse_qs(query)
+    for name in TERM_PARAMS:
+        if params.get(name):
+            return params[name][0]
+
+    segments = [segment for segment in path.split('/') if segment]
+    return unquote(segments[-1]) if segments else ''
+
+
+def asset_content(name):
+    """Return (content type, filler bytes) for a made-up asset, or None for an unknown extension."""
+    content_type, size = ASSET_TYPES.get(os.path.splitext(name)[1].lower(), (None, 0))
+    if content_type is None:
+        return None
+    if content_type == 'application/javascript':
+        # Valid script that does nothing, so the page does not log errors
+        return content_type, ('/*' + ' ' * (size - 4) + '*/').encode('ascii')
+    return content_type, bytes(size)
+
+
+def make_handler(directory, kind):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def _send(self, content, content_type):
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def _serve(self, body=None):
+            parts = urlsplit(self.path)
+            segments = [segment for segment in parts.path.split('/') if segment]
+            if not segments:
+                self.send_error(404)
+                return
+
+            if len(segments) > 2 and segments[1] == 'assets':
+                asset = asset_content(segments[-1])
+                if asset is None:
+                    self.send_error(404)
+                    return
+                time.sleep(ASSET_LATENCY)
+                self._send(asset[1], asset[0])
+                return
+
+            website = segments[0].lower()
+            term = request_term('/'.join(segments[1:]), parts.query, body)
+            for extension, content_type in (('.json', 'application/json'), ('.html', 'text/html; charset=utf-8')):
+                fixture_path = os.path.join(directory, kind, website, fixture_name(term) + extension)
+                if os.path.exists(fixture_path):
+                    with open(fixture_path, 'rb') as f:
+                        self._send(f.read(), content_type)
+                    return
+            self.send_error(404, f"No {kind} fixture for {website} '{term}'")
+
+        def do_GET(self):
+            self._serve()
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            self._serve(self.rfile.read(length).decode('utf-8') if length else None)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def serve_fixtures(directory=FIXTURES_FOLDER, kind='api', port=0):
+    """Start the stand-in server on a background thread and return (server, base_url)."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(directory, kind))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
+
+
+if __name__ == '__main__':
+    import sys
+
+    kind = sys.argv[1] if len(sys.argv) > 1 else 'api'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(FIXTURES_FOLDER, kind))
+    print(f"Serving {kind} fixtures from {FIXTURES_FOLDER} on http://127.0.0.1:{port}")
+    server.serve_forever()
@@ -0,0 +1,244 @@
+"""Fetch search results straight from the JSON APIs behind the shop websites.
+
+BigBasket, DMart, Hyperpure and JioMart all render their search pages from
+JSON endpoints. Calling those endpoints over a pooled keep-alive session is far
+cheaper than driving Chromium for every term, so the scrapers use this module
+first and fall back to Selenium only for terms the API could not answer.
+
+Each website's base URL can be overridden with ``<WEBSITE>_API_BASE_URL``
+(e.g. ``BIGBASKET_API_BASE_URL=http://127.0.0.1:8000/bigbasket``), which is
+how the offline fixture server in ``fixture_server.py`` stands in for the live
+sites.
+"""
+import os
+from urllib.parse import quote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import THROTTLE_STATUS_CODES
+
+# Websites that can be searched through their JSON API
+API_WEBSITES = ['BigBasket', 'DMart', 'Hyperpure', 'JioMart']
+
+API_BASE_URLS = {
+    'BigBasket': 'https://www.bigbasket.com',
+    'DMart': 'https://digital.dmart.in',
+    'Hyperpure': 'https://www.hyperpure.com',
+    'JioMart': 'https://www.jiomart.com',
+}
+
+DEFAULT_PINCODE = '122001'
+
+# Cookies a website's API reads the delivery location from
+API_LOCATION_COOKIES = {
+    'DMart': ['storeId'],
+}
+
+# Number of products kept per term, matching what the Selenium scrapers read
+PRODUCT_LIMITS = {
+    'BigBasket': 4,
+    'DMart': 1,
+    'Hyperpure': None,
+    'JioMart': 1,
+}
+
+REQUEST_TIMEOUT = 15
+
+
+class ApiError(Exception):
+    """Raised when a website's API does not return usable search results.
+
+    ``throttled`` is True when the API timed out or answered with a status it
+    uses to push back (see ``rate_limiter.THROTTLE_STATUS_CODES``).
+    """
+
+    def __init__(self, message, throttled=False):
+        super().__init__(message)
+        self.throttled = throttled
+
+
+def api_base_url(website):
+    """Return the base URL for a website, honouring the environment override."""
+    env_name = f"{website.upper()}_API_BASE_URL"
+    return os.environ.get(env_name, API_BASE_URLS[website]).rstrip('/')
+
+
+def cookie_site(host):
+    """Return the last two labels of a host or cookie domain, e.g. 'dmart.in' for 'digital.dmart.in:443'."""
+    return '.'.join(host.split(':')[0].strip('.').split('.')[-2:])
+
+
+def usable_cookies(website, cookies):
+    """Return whether browser cookies belong to the website's API and hold the location it reads."""
+    site = cookie_site(urlparse(api_base_url(website)).netloc)
+    names = {cookie['name'] for cookie in cookies if cookie_site(cookie.get('domain', '')) == site}
+    return bool(names) and all(name in names for name in API_LOCATION_COOKIES.get(website, []))
+
+
+def format_price(value):
+    """Format a price from the API the way it is shown on the website."""
+    if value in (None, ''):
+        return 'N/A'
+    return f"₹{value}"
+
+
+def build_request(website, term, pincode=DEFAULT_PINCODE, cookies=None):
+    """Return (method, path, params, json_body) for a search request."""
+    cookies = cookies or {}
+    if website == 'BigBasket':
+        return 'GET', '/listing-svc/v2/products', {'type': 'ps', 'slug': term, 'page': 1}, None
+    if website == 'DMart':
+        params = {'page': 1, 'size': 10, 'channel': 'web'}
+        if cookies.get('storeId'):
+            params['storeId'] = cookies['storeId']
+        return 'GET', f"/api/v3/search/{quote(term)}", params, None
+    if website == 'Hyperpure':
+        return 'GET', '/consumer/v2/catalog/search', {'query': term, 'pincode': pincode}, None
+    if website == 'JioMart':
+        return 'POST', '/trex/search', None, {'query': term, 'pageSize': 10, 'pincode': pincode}
+    raise ValueError(f"No API request defined for {website}")
+
+
+def parse_bigbasket(payload, term):
+    rows = []
+    try:
+        products = payload['tabs'][0]['product_info']['products']
+    except (KeyError, IndexError, TypeError):
+        raise ApiError("Unexpected BigBasket response")
+
+    for product in products[:PRODUCT_LIMITS['BigBasket']]:
+        pricing = product.get('pricing', {}).get('discount', {})
+        variants = [product] + product.get('children', [])
+        dropdown_prices = [
+            f"{variant.get('w', 'N/A')}: "
+            f"{format_price(variant.get('pricing', {}).get('discount', {}).get('prim_price', {}).get('sp'))}"
+            for variant in variants
+        ]
+        rows.append({
+            'Search Term': term,
+            'BigBasket_Title': f"{product.get('brand', {}).get('name', '')} {product.get('desc', '')}".strip(),
+            'BigBasket_Price': format_price(pricing.get('prim_price', {}).get('sp')),
+            'BigBasket_Original_Price': format_price(pricing.get('mrp')),
+            'BigBasket_Discount': pricing.get('d_text') or 'N/A',
+            'BigBasket_Pack_Size': product.get('w', 'N/A'),
+            'BigBasket_Dropdown_Prices': ', '.join(dropdown_prices) if len(variants) > 1 else 'N/A'
+        })
+    return rows
+
+
+def parse_dmart(payload, term):
+    rows = []
+    try:
+        products = payload['products']
+    except (KeyError, TypeError):
+        raise ApiError("Unexpected DMart response")
+
+    for product in products[:PRODUCT_LIMITS['DMart']]:
+        skus = product.get('sKUs') or [{}]
+        sku = skus[0]
+        rows.append({
+            'Search Term': term,
+            'DMart_Title': sku.get('name') or product.get('name', 'N/A'),
+            'DMart_MRP': format_price(sku.get('priceMRP')),
+            'DMart_Price': format_price(sku.get('priceSALE')),
+            'DMart_Offer': f"{format_price(sku.get('savingPrice'))} OFF" if sku.get('savingPrice') else 'N/A',
+            'DMart_Dropdown_Options': ', '.join(
+                f"{option.get('variantTextValue', 'N/A')}: {format_price(option.get('priceSALE'))}"
+                for option in skus) if len(skus) > 1 else ''
+        })
+    return rows
+
+
+def parse_hyperpure(payload, term):
+    rows = []
+    try:
+        products = payload['response']['products']
+    except (KeyError, TypeError):
+        raise ApiError("Unexpected Hyperpure response")
+
+    for product in products[:PRODUCT_LIMITS['Hyperpure']]:
+        title = product.get('name', '').strip()
+        if not title:
+            continue
+        offers = [offer.get('text', '').strip() for offer in product.get('offers', []) if offer.get('text')]
+        rows.append({
+            'Search Term': term,
+            'Hyperpure_Product_Title': title,
+            'Hyperpure_Price': format_price(product.get('price')),
+            'Hyperpure_Category': title.split(",")[0],
+            'Hyperpure_SUPERSAVER_Information': ' | '.join(offers) if offers else 'N/A'
+        })
+    return rows
+
+
+def parse_jiomart(payload, term):
+    rows = []
+    try:
+        results = payload['results']
+    except (KeyError, TypeError):
+        raise ApiError("Unexpected JioMart response")
+
+    for result in results[:PRODUCT_LIMITS['JioMart']]:
+        product = result.get('product', {})
+        variant = (product.get('variants') or [{}])[0]
+        attributes = variant.get('attributes', {})
+        discount = attributes.get('discount_pct')
+        rows.append({
+            'Search Term': term,
+            'JioMart_Title': product.get('title', 'N/A'),
+            'JioMart_Offer': f"{discount}% OFF" if discount else 'No offer',
+            'JioMart_Price': format_price(attributes.get('selling_price')),
+            'JioMart_Real_Price': format_price(attributes.get('mrp'))
+        })
+    return rows
+
+
+API_PARSERS = {
+    'BigBasket': parse_bigbasket,
+    'DMart': parse_dmart,
+    'Hyperpure': parse_hyperpure,
+    'JioMart': parse_jiomart,
+}
+
+
+class ApiClient:
+    """Search one website through its JSON API over a pooled keep-alive session."""
+
+    def __init__(self, website, pincode=DEFAULT_PINCODE, base_url=None, pool_size=10):
+        self.website = website
+        self.pincode = pincode
+        self.base_url = (base_url or api_base_url(website)).rstrip('/')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+        })
+
+    def load_browser_state(self, cookies, user_agent=None):
+        """Reuse the cookies (and user agent) of a browser that has already set the location."""
+        for cookie in cookies:
+            self.session.cookies.set(cookie['name'], cookie['value'])
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+
+    def search(self, term):
+        """Return the rows for one search term in the website's column schema."""
+        cookies = self.session.cookies.get_dict()
+        method, path, params, body = build_request(self.website, term, self.pincode, cookies)
+        try:
+            response = self.session.request(method, self.base_url + path, params=params, json=body,
+                                            timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            throttled = isinstance(e, requests.Timeout) or status in THROTTLE_STATUS_CODES
+            raise ApiError(f"{self.website} API request for '{term}' failed: {e}", throttled=throttled)
+        return API_PARSERS[self.website](payload, term)
+
+    def close(self):
+        self.session.close()
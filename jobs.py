@@ -0,0 +1,190 @@
+"""Background scraping jobs, run one at a time off the Streamlit script thread.
+
+A ``ScrapeJob`` wraps one scraping run together with its live progress, log
+messages and output files. Jobs are handed to a ``JobQueue``, whose single
+worker thread runs them in the order they were submitted, so several users
+starting runs at once wait their turn instead of each launching browsers.
+
+The UI only reads a job's ``snapshot()`` and calls ``stop()``; the scrapers
+check ``stop_requested()``, which reflects the job currently running.
+"""
+import itertools
+import threading
+import time
+import traceback
+from collections import deque
+
+# Rows kept per job for the live preview
+PREVIEW_ROWS = 50
+
+# Finished jobs the queue remembers, so their downloads stay available
+MAX_FINISHED_JOBS = 20
+
+_job_ids = itertools.count(1)
+_active_job = None
+
+
+class ScrapeCancelled(Exception):
+    """Raised inside a scraper when the running job has been asked to stop.
+
+    Scrapers re-raise it ahead of their broad ``except Exception`` handlers, so
+    Stop is never recorded as a failed term or a website pushing back.
+    """
+
+
+def stop_requested():
+    """Return True if the job currently running has been asked to stop."""
+    job = _active_job
+    return job is not None and job.stopped()
+
+
+class ScrapeJob:
+    """One scraping run: the function that performs it, its progress and its results."""
+
+    def __init__(self, target, *args, **kwargs):
+        self.id = f"{int(time.time())}-{next(_job_ids)}"
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.state = 'queued'
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.messages = []
+        self.progress = {}
+        self.files = {}
+        self.tables = {}
+        self.preview = deque(maxlen=PREVIEW_ROWS)
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def stop(self):
+        """Ask the job to stop; scrapers notice within one wait poll."""
+        self._stop_event.set()
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    @property
+    def done(self):
+        return self.state in ('finished', 'stopped', 'failed')
+
+    def log(self, message, level='info'):
+        """Record a message for the UI ('info', 'success', 'warning' or 'error')."""
+        print(message)
+        with self._lock:
+            self.messages.append((level, message))
+
+    def set_site(self, website, **fields):
+        """Update a website's progress row, e.g. ``set_site('DMart', Status='running')``."""
+        with self._lock:
+            row = self.progress.setdefault(website, {'Status': 'queued', 'Terms Done': 0, 'Terms': 0, 'Rows': 0})
+            row.update(fields)
+
+    def term_done(self, website, term, rows):
+        """Count a finished search term and keep its rows for the live preview."""
+        with self._lock:
+            row = self.progress.setdefault(website, {'Status': 'running', 'Terms Done': 0, 'Terms': 0, 'Rows': 0})
+            row['Terms Done'] += 1
+            row['Rows'] += len(rows)
+            for scraped in rows:
+                self.preview.append({'Website': website, **scraped})
+
+    def add_file(self, name, path):
+        with self._lock:
+            self.files[name] = path
+
+    def add_table(self, name, table):
+        with self._lock:
+            self.tables[name] = table
+
+    def snapshot(self):
+        """Return a consistent copy of the job's state for rendering."""
+        with self._lock:
+            elapsed_until = self.finished_at or time.time()
+            return {
+                'id': self.id,
+                'state': self.state,
+                'stopping': self.stopped() and not self.done,
+                'error': self.error,
+                'elapsed': elapsed_until - self.started_at if self.started_at else 0.0,
+                'messages': list(self.messages),
+                'progress': {website: dict(row) for website, row in self.progress.items()},
+                'files': dict(self.files),
+                'tables': dict(self.tables),
+                'preview': list(self.preview),
+            }
+
+    def run(self):
+        """Run the job on the calling thread and record how it ended."""
+        global _active_job
+        with self._lock:
+            if self.stopped():
+                self.state = 'stopped'
+                self.finished_at = time.time()
+                return
+            self.state = 'running'
+            self.started_at = time.time()
+        _active_job = self
+        try:
+            self.target(self, *self.args, **self.kwargs)
+            state = 'stopped' if self.stopped() else 'finished'
+        except Exception as e:
+            traceback.print_exc()
+            self.log(f"Scraping failed: {e}", 'error')
+            self.error = str(e)
+            state = 'failed'
+        finally:
+            _active_job = None
+        with self._lock:
+            self.state = state
+            self.finished_at = time.time()
+
+
+class JobQueue:
+    """Runs submitted jobs one at a time on a background thread, first come first served."""
+
+    def __init__(self, max_finished=MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._jobs = []
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._worker = None
+
+    def submit(self, job):
+        """Queue a job and return it."""
+        with self._condition:
+            self._jobs.append(job)
+            self._pending.append(job)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._work, name='scrape-jobs', daemon=True)
+                self._worker.start()
+            self._condition.notify()
+        return job
+
+    def position(self, job):
+        """Return how many jobs will run before `job`, or 0 once it has started."""
+        with self._condition:
+            if job not in self._pending:
+                return 0
+            return self._pending.index(job) + sum(1 for queued in self._jobs if queued.state == 'running')
+
+    def jobs(self):
+        with self._condition:
+            return list(self._jobs)
+
+    def _forget_finished(self):
+        finished = [job for job in self._jobs if job.done]
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            self._jobs.remove(job)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                job = self._pending.popleft()
+            job.run()
+            with self._condition:
+                self._forget_finished()
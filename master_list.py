@@ -0,0 +1,231 @@
+"""Read the uploaded Master_List into the terms a run will search, and plan that run.
+
+Every row of the Master_List used to become a browser search on every website,
+so "Tomato", "tomato " and a second "Tomato" further down cost three searches
+each. ``read_master_list`` streams the workbook row by row (read-only openpyxl)
+and:
+
+- collapses whitespace and drops empty cells;
+- keeps one row per term, compared case-insensitively like the result cache,
+  and counts the duplicates it dropped;
+- reads the optional columns that tune a term: ``Websites`` (comma separated
+  website names, blank for all), ``Priority`` (lower numbers are searched
+  first, blank after the numbered ones) and ``Pincode`` (the pincodes DMart
+  and JioMart price the term for, blank for the run's pincodes). When a term
+  appears twice, blank cells win, the lowest priority is kept and listed
+  websites and pincodes are combined;
+- reports the cells it could not use instead of failing the upload.
+
+``work_plan`` then counts what a run over the list would search per (website,
+pincode), leaving out what the result cache still answers, and estimates how
+long it will take from ``SECONDS_PER_SEARCH``.
+"""
+import math
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from http_backend import API_WEBSITES
+from rate_limiter import DEFAULT_RATE_LIMIT, SITE_RATE_LIMITS
+from result_cache import ResultCache, normalize_term
+from scraper import (
+    CACHEABLE_WEBSITES,
+    DEFAULT_MAX_WORKERS,
+    DELIVERY_PINCODE,
+    SHARDABLE_WEBSITES,
+    WEBSITES,
+    cache_path,
+    parse_pincodes,
+    site_searches,
+    store_pincode
+)
+
+# Master_List column of the search terms, and the optional columns that tune each term
+TERM_COLUMN = 'Vegetables'
+WEBSITES_COLUMN = 'Websites'
+PRIORITY_COLUMN = 'Priority'
+PINCODE_COLUMN = 'Pincode'
+
+# Rough seconds one browser search takes on each website, page load and waits included
+SECONDS_PER_SEARCH = {
+    'Agmarknet': 15.0,
+    'BigBasket': 8.0,
+    'DMart': 6.0,
+    'Hyperpure': 5.0,
+    'JioMart': 6.0,
+}
+DEFAULT_SECONDS_PER_SEARCH = 8.0
+
+# Rough seconds one search takes through a website's JSON API
+API_SECONDS_PER_SEARCH = 1.0
+
+PLAN_COLUMNS = ['Website', 'Pincode', 'Terms', 'Cached', 'Searches', 'Browsers', 'Estimated Seconds']
+
+
+def clean_term(value):
+    """Return a cell's text with its whitespace collapsed, or '' for an empty cell."""
+    return '' if value is None else ' '.join(str(value).split())
+
+
+def parse_websites(value, websites=WEBSITES):
+    """Return the known websites named in a comma-separated cell, and the names it did not know."""
+    known = {website.lower(): website for website in websites}
+    names = [name.strip() for name in str(value).replace(';', ',').split(',') if name.strip()]
+    return ([known[name.lower()] for name in names if name.lower() in known],
+            [name for name in names if name.lower() not in known])
+
+
+def merge_choices(first, second):
+    """Combine two rows' websites or pincodes; None (a blank cell) means all of them and wins."""
+    if first is None or second is None:
+        return None
+    return list(dict.fromkeys(first + second))
+
+
+class MasterList:
+    """The distinct search terms of a Master_List, in search order, with what each row asked for."""
+
+    def __init__(self):
+        self.terms = []
+        # First spelling of each normalized term
+        self.spellings = {}
+        self.term_websites = {}
+        self.term_pincodes = {}
+        self.priorities = {}
+        self.rows = 0
+        self.duplicates = 0
+        self.issues = []
+
+    def add(self, term, websites=None, pincodes=None, priority=None):
+        """Add a row's term, merging it into an earlier row with the same term."""
+        self.rows += 1
+        key = normalize_term(term)
+        if key not in self.spellings:
+            self.spellings[key] = term
+            self.terms.append(term)
+            self.priorities[term] = priority
+            self.term_websites[term] = websites
+            self.term_pincodes[term] = pincodes
+            return
+        self.duplicates += 1
+        # The first spelling of a term is the one searched
+        term = self.spellings[key]
+        self.term_websites[term] = merge_choices(self.term_websites[term], websites)
+        self.term_pincodes[term] = merge_choices(self.term_pincodes[term], pincodes)
+        if priority is not None:
+            kept = self.priorities[term]
+            self.priorities[term] = priority if kept is None else min(kept, priority)
+
+    def finish(self):
+        """Order the terms by priority (unnumbered ones last, list order otherwise) and drop blank choices."""
+        self.terms.sort(key=lambda term: (self.priorities[term] is None, self.priorities[term] or 0))
+        self.term_websites = {term: sites for term, sites in self.term_websites.items() if sites is not None}
+        self.term_pincodes = {term: pincodes for term, pincodes in self.term_pincodes.items() if pincodes is not None}
+        return self
+
+    def summary(self):
+        """Return a one-line description of what was read."""
+        text = f"{len(self.terms)} search terms from {self.rows} rows"
+        if self.duplicates:
+            text += f", {self.duplicates} duplicates removed ({self.duplicates / self.rows:.0%} of the searches)"
+        return text
+
+
+def read_master_list(source, websites=WEBSITES):
+    """Stream a Master_List workbook (path or file object) into a `MasterList`."""
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [clean_term(name).lower() for name in next(rows, ())]
+        if TERM_COLUMN.lower() not in header:
+            raise ValueError(f"The Master_List has no '{TERM_COLUMN}' column")
+        columns = {name: header.index(name.lower()) if name.lower() in header else None
+                   for name in [TERM_COLUMN, WEBSITES_COLUMN, PRIORITY_COLUMN, PINCODE_COLUMN]}
+
+        def cell(row, name):
+            index = columns[name]
+            return row[index] if index is not None and index < len(row) else None
+
+        master_list = MasterList()
+        # Row 1 is the header, so data starts on row 2 as in Excel
+        for number, row in enumerate(rows, start=2):
+            term = clean_term(cell(row, TERM_COLUMN))
+            if not term:
+                continue
+
+            sites = None
+            if clean_term(cell(row, WEBSITES_COLUMN)):
+                sites, unknown = parse_websites(cell(row, WEBSITES_COLUMN), websites)
+                if unknown:
+                    master_list.issues.append(f"Row {number}: unknown website(s) {', '.join(unknown)}")
+                if not sites:
+                    master_list.issues.append(f"Row {number}: '{term}' skipped, none of its websites is known")
+                    continue
+
+            priority = cell(row, PRIORITY_COLUMN)
+            if clean_term(priority):
+                try:
+                    priority = float(priority)
+                except (TypeError, ValueError):
+                    master_list.issues.append(f"Row {number}: priority '{priority}' is not a number, ignored")
+                    priority = None
+            else:
+                priority = None
+
+            pincodes = None
+            if clean_term(cell(row, PINCODE_COLUMN)):
+                pincodes = parse_pincodes(cell(row, PINCODE_COLUMN)) or None
+                if pincodes is None:
+                    master_list.issues.append(
+                        f"Row {number}: no valid pincode in '{cell(row, PINCODE_COLUMN)}', the run's are used")
+
+            master_list.add(term, sites, pincodes, priority)
+        return master_list.finish()
+    finally:
+        workbook.close()
+
+
+def work_plan(master_list, selected_websites, pincodes=None, shards=1, max_workers=DEFAULT_MAX_WORKERS,
+              use_api=False, force_refresh=False):
+    """Return the searches a run over the list would make per (website, pincode), and its estimated seconds.
+
+    Terms the result cache still holds are counted as 'Cached' and cost
+    nothing. Each (website, pincode) is split across its browsers, a search
+    never goes faster than the website's starting rate allows, and the work
+    items share `max_workers` browsers.
+    """
+    websites = [website for website in WEBSITES if website in selected_websites]
+    pincodes = list(dict.fromkeys(pincodes or [DELIVERY_PINCODE]))
+    searches = site_searches(websites, master_list.terms, pincodes, master_list.term_websites,
+                             master_list.term_pincodes)
+
+    cache = ResultCache(cache_path)
+    rows = []
+    item_seconds = []
+    try:
+        for (website, pincode), terms in searches.items():
+            cached = 0
+            if not force_refresh and website in CACHEABLE_WEBSITES:
+                cached = sum(cache.get(website, term, store_pincode(website, pincode)) is not None for term in terms)
+            remaining = len(terms) - cached
+
+            api = use_api and website in API_WEBSITES
+            browsers = max(1, min(shards, remaining)) if website in SHARDABLE_WEBSITES and not api else 1
+            seconds_per_search = API_SECONDS_PER_SEARCH if api else \
+                SECONDS_PER_SEARCH.get(website, DEFAULT_SECONDS_PER_SEARCH)
+            # A website's browsers share its rate limit
+            rate = SITE_RATE_LIMITS.get(website, DEFAULT_RATE_LIMIT)['rate']
+            seconds = math.ceil(remaining / browsers) * max(seconds_per_search, browsers / rate)
+            if remaining:
+                item_seconds += [seconds] * browsers
+
+            rows.append({'Website': website, 'Pincode': store_pincode(website, pincode), 'Terms': len(terms),
+                         'Cached': cached, 'Searches': remaining, 'Browsers': browsers,
+                         'Estimated Seconds': round(seconds)})
+    finally:
+        cache.close()
+
+    # The longest work item, or all of them spread over the workers, whichever takes longer
+    workers = max(1, min(max_workers, len(item_seconds)))
+    total = max(max(item_seconds, default=0), sum(item_seconds) / workers)
+    return pd.DataFrame(rows, columns=PLAN_COLUMNS), round(total)
@@ -0,0 +1,218 @@
+"""Incremental on-disk storage for scraped rows and streaming Excel export.
+
+Scrapers hand their rows to a ``RunStore`` as soon as each search term is
+finished. Every (website, term) batch becomes one small CSV chunk, so nothing
+has to be held in memory or re-read while scraping. The ``.xlsx`` deliverables
+are produced once at the end by streaming the chunks into openpyxl's
+write-only workbook, which keeps memory flat however many terms were scraped.
+Typed DataFrames (see ``prices.py``) are written the same way with
+``write_sheets`` and ``export_frames``.
+
+Each finished chunk is also recorded in a journal next to the chunks. When a
+run dies part-way, a new run over the same search terms can reopen the store
+with ``resume=True`` and only scrape the (website, term) pairs still missing.
+
+Websites that deliver to a chosen pincode can store the same term once per
+pincode: ``append``, ``completed_terms`` and ``term_rows`` take the pincode,
+and ``iter_rows`` gives every row the 'Pincode' it was scraped for.
+"""
+import csv
+import json
+import os
+import shutil
+import threading
+import time
+
+from openpyxl import Workbook
+
+JOURNAL_FILE = 'journal.jsonl'
+MANIFEST_FILE = 'run.json'
+
+
+def read_manifest(folder):
+    """Return the manifest of the run stored in `folder`, or an empty dict if there is none."""
+    try:
+        with open(os.path.join(folder, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(folder, search_terms, finished=False):
+    with open(os.path.join(folder, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'search_terms': list(search_terms), 'finished': finished}, f)
+
+
+def read_journal(folder):
+    """Yield the journal entries of the run stored in `folder`, skipping a torn last line."""
+    journal_path = os.path.join(folder, JOURNAL_FILE)
+    if not os.path.exists(journal_path):
+        return
+    with open(journal_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if os.path.exists(os.path.join(folder, entry['chunk'])):
+                yield entry
+
+
+def write_sheets(workbook, sheets):
+    """Append each DataFrame in `sheets` to a write-only workbook as its own sheet."""
+    for name, frame in sheets.items():
+        sheet = workbook.create_sheet(name)
+        sheet.append(list(frame.columns))
+        # Numbers and times stay typed in Excel; missing values become empty cells
+        for values in frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None):
+            sheet.append(list(values))
+
+
+def export_frames(file_path, sheets):
+    """Write DataFrames to a new .xlsx file, one sheet each."""
+    workbook = Workbook(write_only=True)
+    write_sheets(workbook, sheets)
+    workbook.save(file_path)
+    return file_path
+
+
+def resumable_pairs(folder, search_terms):
+    """Return how many (website, pincode, term) searches an unfinished run over `search_terms` could reuse."""
+    manifest = read_manifest(folder)
+    if manifest.get('finished') or manifest.get('search_terms') != list(search_terms):
+        return 0
+    return len({(entry['website'], entry.get('pincode', ''), entry['term']) for entry in read_journal(folder)})
+
+
+class RunStore:
+    """Append-only store of one run's rows, kept as per-term CSV chunks per website (and pincode).
+
+    ``on_append(website, term, rows)`` is called after each chunk is journaled.
+    """
+
+    def __init__(self, folder, search_terms, columns, resume=False, on_append=None):
+        self.folder = folder
+        self.columns = columns
+        self.on_append = on_append
+        self.search_terms = list(search_terms)
+        # Chunks are exported in the order the terms were requested
+        self.term_order = {}
+        for index, term in enumerate(search_terms):
+            self.term_order.setdefault(term, index)
+        self._chunks = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+        if resume and read_manifest(folder).get('search_terms') == self.search_terms:
+            for entry in read_journal(folder):
+                self._register(entry)
+                self._sequence = max(self._sequence, entry['sequence'])
+        else:
+            if os.path.exists(folder):
+                shutil.rmtree(folder)
+            os.makedirs(folder, exist_ok=True)
+        write_manifest(folder, self.search_terms)
+
+    def _register(self, entry):
+        order = (self.term_order.get(entry['term'], len(self.term_order)), entry['sequence'])
+        # A term scraped again for the same pincode replaces its earlier chunk
+        self._chunks.setdefault((entry['website'], entry.get('pincode', '')), {})[entry['term']] = (order, entry)
+
+    def _site_chunks(self, website, pincode=None):
+        """Return a website's chunks for one pincode, or for all of them when `pincode` is None."""
+        return [chunk for (site, site_pincode), chunks in self._chunks.items()
+                if site == website and pincode in (None, site_pincode) for chunk in chunks.values()]
+
+    def append(self, website, term, rows, pincode=''):
+        """Write the rows scraped for one term as a new chunk and return how many were written."""
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+            site_folder = os.path.join(self.folder, website)
+            os.makedirs(site_folder, exist_ok=True)
+
+        chunk = os.path.join(website, f"{sequence:06d}.csv")
+        with open(os.path.join(self.folder, chunk), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns[website], restval='N/A', extrasaction='ignore')
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({**row, 'Source': website})
+
+        # The chunk is complete on disk before the journal says so
+        entry = {'website': website, 'term': term, 'sequence': sequence, 'chunk': chunk, 'rows': len(rows),
+                 'scraped_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        if pincode:
+            entry['pincode'] = pincode
+        with self._lock:
+            with open(os.path.join(self.folder, JOURNAL_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._register(entry)
+        if self.on_append is not None:
+            self.on_append(website, term, rows)
+        return len(rows)
+
+    def mark_finished(self):
+        """Record that the run completed, so it is no longer offered for resuming."""
+        write_manifest(self.folder, self.search_terms, finished=True)
+
+    def completed_terms(self, website, pincode=''):
+        """Return the terms already stored for a website (and pincode)."""
+        with self._lock:
+            return set(self._chunks.get((website, pincode), {}))
+
+    def _entries(self, website):
+        with self._lock:
+            chunks = sorted(self._site_chunks(website), key=lambda chunk: chunk[0])
+        return [entry for _, entry in chunks]
+
+    def chunk_paths(self, website):
+        """Return a website's chunk files in requested term order."""
+        return [os.path.join(self.folder, entry['chunk']) for entry in self._entries(website)]
+
+    def iter_rows(self, website, scraped_at=False):
+        """Yield a website's rows as dicts without loading them all at once.
+
+        With ``scraped_at`` every row also carries the 'Scraped At' time its term was stored.
+        """
+        for entry in self._entries(website):
+            with open(os.path.join(self.folder, entry['chunk']), newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    row['Pincode'] = entry.get('pincode', '')
+                    if scraped_at:
+                        row['Scraped At'] = entry.get('scraped_at')
+                    yield row
+
+    def term_rows(self, website, term, pincode=''):
+        """Return the rows stored for one term, or None if the term has not been stored."""
+        with self._lock:
+            chunk = self._chunks.get((website, pincode), {}).get(term)
+        if chunk is None:
+            return None
+        with open(os.path.join(self.folder, chunk[1]['chunk']), newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def row_count(self, website, pincode=None):
+        with self._lock:
+            return sum(entry['rows'] for _, entry in self._site_chunks(website, pincode))
+
+    def export_xlsx(self, file_path, websites, columns=None, sheets=None):
+        """Stream the rows of the given websites into a new .xlsx file.
+
+        Rows are laid out on ``columns`` (the website's own columns when only
+        one website is exported), with missing cells left empty. ``sheets``
+        maps extra sheet names to DataFrames written after the scraped rows.
+        """
+        if columns is None:
+            columns = self.columns[websites[0]]
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Sheet1')
+        sheet.append(columns)
+        for website in websites:
+            for row in self.iter_rows(website):
+                sheet.append([row.get(column, '') for column in columns])
+        write_sheets(workbook, sheets or {})
+        workbook.save(file_path)
+        return file_path
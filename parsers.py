@@ -0,0 +1,202 @@
+"""One-pass HTML extraction for every website.
+
+The scrapers fetch a page's ``page_source`` (or a container's ``outerHTML``)
+once and hand it to these functions, which read every field locally instead of
+issuing one WebDriver round-trip per element. Selectors are compiled once per
+website and lxml is used as the HTML parser when it is installed.
+"""
+import soupsieve as sv
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+
+def compile_selectors(selectors):
+    return {name: sv.compile(selector) for name, selector in selectors.items()}
+
+
+AGMARKNET_SELECTORS = compile_selectors({
+    # Cells of the innermost (variety price) table
+    'cell': 'table:not(:has(table)) td',
+    'expand_button': 'table[title="Vegetables"] tr > td > input[type="image"]',
+})
+
+BIGBASKET_SELECTORS = compile_selectors({
+    'card': 'div.SKUDeck___StyledDiv-sc-1e5d9gk-0',
+    'brand': 'span.BrandName___StyledLabel2-sc-hssfrl-1',
+    'name': 'h3.block',
+    'price': 'span.Pricing___StyledLabel-sc-pldi2d-1',
+    'original_price': 'span.Pricing___StyledLabel2-sc-pldi2d-2',
+    'discount': 'span.Tags___StyledLabel2-sc-aeruf4-1',
+    'pack_size': 'span.PackChanger___StyledLabel-sc-newjpv-1',
+    'dropdown_item': 'ul[role="listbox"] li div.PackChanger___StyledDiv-sc-newjpv-4',
+    'dropdown_size': 'div.w-3\\/4',
+    'dropdown_price': 'span.PackChanger___StyledLabel4-sc-newjpv-6',
+})
+
+DMART_SELECTORS = compile_selectors({
+    'title': 'div.vertical-card_title__pMGg9',
+    'mrp': 'span[style="text-decoration: line-through;"]',
+    'amount': 'span.vertical-card_amount__80Zwk',
+    'offer': 'div.vertical-card_section-right__4rjsN',
+    'dropdown': 'div.MuiFormControl-root',
+    'option': 'ul.MuiMenu-list li',
+    'option_weight': 'span[style="padding-left: 0px;"]',
+    'option_price': 'span.bootstrap-select_infoTxt-value__kT4zZ',
+})
+
+HYPERPURE_SELECTORS = compile_selectors({
+    'card': 'div.CatalogCard_catalogCard__mGd27',
+    'title': 'div.CatalogCard_truncate__dW5IB',
+    'price': 'span.CatalogCard_price__Pf25D',
+    'offer_tag': 'div.CatalogCard_offerTag__7QmgG',
+    'offer': 'div.CatalogCard_offerV2__V6o1z',
+})
+
+JIOMART_SELECTORS = compile_selectors({
+    'card': '.plp-card-wrapper',
+    'title': 'div.plp-card-details-name',
+    'offer': 'div.plp-card-details-discount',
+    'price': 'span.jm-heading-xxs',
+    'real_price': 'span.jm-body-xxs',
+})
+
+
+def make_soup(html):
+    return BeautifulSoup(html, HTML_PARSER)
+
+
+def text_of(node, selector, default='N/A'):
+    """Return the stripped text of the first match of a compiled selector."""
+    match = selector.select_one(node)
+    return match.get_text().strip() if match is not None else default
+
+
+def agmarknet_detail_rows(node):
+    """Return [variety, max, min, modal] rows from the variety table inside `node`."""
+    cells = [cell.get_text().strip() for cell in AGMARKNET_SELECTORS['cell'].select(node)]
+    return [cells[i:i + 4] for i in range(0, len(cells) - 3, 4)]
+
+
+def parse_agmarknet_details(html):
+    """Return [variety, max, min, modal] rows from an expanded commodity table."""
+    return agmarknet_detail_rows(make_soup(html))
+
+
+def parse_agmarknet_commodities(html):
+    """Return {commodity: detail rows} for the vegetables table, with None for rows not expanded."""
+    selectors = AGMARKNET_SELECTORS
+    commodities = {}
+    for button in selectors['expand_button'].select(make_soup(html)):
+        row = button.parent.parent
+        cells = row.find_all('td', recursive=False)
+        if len(cells) < 2:
+            continue
+        details = row.find_next_sibling('tr')
+        if details is None or details.find('input', type='image') is not None or details.find('table') is None:
+            commodities[cells[1].get_text().strip()] = None
+        else:
+            commodities[cells[1].get_text().strip()] = agmarknet_detail_rows(details)
+    return commodities
+
+
+def parse_bigbasket_cards(html, limit=4):
+    """Return the position, title, prices, discount and pack sizes of the first product cards."""
+    selectors = BIGBASKET_SELECTORS
+    cards = []
+    for index, card in enumerate(selectors['card'].select(make_soup(html), limit=limit)):
+        brand = text_of(card, selectors['brand'], None)
+        name = text_of(card, selectors['name'], None)
+        price = text_of(card, selectors['price'], None)
+        if brand is None or name is None or price is None:
+            continue
+        cards.append({
+            'index': index,
+            'title': f"{brand} {name}",
+            'price': price,
+            'original_price': text_of(card, selectors['original_price']),
+            'discount': text_of(card, selectors['discount']),
+            'pack_sizes': [size.get_text().strip() for size in selectors['pack_size'].select(card)]
+        })
+    return cards
+
+
+def parse_bigbasket_dropdown(html):
+    """Return a product's pack-size dropdown as 'size: price, ...', or 'N/A' if it is empty."""
+    selectors = BIGBASKET_SELECTORS
+    dropdown_prices = [
+        f"{text_of(item, selectors['dropdown_size'], '')}: {text_of(item, selectors['dropdown_price'], '')}"
+        for item in selectors['dropdown_item'].select(make_soup(html))
+    ]
+    return ', '.join(dropdown_prices) if dropdown_prices else 'N/A'
+
+
+def parse_dmart_card(html):
+    """Return the title, prices and offer of a DMart product card, and whether it has a dropdown."""
+    selectors = DMART_SELECTORS
+    soup = make_soup(html)
+    amounts = selectors['amount'].select(soup, limit=2)
+    return {
+        'title': text_of(soup, selectors['title']),
+        'mrp': text_of(soup, selectors['mrp']),
+        'price': amounts[1].get_text().strip() if len(amounts) > 1 else 'N/A',
+        'offer': text_of(soup, selectors['offer']),
+        'has_dropdown': selectors['dropdown'].select_one(soup) is not None
+    }
+
+
+def parse_dmart_dropdown(html):
+    """Return 'weight: price' for every option of an open DMart variant menu."""
+    selectors = DMART_SELECTORS
+    return [
+        f"{text_of(option, selectors['option_weight'])}: {text_of(option, selectors['option_price'])}"
+        for option in selectors['option'].select(make_soup(html))
+    ]
+
+
+def parse_hyperpure(html, term):
+    """Return a row for every product card on a Hyperpure results page."""
+    selectors = HYPERPURE_SELECTORS
+    rows = []
+    for product in selectors['card'].select(make_soup(html)):
+        product_title = text_of(product, selectors['title'], None)
+        price = text_of(product, selectors['price'], None)
+        if product_title is None or price is None:
+            continue
+
+        if selectors['offer_tag'].select_one(product) is not None:
+            supersaver_info = ' | '.join(offer.get_text().strip() for offer in selectors['offer'].select(product))
+        else:
+            supersaver_info = "N/A"
+
+        rows.append({
+            'Search Term': term,
+            'Hyperpure_Product_Title': product_title,
+            'Hyperpure_Price': price,
+            'Hyperpure_Category': product_title.split(",")[0],
+            'Hyperpure_SUPERSAVER_Information': supersaver_info
+        })
+    return rows
+
+
+def parse_jiomart_card(html, term):
+    """Return the row for the first JioMart product card, or None if it lacks a title or price."""
+    selectors = JIOMART_SELECTORS
+    soup = make_soup(html)
+    card = selectors['card'].select_one(soup) or soup
+    title = text_of(card, selectors['title'], None)
+    price = text_of(card, selectors['price'], None)
+    real_price = text_of(card, selectors['real_price'], None)
+    if title is None or price is None or real_price is None:
+        return None
+    return {
+        'Search Term': term,
+        'JioMart_Title': title,
+        'JioMart_Offer': text_of(card, selectors['offer'], 'No offer'),
+        'JioMart_Price': price,
+        'JioMart_Real_Price': real_price
+    }
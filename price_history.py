@@ -0,0 +1,131 @@
+"""Append-only history of the typed prices of every run, for trends across runs.
+
+Each finished run's long dataset (see ``prices.py``) is added to a SQLite
+database outside ``scraped_data/``, so it survives ``clear_previous_data``. A
+run is only ingested once. Rows are indexed by normalized term, day, source and
+pincode, so a term's trend over the last N days is a single index range scan.
+That returns in milliseconds even with a year of daily runs. DMart and JioMart
+rows keep the pincode they were priced for, the other websites' rows an empty
+one, so trends for several cities are kept apart.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from result_cache import normalize_term
+
+TREND_COLUMNS = ['Date', 'Source', 'Pincode', 'Min Price per kg', 'Avg Price per kg', 'Max Price per kg', 'Products']
+
+
+class PriceHistory:
+    """SQLite store of every ingested run's typed prices."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "run_id TEXT PRIMARY KEY, ingested_at REAL NOT NULL, rows INTEGER NOT NULL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS prices ("
+                "run_id TEXT NOT NULL, day TEXT NOT NULL, scraped_at TEXT, term TEXT NOT NULL, "
+                "search_term TEXT, source TEXT NOT NULL, product TEXT, pack TEXT, pack_qty REAL, pack_unit TEXT, "
+                "price REAL, mrp REAL, price_per_kg REAL, offer TEXT, pincode TEXT NOT NULL)")
+            # Trend queries filter on term, day and pincode and group by source, all answered from this index
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS prices_term_day ON prices (term, day, source, pincode, price_per_kg)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS prices_source_day ON prices (source, day)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS prices_day ON prices (day)")
+
+    def ingest(self, run_id, prices):
+        """Add a run's typed prices and return how many rows were stored (0 if the run was already added).
+
+        Rows keep their own 'Pincode'; rows without one (websites whose prices do
+        not depend on the location) are stored under ''.
+        """
+        scraped_at = pd.to_datetime(prices['Scraped At'], errors='coerce')
+        # Rows without a time of their own count as scraped now
+        scraped_at = scraped_at.fillna(pd.Timestamp.now().floor('s'))
+        # A run has few distinct times, so only those are formatted
+        codes, times = pd.factorize(scraped_at)
+        if 'Pincode' in prices:
+            pincodes = prices['Pincode'].astype(object).where(prices['Pincode'].notna(), '')
+        else:
+            pincodes = pd.Series('', index=prices.index, dtype=object)
+        frame = pd.DataFrame({
+            'day': times.strftime('%Y-%m-%d')[codes],
+            'scraped_at': times.strftime('%Y-%m-%dT%H:%M:%S')[codes],
+            'term': prices['Search Term'].astype('category').map(normalize_term),
+            'search_term': prices['Search Term'],
+            'source': prices['Source'],
+            'product': prices['Product'],
+            'pack': prices['Pack'],
+            'pack_qty': prices['Pack Qty'],
+            'pack_unit': prices['Pack Unit'],
+            'price': prices['Price'],
+            'mrp': prices['MRP'],
+            'price_per_kg': prices['Price per kg'],
+            'offer': prices['Offer'],
+            'pincode': pincodes,
+        }, index=prices.index).astype(object)
+        frame = frame.where(frame.notna(), None)
+        records = [(run_id, *values) for values in frame.itertuples(index=False, name=None)]
+
+        with self._lock, self._connection:
+            if self._connection.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone():
+                return 0
+            self._connection.executemany(
+                "INSERT INTO prices (run_id, day, scraped_at, term, search_term, source, product, pack, pack_qty, "
+                "pack_unit, price, mrp, price_per_kg, offer, pincode) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records)
+            self._connection.execute("INSERT INTO runs (run_id, ingested_at, rows) VALUES (?, ?, ?)",
+                                     (run_id, time.time(), len(records)))
+        return len(records)
+
+    def terms(self):
+        """Return every normalized search term with history, alphabetically."""
+        with self._lock:
+            return [term for (term,) in self._connection.execute("SELECT DISTINCT term FROM prices ORDER BY term")]
+
+    def pincodes(self, term):
+        """Return the delivery pincodes a term was priced for, in order."""
+        with self._lock:
+            return [pincode for (pincode,) in self._connection.execute(
+                "SELECT DISTINCT pincode FROM prices WHERE term = ? AND pincode != '' ORDER BY pincode",
+                (normalize_term(term),))]
+
+    def trend(self, term, days=30, sources=None, pincode=None):
+        """Return one row per day, source and pincode with the term's min/avg/max price per kg over `days` days.
+
+        With `pincode`, only that city's DMart and JioMart prices are kept,
+        next to the websites whose prices do not depend on the location.
+        """
+        since = time.strftime('%Y-%m-%d', time.localtime(time.time() - days * 86400))
+        query = ("SELECT day, source, pincode, MIN(price_per_kg), AVG(price_per_kg), MAX(price_per_kg), "
+                 "COUNT(DISTINCT product) FROM prices WHERE term = ? AND day >= ? AND price_per_kg IS NOT NULL")
+        params = [normalize_term(term), since]
+        if sources:
+            query += f" AND source IN ({', '.join('?' for _ in sources)})"
+            params.extend(sources)
+        if pincode is not None:
+            query += " AND pincode IN (?, '')"
+            params.append(pincode)
+        query += " GROUP BY day, source, pincode ORDER BY day, source, pincode"
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        trend = pd.DataFrame(rows, columns=TREND_COLUMNS)
+        trend['Date'] = pd.to_datetime(trend['Date'])
+        return trend.round({'Avg Price per kg': 2})
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
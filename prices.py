@@ -0,0 +1,251 @@
+"""Typed, long-format prices built from the text the scrapers store.
+
+Websites show prices as text ("₹45", "₹1,240.00") and variant menus as lists
+("500 g: ₹30, 1 kg: ₹58"). ``normalize_prices`` turns a website's rows into
+one row per product pack with numeric price, MRP, pack size and price per kg.
+Every website shares this one schema (``PRICE_COLUMNS``) and the repeated text
+columns are categoricals, so the rows of all websites combine into a compact
+long dataset (``combine_prices``). Cross-site comparisons are group-bys on it,
+and the wide per-term views are only built when they are exported
+(``comparison_view``, and ``city_matrix`` when several pincodes were priced).
+
+``normalize_batches`` reads a website's stored rows a batch of terms at a time,
+so only the compact typed rows of a run are held in memory, never all of its
+scraped text. The typed rows themselves are kept until the master file is
+written, because the comparison views and the price history need all of them.
+
+Everything is done with vectorized pandas string operations on the distinct
+values only (scraped prices and packs repeat a lot), backed by pyarrow when it
+is installed, so tens of thousands of rows take a fraction of a second.
+"""
+from itertools import groupby
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    STRING_DTYPE = 'string'
+
+# 'Pincode' is the delivery pincode of websites priced per location, empty for the others
+PRICE_COLUMNS = ['Search Term', 'Source', 'Pincode', 'Product', 'Pack', 'Pack Qty', 'Pack Unit', 'Price', 'MRP',
+                 'Price per kg', 'Offer', 'Scraped At']
+
+# Text columns whose values repeat from row to row, stored as categoricals
+CATEGORY_COLUMNS = ['Search Term', 'Source', 'Pincode', 'Product', 'Pack', 'Pack Unit', 'Offer']
+
+NUMBER_COLUMNS = ['Pack Qty', 'Price', 'MRP', 'Price per kg']
+
+# Where each website keeps the fields its typed rows are built from. 'pack' names a
+# column holding the pack size (the product title is searched when it has none) and
+# 'options' a 'size: price, ...' list that becomes one row per pack.
+PRICE_FIELDS = {
+    'Agmarknet': {'product': ['Agmarknet_Commodity', 'Agmarknet_Variety'], 'price': 'Agmarknet_Modal',
+                  'mrp': None, 'offer': None, 'pack': None, 'options': None},
+    'BigBasket': {'product': ['BigBasket_Title'], 'price': 'BigBasket_Price', 'mrp': 'BigBasket_Original_Price',
+                  'offer': 'BigBasket_Discount', 'pack': 'BigBasket_Pack_Size', 'options': 'BigBasket_Dropdown_Prices'},
+    'DMart': {'product': ['DMart_Title'], 'price': 'DMart_Price', 'mrp': 'DMart_MRP', 'offer': 'DMart_Offer',
+              'pack': None, 'options': 'DMart_Dropdown_Options'},
+    'Hyperpure': {'product': ['Hyperpure_Product_Title'], 'price': 'Hyperpure_Price', 'mrp': None,
+                  'offer': 'Hyperpure_SUPERSAVER_Information', 'pack': None, 'options': None},
+    'JioMart': {'product': ['JioMart_Title'], 'price': 'JioMart_Price', 'mrp': 'JioMart_Real_Price',
+                'offer': 'JioMart_Offer', 'pack': None, 'options': None},
+}
+
+# Agmarknet quotes wholesale prices per quintal
+DEFAULT_PACKS = {'Agmarknet': '1 quintal'}
+
+# Scraped rows normalized at a time; batches end between terms so a term's packs stay together
+NORMALIZE_BATCH_ROWS = 5000
+
+# Text the scrapers store when a field is missing
+MISSING_VALUES = ['', 'N/A', 'No offer']
+
+AMOUNT_PATTERN = r'(\d[\d,]*(?:\.\d+)?)'
+
+# e.g. '500 g', '1 Kg', '2 x 250 gm', '1.5 ltr', '6 pcs'
+PACK_PATTERN = (r'(?i)(?P<pack>(?:(?P<count>\d+)\s*[x×]\s*)?(?P<qty>\d+(?:\.\d+)?)\s*'
+                r'(?P<unit>kgs?|gms?|grams?|g|quintals?|qtl|ltrs?|litres?|liters?|l|ml|pcs?|pieces?)\b)')
+
+OPTION_PATTERN = r'^\s*(?P<pack>[^:]+?)\s*:\s*(?P<price>.+)$'
+
+# Canonical unit and the factor that converts a pack unit into it
+UNITS = {
+    'kg': ('kg', 1.0), 'kgs': ('kg', 1.0),
+    'g': ('kg', 0.001), 'gm': ('kg', 0.001), 'gms': ('kg', 0.001), 'gram': ('kg', 0.001), 'grams': ('kg', 0.001),
+    'quintal': ('kg', 100.0), 'quintals': ('kg', 100.0), 'qtl': ('kg', 100.0),
+    'l': ('l', 1.0), 'ltr': ('l', 1.0), 'ltrs': ('l', 1.0), 'litre': ('l', 1.0), 'litres': ('l', 1.0),
+    'liter': ('l', 1.0), 'liters': ('l', 1.0), 'ml': ('l', 0.001),
+    'pc': ('pc', 1.0), 'pcs': ('pc', 1.0), 'piece': ('pc', 1.0), 'pieces': ('pc', 1.0),
+}
+
+# Commas between options, not the ones inside an amount like ₹1,240
+OPTION_SEPARATOR = r',\s*(?=[^,:]+:)'
+
+
+def text_column(frame, column):
+    """Return a column as strings with the missing-value markers turned into NA."""
+    if column is None or column not in frame:
+        return pd.Series(pd.NA, index=frame.index, dtype=STRING_DTYPE)
+    values = frame[column].astype(STRING_DTYPE).str.strip()
+    return values.mask(values.isin(MISSING_VALUES))
+
+
+def per_distinct(parse):
+    """Make a parser of string Series run once per distinct value and spread the result over every row."""
+    def parse_distinct(values):
+        codes, uniques = pd.factorize(values)
+        # NA rows (code -1) read the extra NA value appended to the distinct ones
+        distinct = pd.Series(list(uniques) + [pd.NA], dtype=STRING_DTYPE)
+        codes = np.where(codes < 0, len(uniques), codes)
+        return parse(distinct).iloc[codes].set_axis(values.index)
+    return parse_distinct
+
+
+@per_distinct
+def amounts(values):
+    """Return the first currency amount in each string as a float, NaN where there is none."""
+    found = values.str.extract(AMOUNT_PATTERN, expand=False)
+    return pd.to_numeric(found.str.replace(',', '', regex=False), errors='coerce').astype('float64')
+
+
+@per_distinct
+def pack_sizes(values):
+    """Return the pack text found in each string, its quantity (in kg, litres or pieces) and unit."""
+    found = values.str.extract(PACK_PATTERN)
+    unit = found['unit'].str.lower()
+    factor = unit.map({name: factor for name, (_, factor) in UNITS.items()}).astype('float64')
+    count = pd.to_numeric(found['count'], errors='coerce').fillna(1.0)
+    quantity = pd.to_numeric(found['qty'], errors='coerce') * count * factor
+    return pd.DataFrame({
+        'Pack': found['pack'],
+        'Pack Qty': quantity.astype('float64'),
+        'Pack Unit': unit.map({name: canonical for name, (canonical, _) in UNITS.items()}).astype(STRING_DTYPE),
+    }, index=values.index)
+
+
+@per_distinct
+def split_options(values):
+    """Return the pack and price text of each 'size: price' option."""
+    return values.str.extract(OPTION_PATTERN)
+
+
+def with_price_dtypes(frame):
+    """Return `frame` with categorical text columns, float numbers and datetime 'Scraped At'."""
+    frame = frame.astype({column: 'category' for column in CATEGORY_COLUMNS})
+    frame = frame.astype({column: 'float64' for column in NUMBER_COLUMNS})
+    frame['Scraped At'] = pd.to_datetime(frame['Scraped At'], errors='coerce')
+    return frame
+
+
+def empty_prices():
+    return with_price_dtypes(pd.DataFrame({column: pd.Series(dtype=object) for column in PRICE_COLUMNS}))
+
+
+def normalize_prices(website, rows):
+    """Return a website's scraped rows as typed rows, one per product pack (see ``PRICE_COLUMNS``).
+
+    Rows read with ``RunStore.iter_rows(website, scraped_at=True)`` keep the time they were scraped.
+    """
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+    if frame.empty:
+        return empty_prices()
+    frame = frame.reset_index(drop=True)
+    fields = PRICE_FIELDS[website]
+
+    product = text_column(frame, fields['product'][0])
+    for column in fields['product'][1:]:
+        product = product.str.cat(text_column(frame, column), sep=' - ', na_rep='').str.rstrip(' -')
+
+    pack = text_column(frame, fields['pack']).fillna(product)
+    if website in DEFAULT_PACKS:
+        pack = pack.where(pack_sizes(pack)['Pack Qty'].notna(), DEFAULT_PACKS[website])
+
+    typed = pd.DataFrame({
+        'Search Term': text_column(frame, 'Search Term'),
+        'Source': pd.Series(website, index=frame.index, dtype=STRING_DTYPE),
+        'Pincode': text_column(frame, 'Pincode'),
+        'Product': product,
+        'Pack': pack,
+        'Price': amounts(text_column(frame, fields['price'])),
+        'MRP': amounts(text_column(frame, fields['mrp'])),
+        'Offer': text_column(frame, fields['offer']),
+        'Scraped At': text_column(frame, 'Scraped At'),
+    })
+
+    if fields['options'] is not None:
+        # One row per 'size: price' option; rows without options keep their own pack and price
+        options = text_column(frame, fields['options']).str.split(OPTION_SEPARATOR, regex=True).explode()
+        typed = typed.loc[options.index].reset_index(drop=True)
+        option = split_options(options.reset_index(drop=True).astype(STRING_DTYPE))
+        option_price = amounts(option['price'])
+        has_option = option_price.notna()
+        # The MRP shown belongs to the option the card has selected, the one sold at the card's price
+        typed['MRP'] = typed['MRP'].mask(has_option & (option_price != typed['Price']))
+        typed['Pack'] = typed['Pack'].mask(has_option, option['pack'])
+        typed['Price'] = typed['Price'].mask(has_option, option_price)
+        # BigBasket stores one row per pack size, each carrying the same option list
+        typed = typed.drop_duplicates(['Search Term', 'Pincode', 'Product', 'Pack', 'Price'], ignore_index=True)
+
+    # Titles like 'Onion Hybrid, 1 Kg' are cut down to the pack they name
+    typed = pd.concat([typed.drop(columns='Pack'), pack_sizes(typed['Pack'])], axis=1)
+    per_kg = typed['Price'] / typed['Pack Qty']
+    typed['Price per kg'] = per_kg.where(typed['Pack Unit'].eq('kg').fillna(False)).astype('float64').round(2)
+    return with_price_dtypes(typed[PRICE_COLUMNS])
+
+
+def normalize_batches(website, rows, batch_rows=NORMALIZE_BATCH_ROWS):
+    """Return `normalize_prices` of an iterable of rows, reading about `batch_rows` rows at a time."""
+    frames = []
+    batch = []
+    for _, term_rows in groupby(rows, key=lambda row: (row.get('Search Term'), row.get('Pincode'))):
+        batch.extend(term_rows)
+        if len(batch) >= batch_rows:
+            frames.append(normalize_prices(website, batch))
+            batch = []
+    if batch or not frames:
+        frames.append(normalize_prices(website, batch))
+    return combine_prices(frames)
+
+
+def combine_prices(frames):
+    """Stack the typed rows of several websites into one long dataset."""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return empty_prices()
+    # Categoricals with different categories concatenate as objects, so they are re-categorized
+    return with_price_dtypes(pd.concat(frames, ignore_index=True))
+
+
+def comparison_view(prices):
+    """Return the wide view: one row per search term with each website's cheapest price per kg and product."""
+    priced = prices.dropna(subset=['Price per kg'])
+    if priced.empty:
+        return pd.DataFrame({'Search Term': pd.Series(dtype=object)})
+    cheapest = priced.loc[priced.groupby(['Search Term', 'Source'], observed=True)['Price per kg'].idxmin()]
+    wide = cheapest.pivot(index='Search Term', columns='Source', values=['Price per kg', 'Product'])
+    sources = [source for source in prices['Source'].cat.categories if source in wide.columns.levels[1]]
+    columns = [(value, source) for source in sources for value in ['Price per kg', 'Product']]
+    wide = wide.reindex(columns=columns)
+    wide.columns = [f"{source} {value}" for value, source in columns]
+    return wide.reset_index().astype({'Search Term': object})
+
+
+def city_matrix(prices):
+    """Return the cheapest price per kg of every search term at each website and pincode, one column each.
+
+    Columns are named 'DMart 122001'; websites whose prices do not depend on the
+    pincode get a single column named after the website.
+    """
+    priced = prices.dropna(subset=['Price per kg'])
+    if priced.empty:
+        return pd.DataFrame({'Search Term': pd.Series(dtype=object)})
+    places = priced[['Source', 'Pincode']].drop_duplicates().sort_values(['Source', 'Pincode'])
+    labels = places['Source'].astype(object).str.cat(places['Pincode'].astype(object), sep=' ', na_rep='').str.strip()
+    place = priced['Source'].astype(object).str.cat(priced['Pincode'].astype(object), sep=' ', na_rep='').str.strip()
+    matrix = priced['Price per kg'].groupby([priced['Search Term'].astype(object), place]).min().unstack()
+    matrix = matrix.reindex(columns=list(dict.fromkeys(labels)))
+    matrix.columns.name = None
+    return matrix.reset_index()
@@ -0,0 +1,176 @@
+"""Link the products the websites return to the Master_List vegetables.
+
+Every website names its products its own way ("Fresho Tomato - Hybrid, 1 kg",
+"Tomato Local", "Tamatar Desi"). ``MatchIndex`` is built once from the search
+terms and scores every product title against all of them in bulk:
+
+- titles and terms are normalized the same way: lower case, pack sizes and
+  marketing words dropped, Hindi names replaced by their English ones
+  (``SYNONYMS``) and plurals made singular;
+- each name becomes the set of trigrams of its words, and the index keeps, per
+  trigram, the terms that contain it;
+- a title's trigrams are looked up in the index with numpy, which counts the
+  trigrams it shares with every term at once, so there is no loop over
+  (title, term) pairs and each distinct title is scored only once.
+
+The score mixes how much of the term the title contains with how alike the two
+are overall, so "Tomato Hybrid" prefers the term "Tomato Hybrid" over "Tomato".
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from prices import PACK_PATTERN, STRING_DTYPE, per_distinct
+
+# English name of each vegetable and the other names websites and lists use for it
+SYNONYMS = {
+    'tomato': ['tamatar', 'tamator'],
+    'onion': ['pyaz', 'pyaaz', 'piyaz', 'kanda'],
+    'potato': ['aloo', 'alu', 'batata'],
+    'garlic': ['lahsun', 'lehsun', 'lasun'],
+    'ginger': ['adrak', 'adrakh'],
+    'green chilli': ['hari mirch', 'green chili', 'green chillies'],
+    'capsicum': ['shimla mirch', 'bell pepper'],
+    'brinjal': ['baingan', 'baigan', 'eggplant'],
+    'lady finger': ['bhindi', 'okra', 'ladies finger', 'ladyfinger'],
+    'cauliflower': ['phool gobhi', 'phool gobi', 'gobhi', 'gobi'],
+    'cabbage': ['patta gobhi', 'patta gobi', 'band gobhi'],
+    'spinach': ['palak'],
+    'fenugreek': ['methi'],
+    'coriander': ['dhaniya', 'dhania', 'cilantro'],
+    'mint': ['pudina'],
+    'carrot': ['gajar'],
+    'radish': ['mooli', 'muli'],
+    'cucumber': ['kheera', 'khira'],
+    'bottle gourd': ['lauki', 'ghiya', 'doodhi'],
+    'bitter gourd': ['karela'],
+    'ridge gourd': ['turai', 'tori', 'torai'],
+    'pumpkin': ['kaddu', 'sitaphal'],
+    'sweet potato': ['shakarkandi', 'shakarkand'],
+    'peas': ['matar', 'mutter'],
+    'french beans': ['beans'],
+    'drumstick': ['sahjan', 'moringa'],
+    'beetroot': ['chukandar'],
+    'lemon': ['nimbu', 'neembu'],
+    'colocasia': ['arbi', 'arvi'],
+    'jackfruit': ['kathal'],
+}
+
+# Words that say nothing about which vegetable a product is
+NOISE_WORDS = ['fresho', 'fresh', 'premium', 'loose', 'approx', 'pack', 'pc', 'pcs']
+
+# Scores below this leave the product without a vegetable
+MIN_MATCH_SCORE = 0.5
+
+# Weight of "how much of the term is in the title" against overall likeness
+CONTAINMENT_WEIGHT = 2 / 3
+
+# Titles scored together; bounds the title-by-term count matrix
+CHUNK_SIZE = 2000
+
+SYNONYM_NAMES = {name: english for english, names in SYNONYMS.items() for name in names}
+
+# Longest names first, so 'patta gobhi' wins over 'gobhi'
+SYNONYM_PATTERN = r'\b(?:' + '|'.join(
+    re.escape(name) for name in sorted(SYNONYM_NAMES, key=len, reverse=True)) + r')\b'
+
+NOISE_PATTERN = r'\b(?:' + '|'.join(NOISE_WORDS) + r')\b'
+
+# 'tomatoes' -> 'tomato', 'onions' -> 'onion' (not 'grass' or 'asparagus')
+PLURAL_PATTERN = r'(?<=\w\w\wo)es\b|(?<=\w\w\w[^su\W])s\b'
+
+
+@per_distinct
+def normalize_names(values):
+    """Return product titles or terms reduced to the words that name the vegetable."""
+    names = values.str.lower().str.replace(PACK_PATTERN, ' ', regex=True)
+    names = names.str.replace(r'[\W\d_]+', ' ', regex=True)
+    names = names.astype(object).str.replace(SYNONYM_PATTERN, lambda found: SYNONYM_NAMES[found.group(0)],
+                                              regex=True)
+    names = names.str.replace(NOISE_PATTERN, ' ', regex=True).str.replace(PLURAL_PATTERN, '', regex=True)
+    return names.str.split().str.join(' ').astype(STRING_DTYPE)
+
+
+def trigrams(name):
+    """Return the distinct trigrams of the words of a normalized name, each word padded with spaces."""
+    return {f' {word} '[index:index + 3] for word in name.split() for index in range(len(word))}
+
+
+class MatchIndex:
+    """Trigram index of the search terms that scores product titles against all of them at once."""
+
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(term for term in terms if isinstance(term, str) and term.strip()))
+        names = normalize_names(pd.Series(self.terms, dtype=STRING_DTYPE)).fillna('')
+        term_grams = [trigrams(name) for name in names]
+
+        self.grams = {}
+        postings = {}
+        for term_id, grams in enumerate(term_grams):
+            for gram in grams:
+                postings.setdefault(self.grams.setdefault(gram, len(self.grams)), []).append(term_id)
+
+        # Terms containing each trigram, laid out back to back and found through offsets
+        counts = np.array([len(postings[gram_id]) for gram_id in range(len(self.grams))], dtype=np.int64)
+        self.posting_starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        self.posting_counts = counts
+        self.posting_terms = np.array([term_id for gram_id in range(len(self.grams)) for term_id in postings[gram_id]],
+                                      dtype=np.int64)
+        self.term_sizes = np.array([len(grams) for grams in term_grams], dtype=np.float64)
+        self.containment_weights = (CONTAINMENT_WEIGHT / np.maximum(self.term_sizes, 1)).astype(np.float32)
+
+    def _score_chunk(self, names):
+        """Return the best term and score for each of a chunk of normalized titles."""
+        title_grams = [trigrams(name) for name in names]
+        title_sizes = np.array([len(grams) for grams in title_grams], dtype=np.float64)
+        known = [[self.grams[gram] for gram in grams if gram in self.grams] for grams in title_grams]
+        title_ids = np.repeat(np.arange(len(names)), [len(ids) for ids in known])
+        gram_ids = np.fromiter((gram_id for ids in known for gram_id in ids), dtype=np.int64, count=len(title_ids))
+
+        # Pair every (title, trigram) with every term holding that trigram, then count the pairs per (title, term)
+        counts = self.posting_counts[gram_ids]
+        ends = np.cumsum(counts)
+        positions = np.repeat(self.posting_starts[gram_ids] - ends + counts, counts) + np.arange(counts.sum())
+        pairs = np.repeat(title_ids, counts) * len(self.terms) + self.posting_terms[positions]
+        shared = np.bincount(pairs, minlength=len(names) * len(self.terms)).reshape(len(names), len(self.terms))
+        shared = shared.astype(np.float32)
+
+        # CONTAINMENT_WEIGHT * shared / term size + (1 - CONTAINMENT_WEIGHT) * 2 * shared / (title size + term size)
+        likeness = np.add.outer(title_sizes, self.term_sizes).astype(np.float32)
+        np.maximum(likeness, 1, out=likeness)
+        np.divide(2 * (1 - CONTAINMENT_WEIGHT), likeness, out=likeness)
+        likeness += self.containment_weights
+        scores = np.multiply(shared, likeness, out=shared)
+        best = scores.argmax(axis=1)
+        return best, scores[np.arange(len(names)), best]
+
+    def match(self, titles):
+        """Return the best matching term ('Vegetable') and its 'Match Score' (0-1) for every title."""
+        titles = pd.Series(titles)
+        codes, distinct = pd.factorize(titles)
+        best = np.zeros(len(distinct), dtype=np.int64)
+        scores = np.zeros(len(distinct), dtype=np.float64)
+        if self.terms and len(distinct):
+            names = normalize_names(pd.Series(distinct, dtype=STRING_DTYPE)).fillna('').tolist()
+            for start in range(0, len(names), CHUNK_SIZE):
+                chunk = slice(start, start + CHUNK_SIZE)
+                best[chunk], scores[chunk] = self._score_chunk(names[chunk])
+
+        vegetables = np.array(self.terms, dtype=object)[best] if self.terms else np.full(len(distinct), None)
+        vegetables[scores < MIN_MATCH_SCORE] = None
+        # NA titles (code -1) get no vegetable and a score of 0
+        vegetables = np.append(vegetables, None)[codes]
+        scores = np.append(scores.round(2), 0.0)[codes]
+        return pd.DataFrame({'Vegetable': pd.Series(vegetables, index=titles.index, dtype='category'),
+                             'Match Score': pd.Series(scores, index=titles.index)})
+
+
+def with_vegetables(prices, terms):
+    """Return typed prices with the matched Master_List vegetable and its score after 'Product'."""
+    matches = MatchIndex(terms).match(prices['Product'])
+    position = prices.columns.get_loc('Product') + 1
+    prices = prices.copy()
+    prices.insert(position, 'Vegetable', matches['Vegetable'])
+    prices.insert(position + 1, 'Match Score', matches['Match Score'])
+    return prices
@@ -0,0 +1,270 @@
+"""Adaptive per-website pacing of searches.
+
+Every website gets its own limiter, which combines a token bucket (how many
+searches may start per second) with a cap on how many browsers may search the
+website at the same time. Both adapt with AIMD:
+
+- each healthy search adds a small step to the rate, and every few healthy
+  searches in a row let one more browser back in;
+- a timeout, captcha or error page halves the rate and the browser cap, and
+  pauses the website for a cool-down.
+
+This keeps each website at the fastest pace it tolerates without hand-tuned
+sleeps in the scrapers. The learned rates outlive a run, so the next run in
+the same process starts where the previous one settled.
+
+Browser threads use ``worker()`` and ``pace()``; the coroutines of the CDP
+engine use ``worker_async()`` and ``pace_async()``, which wait without blocking
+the event loop.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from jobs import ScrapeCancelled, stop_requested
+
+# Searches per second each website starts at, and the range it may adapt within
+SITE_RATE_LIMITS = {
+    'Agmarknet': {'rate': 0.5, 'min_rate': 0.1, 'max_rate': 2.0, 'burst': 2},
+    'BigBasket': {'rate': 1.0, 'min_rate': 0.1, 'max_rate': 5.0, 'burst': 3},
+    'DMart': {'rate': 1.0, 'min_rate': 0.1, 'max_rate': 5.0, 'burst': 3},
+    'Hyperpure': {'rate': 1.0, 'min_rate': 0.1, 'max_rate': 5.0, 'burst': 3},
+    'JioMart': {'rate': 1.0, 'min_rate': 0.1, 'max_rate': 5.0, 'burst': 3},
+}
+DEFAULT_RATE_LIMIT = {'rate': 1.0, 'min_rate': 0.1, 'max_rate': 5.0, 'burst': 3}
+
+# Searches per second added after every healthy search
+RATE_INCREASE = 0.1
+
+# Rate and browser cap are multiplied by this when a website pushes back
+BACKOFF_FACTOR = 0.5
+
+# Seconds a website is left alone after it pushed back
+COOLDOWN_SECONDS = 5.0
+
+# Healthy searches in a row before one more browser may search the website
+SUCCESSES_PER_WORKER = 5
+
+# Longest a waiting worker sleeps before checking for Stop again
+STOP_POLL_SECONDS = 0.5
+
+# Text on a captcha, block or error page (matched case-insensitively)
+BLOCK_MARKERS = [
+    'captcha',
+    'are you a robot',
+    'verify you are human',
+    'unusual traffic',
+    'access denied',
+    'request blocked',
+    'too many requests',
+    'service unavailable',
+    'bad gateway',
+    'gateway timeout',
+]
+
+# HTTP statuses an API answers with when it is throttling us
+THROTTLE_STATUS_CODES = [403, 429, 502, 503, 504]
+
+
+def blocked_marker(text):
+    """Return the block marker found in a page's title or text, or None."""
+    text = (text or '').lower()
+    return next((marker for marker in BLOCK_MARKERS if marker in text), None)
+
+
+class SiteLimiter:
+    """Token bucket and browser cap for one website, adapted by AIMD."""
+
+    def __init__(self, website, rate, min_rate, max_rate, burst):
+        self.website = website
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.tokens = burst
+        self.refilled_at = time.monotonic()
+        self.paused_until = 0.0
+        self.max_workers = 1
+        self.worker_limit = 1
+        self.active = 0
+        self.streak = 0
+        self.searches = 0
+        self.backoffs = 0
+        self.seconds_throttled = 0.0
+        # Whether the calling thread or task is one of the website's browsers
+        self._registered = contextvars.ContextVar(f'{website}_worker', default=False)
+        self._condition = threading.Condition()
+
+    def start_run(self, max_workers):
+        """Allow up to `max_workers` browsers for the coming run and clear the run's counters.
+
+        The learned rate is kept; the browser cap starts from the full allowance again.
+        """
+        with self._condition:
+            self.max_workers = max(1, max_workers)
+            self.worker_limit = self.max_workers
+            self.searches = 0
+            self.backoffs = 0
+            self.seconds_throttled = 0.0
+            self._condition.notify_all()
+
+    def _wait(self, timeout):
+        if stop_requested():
+            raise ScrapeCancelled(f"Stopped while pacing {self.website}")
+        self._condition.wait(min(timeout, STOP_POLL_SECONDS))
+
+    @contextmanager
+    def worker(self):
+        """Count the calling thread as one of the browsers searching this website."""
+        with self._condition:
+            while self.active >= self.worker_limit:
+                self._wait(STOP_POLL_SECONDS)
+            self.active += 1
+        registered = self._registered.set(True)
+        try:
+            yield self
+        finally:
+            self._registered.reset(registered)
+            self._release()
+
+    @asynccontextmanager
+    async def worker_async(self):
+        """Count the calling task as one of the tabs searching this website."""
+        while True:
+            if stop_requested():
+                raise ScrapeCancelled(f"Stopped while pacing {self.website}")
+            with self._condition:
+                if self.active < self.worker_limit:
+                    self.active += 1
+                    break
+            await asyncio.sleep(STOP_POLL_SECONDS)
+        registered = self._registered.set(True)
+        try:
+            yield self
+        finally:
+            self._registered.reset(registered)
+            self._release()
+
+    def _release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def _take_token(self):
+        """Take a token and return 0, or return the seconds until one is free. The caller holds the condition."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def _paced(self, start):
+        """Count a search that waited since `start` and return the seconds waited. The caller holds the condition."""
+        self.searches += 1
+        waited = time.monotonic() - start
+        self.seconds_throttled += waited
+        return waited
+
+    def pace(self):
+        """Block until the calling worker may send its next request to the website.
+
+        Returns the seconds spent waiting.
+        """
+        start = time.monotonic()
+        with self._condition:
+            if self._registered.get() and self.active > self.worker_limit:
+                # Too many browsers on this website: step aside until one finishes
+                self.active -= 1
+                self._condition.notify_all()
+                try:
+                    while self.active >= self.worker_limit:
+                        self._wait(STOP_POLL_SECONDS)
+                finally:
+                    self.active += 1
+
+            while True:
+                wait = self._take_token()
+                if not wait:
+                    return self._paced(start)
+                self._wait(wait)
+
+    async def pace_async(self):
+        """Wait, without blocking the event loop, until the calling task may send its next request.
+
+        Returns the seconds spent waiting. Tabs over the browser cap finish their
+        current term; the cap holds back the next tab to start.
+        """
+        start = time.monotonic()
+        while True:
+            if stop_requested():
+                raise ScrapeCancelled(f"Stopped while pacing {self.website}")
+            with self._condition:
+                wait = self._take_token()
+                if not wait:
+                    return self._paced(start)
+            await asyncio.sleep(min(wait, STOP_POLL_SECONDS))
+
+    def succeeded(self):
+        """Additive increase after a healthy response."""
+        with self._condition:
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+            self.streak += 1
+            if self.streak >= SUCCESSES_PER_WORKER and self.worker_limit < self.max_workers:
+                self.worker_limit += 1
+                self.streak = 0
+                self._condition.notify_all()
+
+    def back_off(self, reason):
+        """Multiplicative decrease and a cool-down after the website pushed back."""
+        with self._condition:
+            self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+            self.worker_limit = max(1, int(self.worker_limit * BACKOFF_FACTOR))
+            self.paused_until = time.monotonic() + COOLDOWN_SECONDS
+            self.tokens = 0
+            self.streak = 0
+            self.backoffs += 1
+            rate, workers = self.rate, self.worker_limit
+        print(f"Slowing down {self.website} ({reason}): {rate:.2f} searches/s, {workers} browser(s)")
+
+    def stats(self):
+        with self._condition:
+            return {
+                'Website': self.website,
+                'Searches': self.searches,
+                'Backoffs': self.backoffs,
+                'Searches/s': round(self.rate, 2),
+                'Browsers': self.worker_limit,
+                'Seconds Throttled': round(self.seconds_throttled, 2),
+            }
+
+
+class RateLimiter:
+    """The `SiteLimiter` of every website, created on first use."""
+
+    def __init__(self, limits=None):
+        self.limits = SITE_RATE_LIMITS if limits is None else limits
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def site(self, website):
+        with self._lock:
+            if website not in self._sites:
+                self._sites[website] = SiteLimiter(website, **self.limits.get(website, DEFAULT_RATE_LIMIT))
+            return self._sites[website]
+
+    def start_run(self, site_workers):
+        """Set how many browsers each website may use this run, e.g. ``{'DMart': 4}``."""
+        for website, workers in site_workers.items():
+            self.site(website).start_run(workers)
+
+    def report(self):
+        """Return one row of pacing statistics per website used so far."""
+        with self._lock:
+            sites = list(self._sites.values())
+        return [limiter.stats() for limiter in sites]
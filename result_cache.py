@@ -0,0 +1,92 @@
+"""Persistent cache of scraped rows so repeated terms and reruns skip the websites.
+
+Results are kept in a small SQLite database keyed by website, normalized search
+term and delivery pincode; websites whose prices do not depend on the location
+are cached under an empty pincode. Each website has its own time-to-live, and the
+oldest entries are evicted once the cache grows past ``max_entries``.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Hours a cached result stays fresh for each website
+DEFAULT_TTL_HOURS = {
+    'Agmarknet': 12,
+    'BigBasket': 6,
+    'DMart': 6,
+    'Hyperpure': 6,
+    'JioMart': 6,
+}
+
+DEFAULT_MAX_ENTRIES = 20000
+
+
+def normalize_term(term):
+    """Collapse case and whitespace so 'Tomato ' and 'tomato' share a cache entry."""
+    return ' '.join(str(term).split()).lower()
+
+
+class ResultCache:
+    """SQLite-backed cache of the rows scraped for each (website, term, pincode)."""
+
+    def __init__(self, path, ttl_hours=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_hours = {**DEFAULT_TTL_HOURS, **(ttl_hours or {})}
+        self.max_entries = max_entries
+        self.stats = {}
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "website TEXT NOT NULL, term TEXT NOT NULL, pincode TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, rows TEXT NOT NULL, "
+                "PRIMARY KEY (website, term, pincode))")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_fetched_at ON results (fetched_at)")
+
+    def _count(self, website, outcome):
+        stats = self.stats.setdefault(website, {'Hits': 0, 'Misses': 0})
+        stats[outcome] += 1
+
+    def get(self, website, term, pincode=''):
+        """Return the cached rows for a term, or None if there are none or they have expired."""
+        oldest = time.time() - self.ttl_hours.get(website, 0) * 3600
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT rows FROM results WHERE website = ? AND term = ? AND pincode = ? AND fetched_at >= ?",
+                (website, normalize_term(term), pincode, oldest)).fetchone()
+            self._count(website, 'Hits' if row else 'Misses')
+        if row is None:
+            return None
+        return [{**cached, 'Search Term': term} for cached in json.loads(row[0])]
+
+    def put(self, website, term, rows, pincode=''):
+        """Cache the rows scraped for a term, evicting the oldest entries if the cache is full."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (website, term, pincode, fetched_at, rows) VALUES (?, ?, ?, ?, ?)",
+                (website, normalize_term(term), pincode, time.time(), json.dumps(rows)))
+            self._evict()
+
+    def _evict(self):
+        oldest = time.time() - max(self.ttl_hours.values()) * 3600
+        self._connection.execute("DELETE FROM results WHERE fetched_at < ?", (oldest,))
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self.max_entries:
+            self._connection.execute(
+                "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY fetched_at LIMIT ?)",
+                (count - self.max_entries,))
+
+    def report(self):
+        """Return hit and miss counts per website since the cache was opened."""
+        with self._lock:
+            return {website: dict(stats) for website, stats in self.stats.items()}
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,162 @@
+"""Per-website, per-term timing and failure records for one scraping run.
+
+Scraper threads (and the tasks of the CDP engine) add the seconds they spend in each step (waiting for the rate
+limiter, page load, waits, extraction, writing) to a tally of their own, which
+is closed off into one row when the term is stored or fails. The rows are exported as a CSV (one line per
+term) and a JSON report with per-website totals, retries and failure reasons.
+"""
+import contextvars
+import csv
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Steps a term's time is broken down into; whatever is left is reported as 'Other'
+STEPS = ['Throttle', 'Page Load', 'Waits', 'Extract', 'Write']
+
+TERM_COLUMNS = ['Website', 'Search Term', 'Status', 'Rows', 'Retries'] + \
+    [f"{step} (s)" for step in STEPS] + ['Other (s)', 'Total (s)', 'Error']
+
+SITE_COLUMNS = ['Website', 'Terms', 'Failed', 'Cached', 'Retries', 'Rows'] + \
+    [f"{step} (s)" for step in STEPS] + ['Other (s)', 'Total (s)', 'Seconds/Term']
+
+
+def describe(reason):
+    """Return a one-line failure reason, dropping the stack traces Selenium appends to its messages."""
+    message = ' '.join(str(reason).split('Stacktrace:')[0].split())
+    if isinstance(reason, BaseException):
+        return f"{type(reason).__name__}: {message}" if message else type(reason).__name__
+    return message
+
+
+class RunReport:
+    """Thread-safe recorder of where each term's time went and why terms failed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Each thread, and each asyncio task, keeps the tally of the term it is scraping
+        self._current = contextvars.ContextVar('run_report_tally', default=None)
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded by a previous run."""
+        with self._lock:
+            self.started_at = time.time()
+            self.terms = []
+            self.failures = []
+
+    def _tally(self):
+        tally = self._current.get()
+        if tally is None:
+            tally = {'started': time.perf_counter(), 'steps': {}, 'retries': 0}
+            self._current.set(tally)
+        return tally
+
+    def begin(self):
+        """Start the clock for the first term scraped on the calling thread or task."""
+        self._current.set(None)
+        self._tally()
+
+    def add(self, step, seconds):
+        steps = self._tally()['steps']
+        steps[step] = steps.get(step, 0.0) + seconds
+
+    @contextmanager
+    def step(self, step):
+        """Count the time spent inside the ``with`` block towards `step`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(step, time.perf_counter() - start)
+
+    def retry(self, website, term, reason):
+        """Record that a term is being tried again and why."""
+        self._tally()['retries'] += 1
+        self.record_failure(website, term, reason, retried=True)
+
+    def record_failure(self, website, term, reason, retried=False):
+        """Add a failure reason to the report without closing a term."""
+        with self._lock:
+            self.failures.append({'Website': website, 'Search Term': term, 'Reason': describe(reason),
+                                  'Retried': retried, 'At': round(time.time() - self.started_at, 3)})
+
+    def _close_term(self, website, term, status, rows=0, error=''):
+        tally = self._tally()
+        total = time.perf_counter() - tally['started']
+        row = {'Website': website, 'Search Term': term, 'Status': status, 'Rows': rows,
+               'Retries': tally['retries']}
+        for step in STEPS:
+            row[f"{step} (s)"] = round(tally['steps'].get(step, 0.0), 3)
+        row['Other (s)'] = round(max(0.0, total - sum(tally['steps'].values())), 3)
+        row['Total (s)'] = round(total, 3)
+        row['Error'] = error
+        with self._lock:
+            self.terms.append(row)
+        # The next term on this thread starts now
+        self.begin()
+
+    def finished(self, website, term, rows):
+        """Close the calling thread's current term as stored with `rows` rows."""
+        self._close_term(website, term, 'done', rows)
+
+    def cached(self, website, term, rows):
+        """Record a term answered from the result cache."""
+        self.begin()
+        self._close_term(website, term, 'cached', rows)
+
+    def failed(self, website, term, reason):
+        """Close the calling thread's current term as failed."""
+        self.record_failure(website, term, reason)
+        self._close_term(website, term, 'failed', error=describe(reason))
+
+    def term_rows(self):
+        with self._lock:
+            return [dict(row) for row in self.terms]
+
+    def site_rows(self):
+        """Return one row of totals per website."""
+        sites = {}
+        for row in self.term_rows():
+            site = sites.setdefault(row['Website'], {column: 0 for column in SITE_COLUMNS[1:]})
+            site['Terms'] += 1
+            site['Failed'] += row['Status'] == 'failed'
+            site['Cached'] += row['Status'] == 'cached'
+            site['Retries'] += row['Retries']
+            site['Rows'] += row['Rows']
+            for column in [f"{step} (s)" for step in STEPS] + ['Other (s)', 'Total (s)']:
+                site[column] += row[column]
+
+        rows = []
+        for website, site in sites.items():
+            for column in [f"{step} (s)" for step in STEPS] + ['Other (s)', 'Total (s)']:
+                site[column] = round(site[column], 3)
+            scraped = site['Terms'] - site['Cached']
+            site['Seconds/Term'] = round(site['Total (s)'] / scraped, 3) if scraped else 0.0
+            rows.append({'Website': website, **site})
+        return rows
+
+    def write_csv(self, path):
+        """Write one line per term to `path`."""
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=TERM_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.term_rows())
+        return path
+
+    def write_json(self, path, **extra):
+        """Write the per-website totals, per-term rows and failures to `path`."""
+        with self._lock:
+            failures = [dict(failure) for failure in self.failures]
+        report = {
+            **extra,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'seconds': round(time.time() - self.started_at, 3),
+            'websites': self.site_rows(),
+            'terms': self.term_rows(),
+            'failures': failures,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return path
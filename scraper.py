@@ -0,0 +1,1708 @@
+"""Scraping engine behind the Streamlit app and the command-line runner.
+
+Holds the website scrapers, the browser pool and ``run_scrape``, which runs
+one scraping job end to end. Nothing here imports Streamlit, so the same code
+runs from ``app.py`` and from ``cli.py``.
+"""
+import os
+import re
+import json
+import asyncio
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import asynccontextmanager, contextmanager
+from functools import partial
+from urllib.parse import quote, urlparse
+import pandas as pd
+from selenium import webdriver
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import (
+    TimeoutException,
+    WebDriverException
+)
+import shutil
+import sqlite3
+from http_backend import API_WEBSITES, ApiClient, ApiError, usable_cookies
+from cdp_engine import Browser, CdpError
+from session_store import SessionStore, devtools_cookie, webdriver_cookie
+from output_store import RunStore, export_frames
+from result_cache import ResultCache, normalize_term
+from prices import city_matrix, combine_prices, comparison_view, normalize_batches
+from price_history import PriceHistory
+from product_matching import with_vegetables
+from run_report import RunReport, describe
+from rate_limiter import RateLimiter, blocked_marker
+from jobs import ScrapeCancelled, stop_requested
+from parsers import (
+    parse_agmarknet_commodities,
+    parse_agmarknet_details,
+    parse_bigbasket_cards,
+    parse_bigbasket_dropdown,
+    parse_dmart_card,
+    parse_dmart_dropdown,
+    parse_hyperpure,
+    parse_jiomart_card
+)
+
+# Define the folder where all data will be saved
+output_folder = 'scraped_data'
+
+# Per-term chunks and the journal of the latest run, kept so it can be resumed
+chunks_folder = os.path.join(output_folder, 'chunks')
+
+# Cached results survive clear_previous_data, so they live outside the output folder
+cache_path = os.path.join('cache', 'results.sqlite3')
+
+# Typed prices of every finished run, kept across runs for price trends
+history_path = os.path.join('history', 'prices.sqlite3')
+
+# Saved delivery-location sessions, so each pincode's popup is filled in once rather than every run
+sessions_path = os.path.join('sessions', 'locations.sqlite3')
+
+# Pincode DMart and JioMart deliver to, part of every cached result's key
+DELIVERY_PINCODE = '122001'
+
+# Websites that ask for a delivery pincode through a popup before searching
+LOCATION_WEBSITES = ['DMart', 'JioMart']
+
+# Indian pincodes: six digits, the first not zero
+PINCODE_PATTERN = r'\b[1-9]\d{5}\b'
+
+# City typed after the pincode in DMart's location search; other pincodes are searched by number alone
+PINCODE_CITIES = {'122001': 'Gurgaon'}
+
+# Seconds a restored session has to show its location before the popup is used instead
+LOCATION_CHECK_TIMEOUT = 10
+
+# Websites whose results are cached per search term
+CACHEABLE_WEBSITES = ['Agmarknet', 'BigBasket', 'DMart', 'Hyperpure', 'JioMart']
+
+# Websites in the order they appear in the UI and in the master file
+WEBSITES = ['Agmarknet', 'BigBasket', 'DMart', 'Hyperpure', 'JioMart']
+
+# Number of browsers scraping in parallel unless the user picks otherwise
+DEFAULT_MAX_WORKERS = 3
+MAX_WORKERS_LIMIT = 10
+
+# Websites whose search-term list can be split across several browsers
+SHARDABLE_WEBSITES = ['BigBasket', 'DMart', 'Hyperpure', 'JioMart']
+MAX_SHARDS = 8
+
+# Excel file each website's data is saved to inside the output folder
+SITE_FILES = {
+    'Agmarknet': 'agmarknet_vegetable_prices.xlsx',
+    'BigBasket': 'bigbasket_Products_price.xlsx',
+    'DMart': 'dmart_product_data.xlsx',
+    'Hyperpure': 'hyperpure_product_data.xlsx',
+    'JioMart': 'jiomart_product_data.xlsx',
+}
+
+# Page each scraper starts from. Setting <WEBSITE>_SITE_URL (e.g. DMART_SITE_URL)
+# points a scraper at another host, such as the fixture server in fixture_server.py
+SITE_URLS = {
+    'Agmarknet': 'https://agmarknet.gov.in',
+    'BigBasket': 'https://www.bigbasket.com/',
+    'DMart': 'https://www.dmart.in',
+    'Hyperpure': "https://www.hyperpure.com/in/fruits-vegetables?&type=CATALOG&cheapestProduct=0&discountedProduct=0&entity_id=&entity_type=&parent_reference_id=96887735-46cc-4fdb-8d19-65387afdc926-1721711561231890664&parent_reference_type=&search_source=&source_page=&sub_reference_id=&sub_reference_type=",
+    'JioMart': 'https://www.jiomart.com/',
+}
+
+# Pages opened once to pick up cookies before searching through the API
+API_HOME_URLS = {
+    'BigBasket': 'https://www.bigbasket.com/',
+    'Hyperpure': 'https://www.hyperpure.com/in/fruits-vegetables',
+}
+
+# Every column the scrapers fill in; each website's rows use its own prefixed ones
+SCRAPED_COLUMNS = ['Search Term', 'JioMart_Title', 'JioMart_Offer', 'JioMart_Price', 'JioMart_Real_Price', 'Source',
+                   'DMart_Title', 'DMart_MRP', 'DMart_Price', 'DMart_Offer', 'DMart_Dropdown_Options',
+                   'BigBasket_Title', 'BigBasket_Price', 'BigBasket_Original_Price', 'BigBasket_Discount',
+                   'BigBasket_Pack_Size', 'BigBasket_Dropdown_Prices', 'Hyperpure_Product_Title', 'Hyperpure_Price',
+                   'Hyperpure_Category', 'Hyperpure_SUPERSAVER_Information', 'Agmarknet_Commodity', 'Agmarknet_Variety',
+                   'Agmarknet_MAX', 'Agmarknet_MIN', 'Agmarknet_Modal']
+
+# Columns of each website's own file: its prefixed master columns plus the shared ones
+SITE_COLUMNS = {
+    website: ['Search Term'] + [column for column in SCRAPED_COLUMNS if column.startswith(f'{website}_')] + ['Source']
+    for website in WEBSITES
+}
+
+# How long each website may take to become ready, how often to poll it and
+# how long the DOM and network must stay quiet before a page counts as settled
+WAIT_PROFILES = {
+    'Agmarknet': {'timeout': 20, 'poll': 0.25, 'settle': 0.5},
+    'BigBasket': {'timeout': 20, 'poll': 0.25, 'settle': 0.75},
+    'DMart': {'timeout': 10, 'poll': 0.25, 'settle': 0.5},
+    'Hyperpure': {'timeout': 20, 'poll': 0.25, 'settle': 0.5},
+    'JioMart': {'timeout': 10, 'poll': 0.25, 'settle': 0.75},
+}
+
+# Specify the correct version of ChromeDriver
+chrome_driver_version = '120.0.6099.224'  # Adjust this to match your Chromium version
+
+# Where the ChromeDriver downloaded by webdriver-manager is remembered, so later runs start offline
+chromedriver_record = os.path.join('cache', 'chromedriver.json')
+
+# A warm browser is replaced after loading this many pages or once its page uses this much memory
+MAX_DRIVER_PAGES = 100
+MAX_DRIVER_HEAP_MB = 512
+
+# Sites whose cookies and storage are wiped before a browser is handed to the next job
+SITE_ORIGINS = [
+    'https://agmarknet.gov.in',
+    'https://www.bigbasket.com',
+    'https://www.dmart.in',
+    'https://www.hyperpure.com',
+    'https://www.jiomart.com',
+]
+
+# URL patterns for what the scrapers never read, blocked through CDP before a website is scraped
+BLOCKED_RESOURCES = {
+    'images': ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico'],
+    'fonts': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'media': ['*.mp4', '*.webm', '*.m3u8'],
+    'analytics': ['*google-analytics.com*', '*googletagmanager.com*', '*/gtm.js*', '*/analytics.js*',
+                  '*/gtag/js*', '*/fbevents.js*', '*connect.facebook.net*', '*clarity.ms*', '*hotjar.com*',
+                  '*moengage.com*', '*branch.io*'],
+    'ads': ['*doubleclick.net*', '*googlesyndication.com*', '*googleadservices.com*', '*amazon-adsystem.com*',
+            '*criteo.com*', '*criteo.net*'],
+}
+
+# Which groups each website blocks. Network.setBlockedURLs has no exceptions, so a website
+# whose search UI needs something from a group leaves the whole group out: Agmarknet keeps
+# its images because the commodity expand buttons are <input type="image">.
+SITE_BLOCKING = {
+    'Agmarknet': ['fonts', 'media', 'analytics', 'ads'],
+    'BigBasket': ['images', 'fonts', 'media', 'analytics', 'ads'],
+    'DMart': ['images', 'fonts', 'media', 'analytics', 'ads'],
+    'Hyperpure': ['images', 'fonts', 'media', 'analytics', 'ads'],
+    'JioMart': ['images', 'fonts', 'media', 'analytics', 'ads'],
+}
+
+# Browser-wide settings that spare every website prompts and autoplaying media
+CHROME_PREFS = {
+    'profile.default_content_setting_values.notifications': 2,
+    'profile.default_content_setting_values.geolocation': 2,
+    'profile.default_content_setting_values.media_stream': 2,
+}
+
+def parse_pincodes(text):
+    """Return the distinct pincodes in a comma- or space-separated list, in order."""
+    return list(dict.fromkeys(re.findall(PINCODE_PATTERN, str(text))))
+
+
+def site_url(website):
+    """Return the page a website's scraper starts from, honouring the environment override."""
+    return os.environ.get(f"{website.upper()}_SITE_URL", SITE_URLS[website])
+
+
+def site_host(website):
+    """Return the host (and port) a website's scraper opens, which its saved sessions belong to."""
+    return urlparse(site_url(website)).netloc
+
+
+def clear_previous_data(keep=()):
+    """Clear the previous scraped data, keeping the resume chunks and the job folders in `keep`."""
+    if os.path.exists(output_folder):
+        for file in os.listdir(output_folder):
+            file_path = os.path.join(output_folder, file)
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+            elif file_path != chunks_folder and file not in keep:
+                shutil.rmtree(file_path, ignore_errors=True)
+
+
+def chrome_arguments():
+    """Return the headless Chromium command-line flags shared by both engines."""
+    arguments = ['--headless', '--disable-gpu', '--no-sandbox', '--disable-dev-shm-usage', '--window-size=1920,1200']
+    if resource_blocking_enabled():
+        arguments += ['--disable-remote-fonts', '--mute-audio', '--autoplay-policy=user-gesture-required']
+    return arguments
+
+
+def build_chrome_options():
+    """Build the headless Chromium options shared by every WebDriver."""
+    chromium_path = shutil.which("chromium")
+
+    options = Options()
+    options.binary_location = chromium_path
+    for argument in chrome_arguments():
+        options.add_argument(argument)
+    if resource_blocking_enabled():
+        options.add_experimental_option('prefs', CHROME_PREFS)
+    return options
+
+
+def resource_blocking_enabled():
+    """Return False when BLOCK_RESOURCES=0 asks for pages to load everything, e.g. to benchmark the difference."""
+    return os.environ.get('BLOCK_RESOURCES', '1') != '0'
+
+
+def blocked_url_patterns(website):
+    """Return the URL patterns blocked while scraping a website."""
+    return [pattern for group in SITE_BLOCKING[website] for pattern in BLOCKED_RESOURCES[group]]
+
+
+def resolve_chromedriver():
+    """Return a local ChromeDriver path, downloading one only if none is known yet.
+
+    ``CHROMEDRIVER_PATH`` wins, then the driver remembered from an earlier
+    download, then a ``chromedriver`` on the PATH.
+    """
+    candidates = [os.environ.get('CHROMEDRIVER_PATH')]
+    try:
+        with open(chromedriver_record, encoding='utf-8') as f:
+            record = json.load(f)
+        if record.get('version') == chrome_driver_version:
+            candidates.append(record.get('path'))
+    except (OSError, ValueError):
+        pass
+    candidates.append(shutil.which('chromedriver'))
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+
+    path = ChromeDriverManager(driver_version=chrome_driver_version).install()
+    os.makedirs(os.path.dirname(chromedriver_record), exist_ok=True)
+    with open(chromedriver_record, 'w', encoding='utf-8') as f:
+        json.dump({'version': chrome_driver_version, 'path': path}, f)
+    return path
+
+
+class DriverPool:
+    """A bounded pool of headless WebDriver instances.
+
+    Drivers are started lazily, at most ``size`` of them, and handed out one at
+    a time so that no two scrapers ever share a browser. ``acquire`` blocks
+    until a driver is free. Drivers stay open between runs: a driver that no
+    longer responds, has loaded ``max_pages`` pages or whose page grew past
+    ``max_heap_mb`` is quit and replaced, and the others have the ``origins``
+    cookies and storage cleared before they are handed out again. ``terms``
+    checks the wear between a job's terms, so a long job does not keep a
+    browser past its limits either.
+    """
+
+    def __init__(self, size, max_pages=MAX_DRIVER_PAGES, max_heap_mb=MAX_DRIVER_HEAP_MB, origins=()):
+        self.size = max(1, int(size))
+        self.max_pages = max_pages
+        self.max_heap_mb = max_heap_mb
+        self.origins = list(origins)
+        self._idle = []
+        self._drivers = []
+        self._pages = {}
+        self._started = 0
+        self._lock = threading.Condition()
+        self._install_lock = threading.Lock()
+        self._service_path = None
+
+    def _start_driver(self):
+        # Resolve ChromeDriver once per pool rather than once per browser
+        with self._install_lock:
+            if self._service_path is None:
+                self._service_path = resolve_chromedriver()
+        service = Service(self._service_path)
+        return webdriver.Chrome(service=service, options=build_chrome_options())
+
+    def _healthy(self, driver):
+        try:
+            return driver.execute_script("return 1") == 1
+        except WebDriverException:
+            return False
+
+    def count_page(self, driver):
+        """Count a page loaded by `driver` towards its wear."""
+        with self._lock:
+            self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+
+    def pages(self, driver):
+        with self._lock:
+            return self._pages.get(id(driver), 0)
+
+    def worn_out(self, driver):
+        """Return True once `driver` has loaded ``max_pages`` pages, its page grew too big or it stopped answering."""
+        if self.pages(driver) >= self.max_pages:
+            return True
+        try:
+            heap = driver.execute_script(
+                "return window.performance.memory ? window.performance.memory.usedJSHeapSize : 0")
+        except WebDriverException:
+            return True
+        return (heap or 0) > self.max_heap_mb * 1024 * 1024
+
+    def _reset(self, driver):
+        """Clear what the last job left behind so the next one starts from a clean profile."""
+        try:
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            for origin in self.origins:
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+            driver.get('about:blank')
+            return True
+        except WebDriverException as e:
+            print(f"Failed to reset WebDriver: {e}")
+            return False
+
+    def _discard(self, driver):
+        """Quit a driver and free its slot in the pool."""
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+            self._pages.pop(id(driver), None)
+            self._started -= 1
+            self._lock.notify()
+        try:
+            driver.quit()
+        except WebDriverException as e:
+            print(f"Failed to quit WebDriver: {e}")
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a driver for the duration of the ``with`` block."""
+        driver = None
+        while driver is None:
+            with self._lock:
+                while not self._idle and self._started >= self.size:
+                    self._lock.wait()
+                driver = self._idle.pop() if self._idle else None
+                if driver is None:
+                    self._started += 1
+
+            if driver is None:
+                try:
+                    driver = self._start_driver()
+                except Exception:
+                    with self._lock:
+                        self._started -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._drivers.append(driver)
+            elif not self._healthy(driver):
+                print("Replacing a WebDriver that stopped responding")
+                self._discard(driver)
+                driver = None
+
+        try:
+            yield driver
+        finally:
+            if self.worn_out(driver) or not self._reset(driver):
+                self._discard(driver)
+            else:
+                with self._lock:
+                    self._idle.append(driver)
+                    self._lock.notify()
+
+    def terms(self, driver, terms):
+        """Yield terms from the iterator `terms` to a job on `driver` until they run out or the driver wears out.
+
+        A term whose search shows its results without loading a page counts as one page.
+        """
+        while not self.worn_out(driver):
+            try:
+                term = next(terms)
+            except StopIteration:
+                return
+            pages = self.pages(driver)
+            yield term
+            if self.pages(driver) == pages:
+                self.count_page(driver)
+
+    def close(self):
+        """Quit every driver the pool has started."""
+        with self._lock:
+            drivers = list(self._drivers)
+            self._drivers.clear()
+            self._idle.clear()
+            self._pages.clear()
+            self._started = 0
+        for driver in drivers:
+            try:
+                driver.quit()
+            except WebDriverException as e:
+                print(f"Failed to quit WebDriver: {e}")
+
+
+# Seconds spent waiting per website during the current run
+wait_stats = {}
+wait_stats_lock = threading.Lock()
+
+# Where each term's time went during the current run, and why terms failed
+run_report = RunReport()
+
+# Request pace and browser cap per website, learned across runs
+rate_limits = RateLimiter()
+
+# Title and the start of the visible text, enough to recognise a captcha or error page
+PAGE_TEXT_SCRIPT = "return document.title + '\\n' + (document.body ? document.body.innerText.slice(0, 2000) : '')"
+
+
+def reset_wait_stats():
+    """Forget the wait times recorded by a previous run."""
+    with wait_stats_lock:
+        wait_stats.clear()
+
+
+def wait_report():
+    """Return the wait times recorded for each website as a DataFrame."""
+    with wait_stats_lock:
+        rows = [{'Website': website, **stats} for website, stats in wait_stats.items()]
+    return pd.DataFrame(rows, columns=['Website', 'Waits', 'Timeouts', 'Seconds Waiting'])
+
+
+# What a page step can fail with: a wait timing out, or the browser rejecting a command
+PAGE_ERRORS = (WebDriverException, asyncio.TimeoutError, CdpError)
+
+# Seconds a click that submits a form may take to load the page it leads to
+NAVIGATION_TIMEOUT = 30
+
+# Expressions the wait conditions poll
+DOCUMENT_READY_JS = "document.readyState === 'complete'"
+ELEMENT_COUNT_JS = "document.getElementsByTagName('*').length"
+RESOURCE_COUNT_JS = "performance.getEntriesByType('resource').length"
+
+
+class SeleniumPage:
+    """A WebDriver behind the page primitives of `cdp_engine.Tab`.
+
+    Each website's flow below is a coroutine written against these primitives
+    (navigate, evaluate JavaScript, click, type, press Enter, read HTML, block
+    URLs and get or set cookies), so the same flow drives a Selenium browser and
+    a CDP tab. A Selenium flow runs in an event loop of its own on the worker
+    thread, where the blocking WebDriver calls hold up nothing else.
+    ``on_page`` is called for every page the driver loads.
+    """
+
+    def __init__(self, driver, on_page=None):
+        self.driver = driver
+        self.on_page = on_page or (lambda: None)
+
+    async def goto(self, url):
+        self.driver.get(url)
+        self.on_page()
+
+    @asynccontextmanager
+    async def navigation(self, timeout=NAVIGATION_TIMEOUT):
+        """Wait at the end of the block for the page load a command in it started, such as a form post."""
+        self.driver.execute_script("window.__leaving = true;")
+        yield
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if self.driver.execute_script("return !window.__leaving && document.readyState === 'complete';"):
+                    self.on_page()
+                    return
+            except WebDriverException:
+                # The old document went away in the middle of the script
+                pass
+            if time.monotonic() >= deadline:
+                raise TimeoutException("The page did not finish loading")
+            await asyncio.sleep(0.1)
+
+    async def evaluate(self, expression):
+        return self.driver.execute_script(f"return ({expression});")
+
+    async def call(self, function, *args):
+        return self.driver.execute_script(f"return ({function}).apply(null, arguments);", *args)
+
+    async def click(self, selector):
+        self.driver.find_element(By.CSS_SELECTOR, selector).click()
+
+    async def type(self, selector, text):
+        element = self.driver.find_element(By.CSS_SELECTOR, selector)
+        element.clear()
+        element.send_keys(text)
+
+    async def press_enter(self):
+        self.driver.switch_to.active_element.send_keys(Keys.RETURN)
+
+    async def html(self, selector=None):
+        if selector is None:
+            return self.driver.page_source
+        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+        return elements[0].get_attribute('outerHTML') if elements else None
+
+    async def block_urls(self, patterns):
+        self.driver.execute_cdp_cmd('Network.enable', {})
+        self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+
+    async def cookies(self):
+        return self.driver.get_cookies()
+
+    async def set_cookies(self, cookies):
+        for cookie in cookies:
+            try:
+                self.driver.add_cookie(webdriver_cookie(cookie))
+            except WebDriverException:
+                # Cookies of another domain cannot be set from this page
+                continue
+
+    async def delete_cookies(self, cookies):
+        for cookie in cookies:
+            self.driver.delete_cookie(cookie['name'])
+
+    async def pace(self, website):
+        # Blocking is fine on the flow's own thread, and lets a browser over the cap step aside
+        return rate_limits.site(website).pace()
+
+
+def present_js(selector):
+    return f"document.querySelector({json.dumps(selector)}) !== null"
+
+
+def visible_js(selector):
+    return (f"(function (element) {{ return !!element && !!(element.offsetWidth || element.offsetHeight"
+            f" || element.getClientRects().length); }})(document.querySelector({json.dumps(selector)}))")
+
+
+def xpath_js(xpath):
+    """Return an expression for the first node matching an XPath, or null."""
+    return (f"document.evaluate({json.dumps(xpath)}, document, null, "
+            f"XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue")
+
+
+def js_condition(expression):
+    """Wait condition that holds once a JavaScript expression is truthy."""
+    async def condition(page):
+        return await page.evaluate(expression)
+    return condition
+
+
+async def site_wait(page, website, condition, timeout=None, step='Waits'):
+    """Wait for a condition using the website's wait profile and record the time spent under `step`.
+
+    `condition` is a JavaScript expression or a coroutine function of the page;
+    TimeoutException is raised when it never holds.
+    """
+    profile = WAIT_PROFILES[website]
+    if isinstance(condition, str):
+        condition = js_condition(condition)
+    deadline = time.monotonic() + (timeout or profile['timeout'])
+    start = time.perf_counter()
+    timed_out = False
+    try:
+        while True:
+            # Checked on every poll so Stop takes effect in the middle of a term
+            if stop_requested():
+                raise ScrapeCancelled(f"Stopped while waiting for {website}")
+            value = await condition(page)
+            if value:
+                return value
+            if time.monotonic() >= deadline:
+                timed_out = True
+                raise TimeoutException(f"{website} page did not reach the expected state")
+            await asyncio.sleep(profile['poll'])
+    finally:
+        elapsed = time.perf_counter() - start
+        run_report.add(step, elapsed)
+        with wait_stats_lock:
+            stats = wait_stats.setdefault(website, {'Waits': 0, 'Timeouts': 0, 'Seconds Waiting': 0.0})
+            stats['Waits'] += 1
+            stats['Timeouts'] += int(timed_out)
+            stats['Seconds Waiting'] += elapsed
+
+
+class value_stable:
+    """Wait condition that holds once an expression's value stops changing for `settle` seconds."""
+
+    def __init__(self, expression, settle):
+        self.expression = expression
+        self.settle = settle
+        self.last_value = None
+        self.changed_at = None
+
+    async def __call__(self, page):
+        value = await page.evaluate(self.expression)
+        now = time.monotonic()
+        if value != self.last_value or self.changed_at is None:
+            self.last_value = value
+            self.changed_at = now
+            return False
+        return now - self.changed_at >= self.settle
+
+
+def dom_stable(settle):
+    """Wait condition that holds once no elements have been added or removed for `settle` seconds."""
+    return value_stable(ELEMENT_COUNT_JS, settle)
+
+
+def network_idle(settle):
+    """Wait condition that holds once no new resources have been fetched for `settle` seconds."""
+    return value_stable(RESOURCE_COUNT_JS, settle)
+
+
+async def wait_for_page(page, website):
+    """Wait until the current page has loaded and its DOM and network have settled."""
+    settle = WAIT_PROFILES[website]['settle']
+    try:
+        await site_wait(page, website, DOCUMENT_READY_JS, step='Page Load')
+        await site_wait(page, website, network_idle(settle), step='Page Load')
+        await site_wait(page, website, dom_stable(settle), step='Page Load')
+    except TimeoutException:
+        # Counted in the wait stats; a page that never settles is still read
+        pass
+
+
+async def pace(page, website):
+    """Wait until the website's rate limiter lets the next request through."""
+    run_report.add('Throttle', await page.pace(website))
+
+
+async def note_failure(page, website, error):
+    """Slow a website down when a failure looks like it is pushing back: a captcha or error page, or a timeout."""
+    try:
+        marker = blocked_marker(await page.call(f"function () {{ {PAGE_TEXT_SCRIPT} }}"))
+    except PAGE_ERRORS:
+        marker = None
+    if marker:
+        rate_limits.site(website).back_off(f"'{marker}' page")
+    elif isinstance(error, (TimeoutException, asyncio.TimeoutError)):
+        rate_limits.site(website).back_off("timed out")
+
+
+async def load_page(page, website, url):
+    """Open a page and wait for it to settle, counting both as page-load time."""
+    await pace(page, website)
+    with run_report.step('Page Load'):
+        await page.goto(url)
+    await wait_for_page(page, website)
+
+
+async def wait_for_dom_stable(page, website):
+    """Wait until elements stop being added to or removed from the page."""
+    try:
+        await site_wait(page, website, dom_stable(WAIT_PROFILES[website]['settle']))
+    except TimeoutException:
+        pass
+
+
+def extract(parse, *args):
+    """Run a parser, counting its time as extraction."""
+    with run_report.step('Extract'):
+        return parse(*args)
+
+
+def agmarknet_matches(commodity, term):
+    """Return True if a search term names an Agmarknet commodity, e.g. 'onion' and 'Onion Green'.
+
+    Either must appear in the other as whole words, so 'Beans' does not match 'Frasbean'.
+    """
+    commodity, term = (' '.join(re.findall(r'\w+', normalize_term(name))) for name in (commodity, term))
+    return bool(term) and (f" {term} " in f" {commodity} " or f" {commodity} " in f" {term} ")
+
+
+async def scrape_agmarknet(page, search_terms, store):
+    if stop_requested():
+        return None
+
+    await load_page(page, 'Agmarknet', site_url('Agmarknet'))
+    vegetables_button = xpath_js("//td[text()='Vegetables']/preceding-sibling::td/input[@type='image']")
+    await site_wait(page, 'Agmarknet', f"{vegetables_button} !== null")
+    async with page.navigation():
+        await page.evaluate(f"{vegetables_button}.click()")
+
+    vegetable_rows_xpath = "//table[@title='Vegetables']//tr[td/input[@type='image']]"
+    await site_wait(page, 'Agmarknet', f"{xpath_js(vegetable_rows_xpath)} !== null")
+
+    # Only the commodities named by a search term are expanded
+    commodities = list(extract(parse_agmarknet_commodities, await page.html()))
+    term_commodities = {
+        term: [commodity for commodity in commodities if agmarknet_matches(commodity, term)]
+        for term in search_terms
+    }
+    wanted = list(dict.fromkeys(commodity for names in term_commodities.values() for commodity in names))
+
+    async def click_and_collect_details(veg_name, retry_count=3):
+        details_table = xpath_js(f"//tr[td[text()='{veg_name}']]/following-sibling::tr[1]//table")
+        plus_button = xpath_js(f"{vegetable_rows_xpath}[td[text()='{veg_name}']]/td[1]/input[@type='image']")
+        for attempt in range(retry_count):
+            if stop_requested():
+                return None
+            try:
+                # A row left open by the last postback is read without clicking it closed
+                if not await page.evaluate(f"{details_table} !== null"):
+                    await pace(page, 'Agmarknet')
+                    # The click posts the page back; the details are on the page the server sends
+                    with run_report.step('Page Load'):
+                        async with page.navigation():
+                            await page.evaluate(f"{plus_button}.click()")
+                    await site_wait(page, 'Agmarknet', f"{details_table} !== null")
+                return extract(parse_agmarknet_details, await page.evaluate(f"{details_table}.outerHTML"))
+            except ScrapeCancelled:
+                raise
+            except Exception as e:
+                run_report.retry('Agmarknet', veg_name, e)
+                await note_failure(page, 'Agmarknet', e)
+        return None
+
+    # Every expand button posts the whole page back, so the commodities are opened one at a time
+    details = {veg_name: await click_and_collect_details(veg_name) for veg_name in wanted}
+
+    row_count = 0
+    for term, names in term_commodities.items():
+        if stop_requested():
+            break
+        if any(details.get(veg_name) is None for veg_name in names):
+            # Left out of the store so a resumed run tries the term again
+            run_report.failed('Agmarknet', term, "Commodity details could not be read")
+            continue
+
+        rows = [{
+            'Search Term': term,
+            'Agmarknet_Commodity': veg_name,
+            'Agmarknet_Variety': variety,
+            'Agmarknet_MAX': max_price,
+            'Agmarknet_MIN': min_price,
+            'Agmarknet_Modal': modal_price
+        } for veg_name in names for variety, max_price, min_price, modal_price in details[veg_name]]
+        row_count += store.append('Agmarknet', term, rows)
+
+    return row_count
+
+
+# Clicks the `index`-th pack size of the `card`-th BigBasket product card
+BIGBASKET_PACK_SCRIPT = """
+function (card, index) {
+    var cards = document.querySelectorAll('div.SKUDeck___StyledDiv-sc-1e5d9gk-0');
+    cards[card].querySelectorAll('span.PackChanger___StyledLabel-sc-newjpv-1')[index].click();
+}
+"""
+
+
+async def scrape_bigbasket(page, search_terms, store):
+    if stop_requested():
+        return None
+
+    await load_page(page, 'BigBasket', site_url('BigBasket'))
+    search_bar = 'input[placeholder="Search for Products..."]'
+
+    row_count = 0
+
+    async def save_page_source(term):
+        with open(f"error_page_{term}.html", "w", encoding="utf-8") as file:
+            file.write(await page.html())
+
+    async def get_dropdown_prices(term, card, index):
+        if stop_requested():
+            return 'N/A'
+
+        try:
+            await page.call(BIGBASKET_PACK_SCRIPT, card, index)
+            await site_wait(page, 'BigBasket', present_js(
+                'ul[role="listbox"] li div.PackChanger___StyledDiv-sc-newjpv-4'), timeout=10)
+            return extract(parse_bigbasket_dropdown, await page.html('ul[role="listbox"]'))
+        except ScrapeCancelled:
+            raise
+        except Exception as e:
+            run_report.record_failure('BigBasket', term, f"Dropdown prices: {describe(e)}")
+            return 'N/A'
+
+    for term in search_terms:
+        if stop_requested():
+            break
+
+        data = []
+        await pace(page, 'BigBasket')
+        try:
+            await site_wait(page, 'BigBasket', present_js(search_bar))
+            await page.type(search_bar, term)
+            await page.press_enter()
+
+            await site_wait(page, 'BigBasket', present_js('div.SKUDeck___StyledDiv-sc-1e5d9gk-0'))
+            await wait_for_dom_stable(page, 'BigBasket')
+
+            # Read every card's fields from one copy of the page
+            cards = extract(parse_bigbasket_cards, await page.html())
+
+            for card in cards:
+                if stop_requested():
+                    break
+
+                row = {
+                    'Search Term': term,
+                    'BigBasket_Title': card['title'],
+                    'BigBasket_Price': card['price'],
+                    'BigBasket_Original_Price': card['original_price'],
+                    'BigBasket_Discount': card['discount'],
+                    'BigBasket_Pack_Size': 'N/A',
+                    'BigBasket_Dropdown_Prices': 'N/A'
+                }
+                if not card['pack_sizes']:
+                    data.append(row)
+                # Pack-size prices only appear once the dropdown is opened
+                for index, size_text in enumerate(card['pack_sizes']):
+                    if stop_requested():
+                        break
+                    data.append({**row, 'BigBasket_Pack_Size': size_text,
+                                 'BigBasket_Dropdown_Prices': await get_dropdown_prices(term, card['index'], index)})
+
+            if not stop_requested():
+                row_count += store.append('BigBasket', term, data)
+
+        except ScrapeCancelled:
+            raise
+        except Exception as e:
+            run_report.failed('BigBasket', term, e)
+            await note_failure(page, 'BigBasket', e)
+            await save_page_source(term)
+
+    return row_count
+
+
+def dmart_location_query(pincode):
+    """Return what is typed into DMart's location search for a pincode."""
+    city = PINCODE_CITIES.get(pincode)
+    return f"{pincode}, {city}" if city else pincode
+
+
+# Clicks the first button whose text is exactly `text`
+CLICK_BUTTON_SCRIPT = """
+function (text) {
+    var button = Array.prototype.find.call(document.querySelectorAll('button'), function (button) {
+        return button.textContent.trim() === text;
+    });
+    if (!button) {
+        throw new Error('No button reads ' + text);
+    }
+    button.click();
+}
+"""
+
+# Marks the elements on the page now, so the ones a search puts in their place can be told apart
+MARK_STALE_SCRIPT = """
+function (selector) {
+    document.querySelectorAll(selector).forEach(function (element) { element.setAttribute('data-stale', ''); });
+}
+"""
+
+
+async def set_dmart_location(page, pincode=DELIVERY_PINCODE):
+    """Open DMart and confirm the delivery location for `pincode`."""
+    await load_page(page, 'DMart', site_url('DMart'))
+
+    await site_wait(page, 'DMart', present_js('.pincode-widget_pincode-header__bR5DG'))
+    await page.type('#pincodeInput', dmart_location_query(pincode))
+
+    first_result = "ul.pincode-widget_pincode-list___pWVx li.pincode-widget_pincode-item__qsZwZ button"
+    await site_wait(page, 'DMart', visible_js(first_result))
+    await page.click(first_result)
+
+    await site_wait(page, 'DMart', "Array.prototype.some.call(document.querySelectorAll('button'), "
+                                   "function (button) { return button.textContent.trim() === 'CONFIRM LOCATION'; })")
+    await page.call(CLICK_BUTTON_SCRIPT, 'CONFIRM LOCATION')
+    await wait_for_page(page, 'DMart')
+
+
+async def scrape_dmart(page, search_terms, store, pincode=DELIVERY_PINCODE):
+    if stop_requested():
+        return None
+
+    try:
+        await set_location(page, 'DMart', pincode)
+    except ScrapeCancelled:
+        raise
+    except Exception as e:
+        run_report.record_failure('DMart', '', e)
+        return None
+
+    card_selector = "div.vertical-card_card-vertical__Q8seS"
+    row_count = 0
+
+    for term in search_terms:
+        max_attempts = 3
+        for attempt in range(max_attempts):
+            if stop_requested():
+                return row_count
+
+            await pace(page, 'DMart')
+            try:
+                await site_wait(page, 'DMart', visible_js('#scrInput'))
+                await page.type('#scrInput', term)
+
+                # Results for the previous term must be replaced before the new card is read
+                await page.call(MARK_STALE_SCRIPT, card_selector)
+                await page.click('button.search_searchButton__J9wVN')
+                await site_wait(page, 'DMart', present_js(f"{card_selector}:not([data-stale])"))
+
+                card = extract(parse_dmart_card, await page.html(f"{card_selector}:not([data-stale])"))
+
+                dropdown_data = []
+                if card['has_dropdown']:
+                    try:
+                        await site_wait(page, 'DMart', visible_js('#demo-customized-select'))
+                        await page.click('#demo-customized-select')
+                        await site_wait(page, 'DMart', present_js('ul.MuiMenu-list li'))
+                        dropdown_data = extract(parse_dmart_dropdown, await page.html('ul.MuiMenu-list'))
+
+                        await page.click('body')
+                        await site_wait(page, 'DMart', f"!({visible_js('ul.MuiMenu-list')})")
+                    except ScrapeCancelled:
+                        raise
+                    except Exception as e:
+                        run_report.record_failure('DMart', term, f"Dropdown of {card['title']}: {describe(e)}")
+
+                row_count += store.append('DMart', term, [{
+                    'Search Term': term,
+                    'DMart_Title': card['title'],
+                    'DMart_MRP': card['mrp'],
+                    'DMart_Price': card['price'],
+                    'DMart_Offer': card['offer'],
+                    'DMart_Dropdown_Options': ', '.join(dropdown_data)
+                }])
+                break
+
+            except ScrapeCancelled:
+                raise
+            except Exception as e:
+                if attempt < max_attempts - 1:
+                    run_report.retry('DMart', term, e)
+                else:
+                    run_report.failed('DMart', term, e)
+                await note_failure(page, 'DMart', e)
+                await wait_for_page(page, 'DMart')
+
+    return row_count
+
+
+async def scrape_hyperpure(page, search_terms, store):
+    if stop_requested():
+        return None
+
+    await load_page(page, 'Hyperpure', site_url('Hyperpure'))
+    card_selector = '.CatalogCard_catalogCard__mGd27'
+
+    row_count = 0
+
+    for term in search_terms:
+        if stop_requested():
+            break
+        await pace(page, 'Hyperpure')
+        try:
+            await site_wait(page, 'Hyperpure', present_js('input.SearchInput_searchInput__8P47H'))
+            await page.type('input.SearchInput_searchInput__8P47H', term)
+
+            await site_wait(page, 'Hyperpure', present_js('#react-autowhatever-1 .SearchInput_suggestionsList__dx_Xc'))
+            await page.call(MARK_STALE_SCRIPT, card_selector)
+            await page.click('#react-autowhatever-1--item-0')
+
+            await site_wait(page, 'Hyperpure', present_js(f"{card_selector}:not([data-stale])"))
+
+            rows = extract(parse_hyperpure, await page.html(), term)
+            row_count += store.append('Hyperpure', term, rows)
+
+        except ScrapeCancelled:
+            raise
+        except TimeoutException as e:
+            run_report.failed('Hyperpure', term, "No results or the page took too long to load")
+            await note_failure(page, 'Hyperpure', e)
+        except Exception as e:
+            run_report.failed('Hyperpure', term, e)
+            await note_failure(page, 'Hyperpure', e)
+
+    return row_count
+
+
+async def set_jiomart_location(page, pincode=DELIVERY_PINCODE):
+    """Open JioMart and set the delivery pincode."""
+    await load_page(page, 'JioMart', site_url('JioMart'))
+
+    for button in ('#btn_pin_code_delivery', '#btn_enter_pincode'):
+        await site_wait(page, 'JioMart', visible_js(button))
+        await page.click(button)
+
+    await site_wait(page, 'JioMart', visible_js('#rel_pincode'))
+    await page.type('#rel_pincode', pincode)
+
+    await site_wait(page, 'JioMart', visible_js('#btn_pincode_submit'))
+    await page.click('#btn_pincode_submit')
+
+    try:
+        await site_wait(page, 'JioMart', lambda page: location_confirmed(page, 'JioMart', pincode))
+    except TimeoutException:
+        run_report.record_failure('JioMart', '', f"Delivery location {pincode} was not confirmed")
+
+
+def jiomart_search_url(term):
+    """Return JioMart's results page for a term; opening it directly skips loading the home page to search."""
+    return f"{site_url('JioMart').rstrip('/')}/search/{quote(term)}"
+
+
+async def scrape_jiomart(page, search_terms, store, pincode=DELIVERY_PINCODE):
+    if stop_requested():
+        return None
+
+    try:
+        await set_location(page, 'JioMart', pincode)
+    except ScrapeCancelled:
+        raise
+    except Exception as e:
+        run_report.record_failure('JioMart', '', e)
+        return None
+
+    row_count = 0
+
+    for term in search_terms:
+        if stop_requested():
+            break
+
+        await pace(page, 'JioMart')
+        with run_report.step('Page Load'):
+            await page.goto(jiomart_search_url(term))
+
+        try:
+            await site_wait(page, 'JioMart', visible_js('.plp-card-wrapper'))
+            # Prices are filled in after the card first appears
+            await wait_for_dom_stable(page, 'JioMart')
+
+            row = extract(parse_jiomart_card, await page.html('.plp-card-wrapper'), term)
+            if row is None:
+                run_report.failed('JioMart', term, "Product card has no title or price")
+                continue
+
+            row_count += store.append('JioMart', term, [row])
+
+        except ScrapeCancelled:
+            raise
+        except Exception as e:
+            run_report.failed('JioMart', term, e)
+            await note_failure(page, 'JioMart', e)
+
+    return row_count
+
+
+# Scripts telling whether the page already delivers to the pincode passed as arguments[0]. DMart
+# shows it in the header, in an element whose CSS-module class is matched by its stable prefix
+LOCATION_CHECK_SCRIPTS = {
+    'DMart': "var popup = document.querySelector('.pincode-widget_pincode-header__bR5DG');"
+             " var shown = document.querySelector(\"header [class*='header_pincode']\");"
+             " return !!document.getElementById('scrInput') && (!popup || popup.offsetParent === null)"
+             " && !!shown && shown.textContent.indexOf(arguments[0]) !== -1;",
+    'JioMart': "var city = document.getElementById('delivery_city_pincode');"
+               " return !!city && city.textContent.indexOf(arguments[0]) !== -1;",
+}
+
+LOCAL_STORAGE_SCRIPT = "return Object.assign({}, window.localStorage);"
+
+RESTORE_STORAGE_SCRIPT = """
+var items = arguments[0];
+Object.keys(items).forEach(function (key) { window.localStorage.setItem(key, items[key]); });
+"""
+
+_location_sessions = {}
+_location_sessions_lock = threading.Lock()
+
+
+def location_sessions():
+    """Return the saved location sessions at `sessions_path`, opening the store on first use."""
+    with _location_sessions_lock:
+        if sessions_path not in _location_sessions:
+            _location_sessions[sessions_path] = SessionStore(sessions_path)
+        return _location_sessions[sessions_path]
+
+
+async def location_confirmed(page, website, pincode):
+    return bool(await page.call(f"function () {{ {LOCATION_CHECK_SCRIPTS[website]} }}", pincode))
+
+
+async def save_location_session(page, website, pincode):
+    """Save the cookies and localStorage the location popup left behind, once the page shows the location."""
+    try:
+        if await location_confirmed(page, website, pincode):
+            location_sessions().put(website, site_host(website), pincode, await page.cookies(),
+                                    await page.call(f"function () {{ {LOCAL_STORAGE_SCRIPT} }}"),
+                                    await page.evaluate("navigator.userAgent"))
+    except (*PAGE_ERRORS, sqlite3.Error) as e:
+        print(f"Could not save the {website} location for {pincode}: {e}")
+
+
+async def restore_location_session(page, website, pincode):
+    """Load the saved session for a pincode into the browser and return whether the website accepted it."""
+    session = location_sessions().get(website, site_host(website), pincode)
+    if session is None:
+        return False
+    cookies = [devtools_cookie(cookie) for cookie in session['cookies']]
+    await load_page(page, website, site_url(website))
+    await page.set_cookies(cookies)
+    await page.call(f"function () {{ {RESTORE_STORAGE_SCRIPT} }}", session['local_storage'])
+    await load_page(page, website, site_url(website))
+    try:
+        await site_wait(page, website, lambda page: location_confirmed(page, website, pincode),
+                        timeout=LOCATION_CHECK_TIMEOUT)
+        return True
+    except TimeoutException:
+        location_sessions().discard(website, site_host(website), pincode)
+        # Only this website's cookies: the tabs of a CDP browser share one cookie jar
+        await page.delete_cookies(cookies)
+        await page.evaluate("window.localStorage.clear()")
+        return False
+
+
+async def set_location(page, website, pincode=DELIVERY_PINCODE):
+    """Make DMart or JioMart deliver to `pincode`, from a saved session when there is one."""
+    if await restore_location_session(page, website, pincode):
+        return
+    if website == 'DMart':
+        await set_dmart_location(page, pincode)
+    else:
+        await set_jiomart_location(page, pincode)
+    await save_location_session(page, website, pincode)
+
+
+SITE_SCRAPERS = {
+    'Agmarknet': scrape_agmarknet,
+    'BigBasket': scrape_bigbasket,
+    'DMart': scrape_dmart,
+    'Hyperpure': scrape_hyperpure,
+    'JioMart': scrape_jiomart,
+}
+
+
+def site_scraper(website, pincode=DELIVERY_PINCODE):
+    """Return the scraper for a website, delivering to `pincode` where the website asks for one."""
+    if website in LOCATION_WEBSITES:
+        return partial(SITE_SCRAPERS[website], pincode=pincode)
+    return SITE_SCRAPERS[website]
+
+
+def api_session(website, pincode):
+    """Return the saved location session an API client may take as it is, or None.
+
+    It must have been saved on the host the scraper opens, and its cookies
+    must belong to the API's site and hold the location the API reads.
+    """
+    if website not in LOCATION_WEBSITES:
+        return None
+    session = location_sessions().get(website, site_host(website), pincode)
+    if session is None or not usable_cookies(website, session['cookies']):
+        return None
+    return session
+
+
+async def bootstrap_api_client(page, website, pincode=DELIVERY_PINCODE):
+    """Hand an API client the cookies of the website's saved location, or of the website opened once in the browser."""
+    client = ApiClient(website, pincode)
+    session = api_session(website, pincode)
+    if session is not None:
+        # The saved location is all the API needs, so the browser is not used at all
+        client.load_browser_state(session['cookies'], session['user_agent'])
+        return client
+
+    if website in LOCATION_WEBSITES:
+        await set_location(page, website, pincode)
+    else:
+        await load_page(page, website, API_HOME_URLS[website])
+    client.load_browser_state(await page.cookies(), await page.evaluate("navigator.userAgent"))
+    return client
+
+
+async def scrape_with_api(page, website, search_terms, store, pincode=DELIVERY_PINCODE):
+    """Search a website through its JSON API, using the browser only for the terms the API missed."""
+    if stop_requested():
+        return None
+
+    try:
+        client = await bootstrap_api_client(page, website, pincode)
+    except ScrapeCancelled:
+        raise
+    except Exception as e:
+        run_report.record_failure(website, '', e)
+        return await site_scraper(website, pincode)(page, search_terms, store)
+
+    # The requests block, so they run off the event loop the tabs of the CDP engine share
+    loop = asyncio.get_running_loop()
+    row_count = 0
+    failed_terms = []
+    try:
+        for term in search_terms:
+            if stop_requested():
+                break
+            await pace(page, website)
+            try:
+                row_count += store.append(website, term, await loop.run_in_executor(None, client.search, term))
+            except ApiError as e:
+                run_report.retry(website, term, e)
+                if e.throttled:
+                    rate_limits.site(website).back_off("API pushed back")
+                failed_terms.append(term)
+    finally:
+        client.close()
+
+    if failed_terms and not stop_requested():
+        row_count += await site_scraper(website, pincode)(page, failed_terms, store) or 0
+
+    return row_count
+
+
+async def scrape_site(page, website, search_terms, store, use_api=False, pincode=DELIVERY_PINCODE):
+    """Scrape one website's terms on a page of either engine, through its API when `use_api` is set."""
+    patterns = blocked_url_patterns(website) if resource_blocking_enabled() else []
+    try:
+        # Replaces the patterns of whichever website the browser scraped before
+        await page.block_urls(patterns)
+    except PAGE_ERRORS as e:
+        print(f"Could not block resources for {website}: {e}")
+    if use_api and website in API_WEBSITES:
+        return await scrape_with_api(page, website, search_terms, store, pincode)
+    return await site_scraper(website, pincode)(page, search_terms, store)
+
+
+def split_terms(search_terms, shards):
+    """Split search terms into at most `shards` contiguous, non-empty chunks."""
+    shards = max(1, min(int(shards), len(search_terms)))
+    size, extra = divmod(len(search_terms), shards)
+    chunks = []
+    start = 0
+    for index in range(shards):
+        end = start + size + (1 if index < extra else 0)
+        chunks.append(search_terms[start:end])
+        start = end
+    return chunks
+
+
+class TermQueue:
+    """Search terms handed out one at a time to the shards of a website.
+
+    Iterating it takes the next term nobody has taken yet, so shards that share
+    one queue split the terms as they go: a tab whose pages load quickly takes
+    more terms while another waits on a slow page, instead of each working
+    through a fixed slice.
+    """
+
+    def __init__(self, search_terms):
+        self._terms = deque(search_terms)
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            if not self._terms:
+                raise StopIteration
+            return self._terms.popleft()
+
+    def __len__(self):
+        return len(self._terms)
+
+
+def site_searches(websites, search_terms, pincodes, term_websites=None, term_pincodes=None):
+    """Return the terms to search per (website, pincode), in search-term order.
+
+    `term_websites` limits a term to some of the websites and `term_pincodes`
+    sends it to other pincodes than `pincodes`. Websites whose prices do not
+    depend on the location are searched once per term, for the first pincode.
+    """
+    term_websites = term_websites or {}
+    term_pincodes = term_pincodes or {}
+    unique_terms = list(dict.fromkeys(search_terms))
+    # The run's pincodes first, then the ones only some terms are priced for
+    all_pincodes = list(dict.fromkeys(pincodes + [pincode for term in unique_terms
+                                                  for pincode in term_pincodes.get(term, [])]))
+    searches = {}
+    for website in websites:
+        terms = [term for term in unique_terms if website in term_websites.get(term, websites)]
+        if website not in LOCATION_WEBSITES:
+            searches[(website, pincodes[0])] = terms
+            continue
+        for pincode in all_pincodes:
+            searches[(website, pincode)] = [term for term in terms if pincode in term_pincodes.get(term, pincodes)]
+    return searches
+
+
+def plan_site_tasks(site_terms, shards=1, use_api=False, shared=False):
+    """Return (website, pincode, shard_index, terms) work items given the terms to scrape per (website, pincode).
+
+    With `shared`, the shards of a (website, pincode) all get the same
+    `TermQueue` instead of a slice each.
+    """
+    tasks = []
+    for (website, pincode), search_terms in site_terms.items():
+        # API searches are cheap enough that one session per website is plenty
+        if use_api and website in API_WEBSITES:
+            tasks.append((website, pincode, 0, search_terms))
+        elif website in SHARDABLE_WEBSITES and shards > 1 and search_terms:
+            chunks = split_terms(search_terms, shards)
+            if shared:
+                chunks = [TermQueue(search_terms)] * len(chunks)
+            for index, chunk in enumerate(chunks):
+                tasks.append((website, pincode, index, chunk))
+        else:
+            tasks.append((website, pincode, 0, search_terms))
+    return tasks
+
+
+def store_pincode(website, pincode):
+    """Return the pincode a website's rows are stored under: only the location websites' prices depend on it."""
+    return pincode if website in LOCATION_WEBSITES else ''
+
+
+class ReportingStore:
+    """Wraps a RunStore so that storing a term times the write, closes the term in the run report
+    and tells the website's rate limiter the search went through. Rows are stored under `pincode`."""
+
+    def __init__(self, store, pincode=''):
+        self.store = store
+        self.pincode = pincode
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def append(self, website, term, rows):
+        with run_report.step('Write'):
+            count = self.store.append(website, term, rows, self.pincode)
+        run_report.finished(website, term, count)
+        rate_limits.site(website).succeeded()
+        return count
+
+
+def run_site(pool, website, search_terms, store, use_api=False, pincode=DELIVERY_PINCODE):
+    """Scrape one website on drivers borrowed from the pool, once its rate limiter admits another browser.
+
+    A driver that wears out between two terms goes back to the pool to be
+    replaced, and the terms left carry on in the next driver.
+    """
+    store = ReportingStore(store, store_pincode(website, pincode))
+    run_report.begin()
+    with rate_limits.site(website).worker():
+        if use_api and website in API_WEBSITES:
+            # The browser only picks up cookies and searches the few terms the API missed
+            with pool.acquire() as driver:
+                page = SeleniumPage(driver, partial(pool.count_page, driver))
+                return asyncio.run(scrape_site(page, website, search_terms, store, use_api, pincode))
+
+        terms = search_terms if isinstance(search_terms, TermQueue) else TermQueue(search_terms)
+        row_count = 0
+        while True:
+            left = len(terms)
+            with pool.acquire() as driver:
+                page = SeleniumPage(driver, partial(pool.count_page, driver))
+                rows = asyncio.run(scrape_site(page, website, pool.terms(driver, terms), store, use_api, pincode))
+            if rows is None:
+                return None
+            row_count += rows
+            if not terms or stop_requested():
+                return row_count
+            if len(terms) == left:
+                # The driver wore out before taking a term, so the rest are left for a resumed run
+                return None
+
+
+# Scraping engines: a pool of Selenium browsers, or tabs of one Chromium driven over CDP (cdp_engine.py)
+ENGINES = ['selenium', 'cdp']
+
+
+class TabPage:
+    """A CDP tab with the `pace` of `SeleniumPage`, so the website flows run on it unchanged."""
+
+    def __init__(self, tab):
+        self.tab = tab
+
+    def __getattr__(self, name):
+        return getattr(self.tab, name)
+
+    async def pace(self, website):
+        return await rate_limits.site(website).pace_async()
+
+
+class TabRunner:
+    """Scrapes websites on tabs of one headless Chromium driven over CDP.
+
+    The browser and an asyncio event loop live on a thread of their own.
+    ``submit`` schedules one website's terms as a coroutine on a fresh tab and
+    returns a ``concurrent.futures.Future``, just like handing `run_site` to a
+    thread pool, so `run_scrape` treats both engines the same. At most
+    ``max_tabs`` tabs are open at once.
+
+    A website's shards become tabs of the same browser that take their terms
+    from one `TermQueue`; while one tab waits for a page, the event loop runs
+    the others, so a few tabs get most of the throughput of as many browsers
+    for the memory of one. Tabs of the location websites open in a browser
+    context per pincode, so tabs delivering to different pincodes do not share
+    cookies.
+    """
+
+    def __init__(self, max_tabs):
+        self.max_tabs = max(1, int(max_tabs))
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self._browser = None
+        self._starting = asyncio.Lock()
+        self._tabs = asyncio.Semaphore(self.max_tabs)
+        self._contexts = {}
+
+    async def _started_browser(self):
+        async with self._starting:
+            if self._browser is None:
+                self._browser = await Browser(arguments=chrome_arguments()).start()
+        return self._browser
+
+    async def _context(self, browser, pincode):
+        async with self._starting:
+            if pincode not in self._contexts:
+                self._contexts[pincode] = await browser.new_context()
+        return self._contexts[pincode]
+
+    async def _run(self, website, search_terms, store, use_api, pincode):
+        store = ReportingStore(store, store_pincode(website, pincode))
+        async with rate_limits.site(website).worker_async(), self._tabs:
+            if stop_requested():
+                raise ScrapeCancelled(f"Stopped before {website} started")
+            browser = await self._started_browser()
+            context = await self._context(browser, pincode) if website in LOCATION_WEBSITES else None
+            tab = await browser.new_tab(context=context)
+            try:
+                run_report.begin()
+                return await scrape_site(TabPage(tab), website, search_terms, store, use_api, pincode)
+            finally:
+                await tab.close()
+
+    def start(self):
+        """Start the browser now rather than with the first website, and return it."""
+        return asyncio.run_coroutine_threadsafe(self._started_browser(), self.loop).result()
+
+    def submit(self, website, search_terms, store, use_api=False, pincode=DELIVERY_PINCODE):
+        return asyncio.run_coroutine_threadsafe(self._run(website, search_terms, store, use_api, pincode),
+                                                self.loop)
+
+    def close(self):
+        """Close the browser and stop the event loop."""
+        if self._browser is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._browser.close(), self.loop).result(timeout=30)
+            except Exception as e:
+                print(f"Failed to close the CDP browser: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+@contextmanager
+def site_runner(engine, pool, workers):
+    """Yield a function that starts scraping one website's terms and returns its Future.
+
+    The Selenium engine runs `run_site` on `workers` threads, each with a browser
+    from `pool`; the CDP engine runs up to `workers` tabs in one browser.
+    """
+    if engine == 'cdp':
+        runner = TabRunner(workers)
+        try:
+            yield runner.submit
+        finally:
+            runner.close()
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield lambda website, search_terms, store, use_api, pincode=DELIVERY_PINCODE: executor.submit(
+                run_site, pool, website, search_terms, store, use_api=use_api, pincode=pincode)
+
+
+def add_to_history(job, prices):
+    """Append a finished run's typed prices to the price history, each row under its own pincode."""
+    try:
+        history = PriceHistory(history_path)
+        try:
+            added = history.ingest(job.id, prices)
+        finally:
+            history.close()
+    except sqlite3.Error as e:
+        job.log(f"Could not add this run to the price history: {e}", 'warning')
+        return
+    job.log(f"Added {added} prices to the price history")
+
+
+def run_scrape(job, selected_websites, search_terms, max_workers=DEFAULT_MAX_WORKERS, shards=1, use_api=False,
+               resume=False, force_refresh=False, pool=None, output_dir=output_folder, chunks_dir=chunks_folder,
+               engine='selenium', pincodes=None, term_websites=None, term_pincodes=None):
+    """Scrape the selected websites for the search terms, reporting progress and files on `job`.
+
+    Workbooks are written to `output_dir`. Without a `pool`, a private one is
+    started for this run and closed at the end. With ``engine='cdp'`` the
+    websites are scraped on tabs of one browser instead (see `TabRunner`).
+
+    DMart and JioMart are priced for every pincode in `pincodes` (by default
+    just `DELIVERY_PINCODE`). Each (website, pincode) is scheduled as its own
+    work item on the same workers, so more pincodes add work items, not runs.
+    `term_websites` and `term_pincodes` narrow single terms down to some
+    websites or other pincodes (see `site_searches`).
+    """
+    # Record start time
+    start_time = time.time()
+
+    reset_wait_stats()
+    run_report.reset()
+    os.makedirs(output_dir, exist_ok=True)
+
+    websites = [website for website in WEBSITES if website in selected_websites]
+    pincodes = list(dict.fromkeys(pincodes or [DELIVERY_PINCODE]))
+    # The other websites show the same prices everywhere, so they are searched once
+    searches = site_searches(websites, search_terms, pincodes, term_websites, term_pincodes)
+    site_pincodes = {website: [pincode for site, pincode in searches if site == website] for website in websites}
+    store = RunStore(chunks_dir, search_terms, SITE_COLUMNS, resume=resume, on_append=job.term_done)
+    cache = ResultCache(cache_path)
+
+    # Skip the searches an interrupted run already finished, then answer what we
+    # can from the cache. Duplicate terms are searched once per pincode.
+    site_terms = {}
+    reused = 0
+    for website in websites:
+        completed = {pincode: store.completed_terms(website, store_pincode(website, pincode))
+                     for pincode in site_pincodes[website]}
+        reused += sum(len(terms) for terms in completed.values())
+        job.set_site(website, Terms=sum(len(searches[(website, pincode)]) for pincode in site_pincodes[website]),
+                     **{'Terms Done': sum(len(terms) for terms in completed.values()),
+                        'Rows': store.row_count(website)})
+        for pincode in site_pincodes[website]:
+            remaining = [term for term in searches[(website, pincode)] if term not in completed[pincode]]
+            if not force_refresh and website in CACHEABLE_WEBSITES:
+                misses = []
+                for term in remaining:
+                    rows = cache.get(website, term, store_pincode(website, pincode))
+                    if rows is None:
+                        misses.append(term)
+                    else:
+                        store.append(website, term, rows, store_pincode(website, pincode))
+                        run_report.cached(website, term, len(rows))
+                remaining = misses
+            if remaining:
+                site_terms[(website, pincode)] = remaining
+    if resume:
+        job.log(f"Resuming: {reused} finished searches will be reused.")
+
+    # Websites with something left to search
+    scraped_websites = [website for website in websites if any(site == website for site, _ in site_terms)]
+    # Tabs of one browser share a website's terms; separate browsers keep a slice each
+    tasks = plan_site_tasks(site_terms, shards, use_api, shared=engine == 'cdp')
+    # Each website may use as many browsers as it has shards and pincodes, fewer while it pushes back
+    rate_limits.start_run({website: sum(1 for task in tasks if task[0] == website) for website in scraped_websites})
+    # Browsers stay warm in a shared pool; this run uses at most max_workers of them
+    own_pool = pool is None
+    if own_pool:
+        pool = DriverPool(max_workers, origins=SITE_ORIGINS)
+    workers = min(max_workers, len(tasks)) or 1
+
+    def export_site(website):
+        if website in CACHEABLE_WEBSITES:
+            for pincode in site_pincodes[website]:
+                for term in site_terms.get((website, pincode), []):
+                    rows = store.term_rows(website, term, store_pincode(website, pincode))
+                    if rows is not None:
+                        cache.put(website, term, rows, store_pincode(website, pincode))
+        # Numeric prices, pack sizes and price per kg, one row per pack
+        site_prices[website] = normalize_batches(website, store.iter_rows(website, scraped_at=True))
+        # Rows of several pincodes say which one they were scraped for
+        columns = SITE_COLUMNS[website] + ['Pincode'] if len(site_pincodes[website]) > 1 else None
+        site_file = store.export_xlsx(os.path.join(output_dir, SITE_FILES[website]), [website], columns=columns,
+                                      sheets={'Prices': site_prices[website]})
+        completed_websites.append(website)
+        job.add_file(website, site_file)
+        job.set_site(website, Status='stopped' if stop_requested() else 'done')
+        job.log(f"{website} data saved to {site_file} ({store.row_count(website)} rows)")
+
+    try:
+        # Websites that finished with their data exported
+        completed_websites = []
+        site_prices = {}
+        interrupted = False
+        for website in websites:
+            if website not in scraped_websites:
+                export_site(website)
+
+        with site_runner(engine, pool, workers) as submit:
+            futures = {}
+            shard_counts = {}
+            for website, pincode, index, chunk in tasks:
+                if stop_requested():
+                    break
+                if website not in shard_counts:
+                    job.log(f"Scraping {website}...")
+                    job.set_site(website, Status='running')
+                shard_counts[website] = shard_counts.get(website, 0) + 1
+                future = submit(website, chunk, store, use_api, pincode)
+                futures[future] = (website, pincode, index)
+
+            shard_results = {website: {} for website in shard_counts}
+            for future in as_completed(futures):
+                website, pincode, index = futures[future]
+                shard = f"shard {index + 1}" if len(site_pincodes[website]) == 1 else f"{pincode}, shard {index + 1}"
+                try:
+                    shard_results[website][(pincode, index)] = future.result()
+                except ScrapeCancelled:
+                    shard_results[website][(pincode, index)] = None
+                except Exception as e:
+                    job.log(f"Scraping {website} ({shard}) failed: {e}", 'error')
+                    run_report.record_failure(website, f"({shard})", e)
+                    shard_results[website][(pincode, index)] = None
+
+                if len(shard_results[website]) < shard_counts[website]:
+                    continue
+                results = list(shard_results.pop(website).values())
+                if None in results:
+                    # Keep the run resumable so the missing terms can be retried
+                    interrupted = True
+                if all(count is None for count in results) and not store.row_count(website):
+                    job.set_site(website, Status='stopped' if stop_requested() else 'failed')
+                    continue
+
+                # Every shard is done, so the website's workbook is written exactly once
+                export_site(website)
+
+        # Combine all data into a master file
+        if completed_websites and not stop_requested():
+            master_output_file = os.path.join(output_dir, 'master_output_for_all.xlsx')
+            # One long dataset for every website; the per-term wide view is derived from it here
+            prices = combine_prices([site_prices[website] for website in websites if website in completed_websites])
+            # Link every product to the Master_List vegetable it is, with a confidence
+            prices = with_vegetables(prices, search_terms)
+            sheets = {'Prices': prices, 'Comparison': comparison_view(prices)}
+            if any(len(site_pincodes[website]) > 1 for website in websites):
+                # Each term's cheapest price per kg at every website and pincode, side by side
+                sheets['City Matrix'] = city_matrix(prices)
+            export_frames(master_output_file, sheets)
+            job.add_file('Master', master_output_file)
+            if not interrupted:
+                store.mark_finished()
+                # An interrupted run is added once its resumed run finishes, so no rows are stored twice
+                add_to_history(job, prices)
+            job.log("Data scraping completed successfully!", 'success')
+        elif stop_requested():
+            job.log("Scraping stopped; finished searches are kept so the run can be resumed.", 'warning')
+
+    finally:
+        # A shared pool keeps its browsers open for the next run
+        if own_pool:
+            pool.close()
+        cache.close()
+    
+    # Record end time
+    end_time = time.time()
+
+    # Calculate and display the total execution time
+    total_time = end_time - start_time
+    job.log(f"Total execution time: {total_time:.2f} seconds")
+
+    # Show where each website's time went and save the full run report
+    site_times = run_report.site_rows()
+    if site_times:
+        job.add_table("Time per website (seconds):", pd.DataFrame(site_times))
+    job.add_file('Run Report (JSON)', run_report.write_json(os.path.join(output_dir, 'run_report.json'), job=job.id))
+    job.add_file('Run Report (CSV)', run_report.write_csv(os.path.join(output_dir, 'run_report.csv')))
+
+    # Show how much of that time was spent waiting on each website
+    waits = wait_report()
+    if not waits.empty:
+        job.add_table("Time spent waiting for pages:", waits.round({'Seconds Waiting': 2}))
+
+    # Show how fast each website let us go and how often it pushed back
+    pacing = [row for row in rate_limits.report() if row['Website'] in scraped_websites]
+    if pacing:
+        job.add_table("Pacing per website:", pd.DataFrame(pacing))
+
+    # Show how many searches were answered from the cache
+    cache_stats = cache.report()
+    if cache_stats:
+        job.add_table("Cached results used:",
+                      pd.DataFrame([{'Website': website, **stats} for website, stats in cache_stats.items()]))
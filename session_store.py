@@ -0,0 +1,96 @@
+"""Saved delivery-location sessions, so the pincode popups are filled in once.
+
+DMart and JioMart only show prices after a delivery pincode has been chosen
+through a multi-step popup. What the popup leaves behind is the website's
+cookies and localStorage, so once it has been filled in for a pincode those are
+saved here, keyed by website, host and pincode. Later browsers, CDP tabs and
+API sessions load them instead of walking through the popup again. The host
+keeps sessions taken on another server, such as the fixture server of the
+benchmarks, from being sent to the live website. A session is
+used for ``DEFAULT_MAX_AGE_HOURS`` and then taken again from the popup.
+
+Cookies are kept in the WebDriver format (``expiry`` in seconds, as returned by
+``driver.get_cookies()``); ``devtools_cookie`` converts them for
+``Network.setCookies``.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Hours a saved location session is trusted before the popup is filled in again
+DEFAULT_MAX_AGE_HOURS = 24
+
+# Cookie fields WebDriver's add_cookie accepts
+WEBDRIVER_COOKIE_FIELDS = ['name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'expiry', 'sameSite']
+
+
+def webdriver_cookie(cookie):
+    """Return a cookie from WebDriver or the DevTools protocol in the WebDriver format."""
+    cookie = dict(cookie)
+    expires = cookie.pop('expires', None)
+    # DevTools marks session cookies with an expiry of -1
+    if expires is not None and expires >= 0 and 'expiry' not in cookie:
+        cookie['expiry'] = int(expires)
+    return {field: cookie[field] for field in WEBDRIVER_COOKIE_FIELDS if cookie.get(field) is not None}
+
+
+def devtools_cookie(cookie):
+    """Return a WebDriver cookie as a DevTools ``Network.CookieParam``."""
+    cookie = dict(cookie)
+    expiry = cookie.pop('expiry', None)
+    if expiry is not None:
+        cookie['expires'] = expiry
+    return cookie
+
+
+class SessionStore:
+    """SQLite store of the cookies and localStorage each (website, host, pincode) was set up with."""
+
+    def __init__(self, path, max_age_hours=DEFAULT_MAX_AGE_HOURS):
+        self.path = path
+        self.max_age_hours = max_age_hours
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "website TEXT NOT NULL, host TEXT NOT NULL, pincode TEXT NOT NULL, saved_at REAL NOT NULL, "
+                "cookies TEXT NOT NULL, local_storage TEXT NOT NULL, user_agent TEXT, "
+                "PRIMARY KEY (website, host, pincode))")
+
+    def get(self, website, host, pincode):
+        """Return the session saved on `host` for a pincode ('cookies', 'local_storage', 'user_agent'), or None."""
+        oldest = time.time() - self.max_age_hours * 3600
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT cookies, local_storage, user_agent FROM sessions "
+                "WHERE website = ? AND host = ? AND pincode = ? AND saved_at >= ?",
+                (website, host, pincode, oldest)).fetchone()
+        if row is None:
+            return None
+        return {'cookies': json.loads(row[0]), 'local_storage': json.loads(row[1]), 'user_agent': row[2]}
+
+    def put(self, website, host, pincode, cookies, local_storage=None, user_agent=None):
+        """Save the cookies and localStorage a website on `host` was left with after its location was set."""
+        cookies = [webdriver_cookie(cookie) for cookie in cookies]
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sessions "
+                "(website, host, pincode, saved_at, cookies, local_storage, user_agent) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (website, host, pincode, time.time(), json.dumps(cookies), json.dumps(local_storage or {}),
+                 user_agent))
+
+    def discard(self, website, host, pincode):
+        """Forget a session the website no longer accepts."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM sessions WHERE website = ? AND host = ? AND pincode = ?",
+                                     (website, host, pincode))
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,15 @@
+"""Which Agmarknet commodities a search term opens."""
+from scraper import agmarknet_matches
+
+
+def test_terms_match_commodities_on_whole_words():
+    assert agmarknet_matches('Onion Green', 'onion')
+    assert agmarknet_matches('Tomato', ' TOMATO ')
+    assert agmarknet_matches('Onion', 'onion green')
+    assert not agmarknet_matches('Frasbean', 'beans')
+    assert not agmarknet_matches('Bitter gourd', 'gourds')
+
+
+def test_blank_terms_match_nothing():
+    assert not agmarknet_matches('Tomato', '')
+    assert not agmarknet_matches('Tomato', '  ')
@@ -0,0 +1,92 @@
+"""The JSON API fast path against the recorded API responses, and its fallback to the browser."""
+import asyncio
+
+import pytest
+
+import scraper
+from fixture_server import serve_fixtures
+from http_backend import API_WEBSITES, ApiClient, ApiError
+
+
+@pytest.fixture
+def api_fixtures(monkeypatch):
+    server, base_url = serve_fixtures(kind='api')
+    for website in API_WEBSITES:
+        monkeypatch.setenv(f"{website.upper()}_API_BASE_URL", f"{base_url}/{website.lower()}")
+    yield base_url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('website', API_WEBSITES)
+def test_every_api_response_parses_into_the_website_columns(api_fixtures, website):
+    client = ApiClient(website)
+    try:
+        rows = client.search('tomato')
+    finally:
+        client.close()
+    assert rows and all(row['Search Term'] == 'tomato' for row in rows)
+    assert all(column == 'Search Term' or column.startswith(f"{website}_") for row in rows for column in row)
+
+
+def test_hyperpure_rows_keep_prices_and_offers(api_fixtures):
+    client = ApiClient('Hyperpure')
+    try:
+        rows = client.search('tomato')
+    finally:
+        client.close()
+    assert rows[0]['Hyperpure_Product_Title'] == 'Tomato Hybrid, 5 Kg'
+    assert rows[0]['Hyperpure_Category'] == 'Tomato Hybrid'
+    assert rows[0]['Hyperpure_SUPERSAVER_Information'] == 'Buy 10 kg @ ₹33/kg | Buy 25 kg @ ₹32/kg'
+    assert rows[1]['Hyperpure_SUPERSAVER_Information'] == 'N/A'
+
+
+def test_unknown_term_is_an_api_error(api_fixtures):
+    client = ApiClient('Hyperpure')
+    try:
+        with pytest.raises(ApiError):
+            client.search('dragon fruit')
+    finally:
+        client.close()
+
+
+class FakePage:
+    """A browser page that has loaded nothing of interest."""
+
+    async def goto(self, url):
+        pass
+
+    async def evaluate(self, expression):
+        return 'agent' if expression == 'navigator.userAgent' else True
+
+    async def cookies(self):
+        return []
+
+    async def pace(self, website):
+        return 0.0
+
+
+class FakeStore:
+    def __init__(self):
+        self.rows = {}
+
+    def append(self, website, term, rows):
+        self.rows[term] = rows
+        return len(rows)
+
+
+def test_terms_the_api_misses_fall_back_to_the_browser(api_fixtures, monkeypatch):
+    browser_terms = []
+
+    async def scrape_hyperpure(page, search_terms, store):
+        browser_terms.extend(search_terms)
+        return sum(store.append('Hyperpure', term, [{'Search Term': term}]) for term in search_terms)
+
+    monkeypatch.setitem(scraper.SITE_SCRAPERS, 'Hyperpure', scrape_hyperpure)
+    monkeypatch.setitem(scraper.WAIT_PROFILES, 'Hyperpure', {'timeout': 0.1, 'poll': 0.01, 'settle': 0})
+    store = FakeStore()
+    row_count = asyncio.run(scraper.scrape_with_api(FakePage(), 'Hyperpure', ['tomato', 'dragon fruit'], store))
+
+    assert browser_terms == ['dragon fruit']
+    assert len(store.rows['tomato']) == 2
+    assert row_count == 3
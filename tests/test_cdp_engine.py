@@ -0,0 +1,176 @@
+"""The CDP engine: event waiters on the DevTools connection, and websites scraped on tabs of one browser."""
+import asyncio
+import json
+import threading
+
+import pytest
+from wsproto.events import TextMessage
+
+import scraper
+from cdp_engine import CdpConnection, CdpError
+from rate_limiter import RateLimiter
+from scraper import TabRunner, TermQueue, plan_site_tasks
+
+
+def event(method, session_id='session-1', **params):
+    message = {'method': method, 'params': params, 'sessionId': session_id}
+    return TextMessage(data=json.dumps(message), message_finished=True)
+
+
+def test_every_waiter_gets_the_event_and_is_forgotten():
+    async def wait_twice():
+        connection = CdpConnection()
+        with connection.expect('Page.loadEventFired', 'session-1') as first, \
+                connection.expect('Page.loadEventFired', 'session-1') as second, \
+                connection.expect('Page.loadEventFired', 'session-2') as other:
+            connection._handle(event('Page.loadEventFired'))
+            assert (await first)['sessionId'] == (await second)['sessionId'] == 'session-1'
+            assert not other.done()
+        assert connection._expected == {}
+
+    asyncio.run(wait_twice())
+
+
+def test_a_lost_connection_fails_every_waiter():
+    async def lose_connection():
+        connection = CdpConnection()
+        with connection.expect('Page.loadEventFired', 'session-1') as loaded:
+            connection._fail(CdpError("DevTools connection closed"))
+            with pytest.raises(CdpError):
+                await loaded
+        assert connection._expected == {}
+
+    asyncio.run(lose_connection())
+
+
+class FakeTab:
+    def __init__(self, browser, context):
+        self.browser = browser
+        self.context = context
+        self.blocked = None
+        self.closed = False
+
+    async def block_urls(self, patterns):
+        self.blocked = list(patterns)
+
+    async def goto(self, url):
+        await asyncio.sleep(0.01)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    started = []
+
+    def __init__(self, arguments=()):
+        self.tabs = []
+        self.contexts = []
+        self.closed = False
+        FakeBrowser.started.append(self)
+
+    async def start(self):
+        return self
+
+    async def new_context(self):
+        self.contexts.append(f"context-{len(self.contexts)}")
+        return self.contexts[-1]
+
+    async def new_tab(self, url='about:blank', context=None):
+        self.tabs.append(FakeTab(self, context))
+        return self.tabs[-1]
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeStore:
+    def __init__(self):
+        self.rows = []
+
+    def append(self, website, term, rows, pincode=''):
+        self.rows.extend((website, pincode, term) for _ in rows)
+        return len(rows)
+
+
+@pytest.fixture
+def browsers(monkeypatch):
+    FakeBrowser.started = []
+    monkeypatch.setattr(scraper, 'Browser', FakeBrowser)
+    return FakeBrowser.started
+
+
+def test_a_website_runs_its_flow_on_a_tab(browsers, monkeypatch):
+    async def scrape_hyperpure(page, search_terms, store):
+        row_count = 0
+        for term in search_terms:
+            await page.goto(term)
+            await scraper.pace(page, 'Hyperpure')
+            row_count += store.append('Hyperpure', term, [{'Search Term': term}])
+        return row_count
+
+    monkeypatch.setitem(scraper.SITE_SCRAPERS, 'Hyperpure', scrape_hyperpure)
+    store = FakeStore()
+    runner = TabRunner(2)
+    try:
+        assert runner.submit('Hyperpure', ['tomato', 'onion'], store).result(timeout=10) == 2
+    finally:
+        runner.close()
+
+    browser, = browsers
+    tab, = browser.tabs
+    assert store.rows == [('Hyperpure', '', 'tomato'), ('Hyperpure', '', 'onion')]
+    assert tab.closed and browser.closed
+    assert tab.context is None
+    assert tab.blocked == (scraper.blocked_url_patterns('Hyperpure') if scraper.resource_blocking_enabled() else [])
+
+
+def test_term_queue_hands_each_term_out_once():
+    queue = TermQueue([f"term {index}" for index in range(200)])
+    taken = [[] for _ in range(4)]
+    threads = [threading.Thread(target=lambda terms=terms: terms.extend(queue)) for terms in taken]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(term for terms in taken for term in terms) == sorted(f"term {index}" for index in range(200))
+    assert len(queue) == 0
+
+
+def test_shards_share_their_terms_on_tabs_of_one_browser(browsers, monkeypatch):
+    active = []
+    peak = []
+
+    async def scrape_jiomart(page, search_terms, store, pincode=scraper.DELIVERY_PINCODE):
+        row_count = 0
+        for term in search_terms:
+            active.append(term)
+            peak.append(len(active))
+            await page.goto(term)
+            active.remove(term)
+            row_count += store.append('JioMart', term, [{'Search Term': term}])
+        return row_count
+
+    monkeypatch.setitem(scraper.SITE_SCRAPERS, 'JioMart', scrape_jiomart)
+    monkeypatch.setattr(scraper, 'rate_limits', RateLimiter())
+    scraper.rate_limits.start_run({'JioMart': 4})
+    terms = [f"term {index}" for index in range(12)]
+    tasks = plan_site_tasks({('JioMart', '122001'): terms, ('JioMart', '400001'): terms[:4]}, shards=3, shared=True)
+    store = FakeStore()
+    runner = TabRunner(2)
+    try:
+        futures = [runner.submit(website, shard_terms, store, pincode=pincode)
+                   for website, pincode, _, shard_terms in tasks]
+        assert sum(future.result(timeout=10) for future in futures) == 16
+    finally:
+        runner.close()
+
+    assert sorted(term for _, pincode, term in store.rows if pincode == '122001') == sorted(terms)
+    assert sorted(term for _, pincode, term in store.rows if pincode == '400001') == sorted(terms[:4])
+    # Never more tabs at once than asked for, and every shard got a tab
+    assert max(peak) == 2
+    browser, = browsers
+    assert len(browser.tabs) == 6 and all(tab.closed for tab in browser.tabs)
+    # The tabs of each pincode share a browser context of their own
+    assert len(browser.contexts) == 2
+    assert {tab.context for tab in browser.tabs} == set(browser.contexts)
@@ -0,0 +1,109 @@
+"""DriverPool recycling browsers by the pages they loaded, between the terms of a website."""
+import asyncio
+
+import pytest
+
+import scraper
+from scraper import DriverPool, SeleniumPage, TermQueue
+
+
+class FakeDriver:
+    def __init__(self, heap=0):
+        self.heap = heap
+        self.urls = []
+        self.quit_called = False
+
+    def execute_script(self, script, *args):
+        if 'usedJSHeapSize' in script:
+            return self.heap
+        return 1
+
+    def execute_cdp_cmd(self, command, params):
+        pass
+
+    def get(self, url):
+        self.urls.append(url)
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def drivers(monkeypatch):
+    started = []
+
+    def start_driver(self):
+        started.append(FakeDriver())
+        return started[-1]
+
+    monkeypatch.setattr(DriverPool, '_start_driver', start_driver)
+    return started
+
+
+def test_drivers_are_kept_however_many_jobs_they_serve(drivers):
+    pool = DriverPool(1, max_pages=3)
+    for _ in range(10):
+        with pool.acquire():
+            pass
+    assert len(drivers) == 1 and not drivers[0].quit_called
+
+
+def test_driver_is_replaced_after_max_pages_loads(drivers):
+    pool = DriverPool(1, max_pages=3)
+    with pool.acquire() as driver:
+        for url in ('a', 'b', 'c'):
+            asyncio.run(SeleniumPage(driver, lambda: pool.count_page(driver)).goto(url))
+        assert pool.worn_out(driver)
+    with pool.acquire() as driver:
+        assert driver is drivers[1]
+    assert drivers[0].quit_called and not drivers[1].quit_called
+
+
+def test_driver_is_replaced_once_its_page_grows_too_big(drivers):
+    pool = DriverPool(1, max_heap_mb=1)
+    with pool.acquire() as driver:
+        driver.heap = 2 * 1024 * 1024
+    with pool.acquire():
+        pass
+    assert len(drivers) == 2 and drivers[0].quit_called
+
+
+def test_terms_stop_once_the_driver_wears_out(drivers):
+    pool = DriverPool(1, max_pages=3)
+    terms = TermQueue(['a', 'b', 'c', 'd', 'e'])
+    with pool.acquire() as driver:
+        pool.count_page(driver)
+        # Searches that load no page count as one page each
+        assert list(pool.terms(driver, terms)) == ['a', 'b']
+    assert list(terms) == ['c', 'd', 'e']
+
+
+class FakeStore:
+    def __init__(self):
+        self.terms = []
+
+    def append(self, website, term, rows, pincode=''):
+        self.terms.append(term)
+        return len(rows)
+
+
+def test_run_site_carries_the_terms_on_in_a_fresh_driver(drivers, monkeypatch):
+    seen = []
+
+    async def scrape_hyperpure(page, search_terms, store):
+        await page.goto('home')
+        row_count = 0
+        for term in search_terms:
+            seen.append((page.driver, term))
+            await page.goto(term)
+            row_count += store.append('Hyperpure', term, [{'Search Term': term}])
+        return row_count
+
+    monkeypatch.setitem(scraper.SITE_SCRAPERS, 'Hyperpure', scrape_hyperpure)
+    store = FakeStore()
+    pool = DriverPool(1, max_pages=3)
+    assert scraper.run_site(pool, 'Hyperpure', ['a', 'b', 'c', 'd'], store) == 4
+
+    assert store.terms == ['a', 'b', 'c', 'd']
+    assert [drivers.index(driver) for driver, _ in seen] == [0, 0, 1, 1]
+    assert drivers[0].urls == ['home', 'a', 'b']
@@ -0,0 +1,101 @@
+"""Background jobs: the queue's order, how a job ends, and Stop reaching a scraper's wait."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import scraper
+from jobs import JobQueue, ScrapeCancelled, ScrapeJob, stop_requested
+
+
+def wait_for(job, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if job.done:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job.id} did not finish")
+
+
+def test_jobs_run_one_at_a_time_in_order():
+    release = threading.Event()
+    order = []
+
+    def first(job):
+        order.append('first')
+        release.wait(5)
+
+    def second(job):
+        order.append('second')
+
+    queue = JobQueue()
+    jobs = [queue.submit(ScrapeJob(first)), queue.submit(ScrapeJob(second))]
+    assert queue.position(jobs[1]) == 1
+    release.set()
+    wait_for(jobs[1])
+    assert order == ['first', 'second']
+    assert [job.state for job in jobs] == ['finished', 'finished']
+    assert queue.position(jobs[1]) == 0
+
+
+def test_failed_job_keeps_its_error():
+    def target(job):
+        raise ValueError("no terms")
+
+    job = ScrapeJob(target)
+    job.run()
+    assert job.state == 'failed' and job.error == 'no terms'
+    assert ('error', "Scraping failed: no terms") in job.snapshot()['messages']
+
+
+def test_job_stopped_before_it_starts_never_runs():
+    ran = []
+    job = ScrapeJob(ran.append)
+    job.stop()
+    job.run()
+    assert job.state == 'stopped' and ran == []
+
+
+def test_stop_is_seen_by_the_running_job_only():
+    seen = []
+
+    def target(job):
+        seen.append(stop_requested())
+        job.stop()
+        seen.append(stop_requested())
+
+    job = ScrapeJob(target)
+    job.run()
+    assert seen == [False, True]
+    assert job.state == 'stopped'
+    assert not stop_requested()
+
+
+class FakePage:
+    async def evaluate(self, expression):
+        return False
+
+
+def test_stop_interrupts_a_wait_with_scrape_cancelled(monkeypatch):
+    monkeypatch.setitem(scraper.WAIT_PROFILES, 'DMart', {'timeout': 5, 'poll': 0.01, 'settle': 0})
+
+    def target(job):
+        job.stop()
+        with pytest.raises(ScrapeCancelled):
+            asyncio.run(scraper.site_wait(FakePage(), 'DMart', 'false'))
+
+    job = ScrapeJob(target)
+    job.run()
+    assert job.state == 'stopped' and job.error is None
+
+
+def test_queue_forgets_the_oldest_finished_jobs():
+    queue = JobQueue(max_finished=2)
+    jobs = [queue.submit(ScrapeJob(lambda job: None)) for _ in range(4)]
+    wait_for(jobs[-1])
+    # The worker drops the oldest job right after the last one finishes
+    for _ in range(500):
+        if len(queue.jobs()) == 2:
+            break
+        time.sleep(0.01)
+    assert queue.jobs() == jobs[2:]
@@ -0,0 +1,51 @@
+"""Reading a Master_List and planning a run over several pincodes."""
+from openpyxl import Workbook
+
+import master_list
+from master_list import read_master_list, work_plan
+from result_cache import ResultCache
+
+
+def write_workbook(path, rows):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def test_duplicates_are_merged(tmp_path):
+    path = write_workbook(tmp_path / 'Master_List.xlsx', [
+        ['Vegetables', 'Websites', 'Priority', 'Pincode'],
+        ['Tomato', 'DMart', 2, '122001'],
+        [' tomato ', 'JioMart, Nowhere', 1, '400001'],
+        ['Onion', None, None, None],
+        ['Okra', 'Nowhere', None, None],
+        ['Peas', None, 'soon', 'not a pincode'],
+        [None, None, None, None],
+    ])
+    terms = read_master_list(path)
+    assert terms.terms == ['Tomato', 'Onion', 'Peas']
+    # Okra names no known website, so only four rows were used
+    assert terms.rows == 4 and terms.duplicates == 1
+    assert terms.term_websites == {'Tomato': ['DMart', 'JioMart']}
+    assert terms.term_pincodes == {'Tomato': ['122001', '400001']}
+    assert terms.priorities['Tomato'] == 1
+    assert len(terms.issues) == 5
+
+
+def test_work_plan_counts_each_pincode_and_the_cache(tmp_path, monkeypatch):
+    cache_path = str(tmp_path / 'results.sqlite3')
+    monkeypatch.setattr(master_list, 'cache_path', cache_path)
+    cache = ResultCache(cache_path)
+    cache.put('DMart', 'tomato', [{'Search Term': 'tomato'}], '400001')
+    # Hyperpure does not depend on the location, so its cache entry serves every pincode order
+    cache.put('Hyperpure', 'onion', [{'Search Term': 'onion'}], '')
+    cache.close()
+
+    path = write_workbook(tmp_path / 'Master_List.xlsx', [['Vegetables'], ['Tomato'], ['Onion']])
+    plan, seconds = work_plan(read_master_list(path), ['DMart', 'Hyperpure'], ['400001', '122001'])
+    rows = {(row['Website'], row['Pincode']): (row['Terms'], row['Cached'], row['Searches'])
+            for _, row in plan.iterrows()}
+    assert rows == {('DMart', '400001'): (2, 1, 1), ('DMart', '122001'): (2, 0, 2), ('Hyperpure', ''): (2, 1, 1)}
+    assert seconds > 0
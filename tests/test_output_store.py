@@ -0,0 +1,51 @@
+"""RunStore keeping the rows of each pincode apart, and resuming them."""
+from output_store import RunStore, resumable_pairs
+from scraper import SITE_COLUMNS
+
+
+def dmart_row(term, price):
+    return {'Search Term': term, 'DMart_Title': f"{term} 1 kg", 'DMart_Price': price}
+
+
+def test_rows_are_kept_per_pincode(tmp_path):
+    store = RunStore(str(tmp_path / 'run'), ['tomato', 'onion'], SITE_COLUMNS)
+    store.append('DMart', 'tomato', [dmart_row('tomato', '₹40')], '122001')
+    store.append('DMart', 'tomato', [dmart_row('tomato', '₹35'), dmart_row('tomato', '₹60')], '400001')
+    store.append('Hyperpure', 'tomato', [{'Search Term': 'tomato', 'Hyperpure_Price': '₹30'}])
+
+    assert store.completed_terms('DMart', '122001') == {'tomato'}
+    assert store.completed_terms('DMart', '400001') == {'tomato'}
+    assert store.completed_terms('DMart') == set()
+    assert store.completed_terms('Hyperpure') == {'tomato'}
+    assert store.row_count('DMart') == 3
+    assert store.row_count('DMart', '400001') == 2
+    assert store.term_rows('DMart', 'tomato', '122001')[0]['DMart_Price'] == '₹40'
+    assert store.term_rows('DMart', 'onion', '122001') is None
+    assert [(row['Pincode'], row['DMart_Price']) for row in store.iter_rows('DMart')] == [
+        ('122001', '₹40'), ('400001', '₹35'), ('400001', '₹60')]
+    assert [row['Pincode'] for row in store.iter_rows('Hyperpure')] == ['']
+
+
+def test_a_term_scraped_again_replaces_only_its_own_pincode(tmp_path):
+    store = RunStore(str(tmp_path / 'run'), ['tomato'], SITE_COLUMNS)
+    store.append('DMart', 'tomato', [dmart_row('tomato', '₹40')], '122001')
+    store.append('DMart', 'tomato', [dmart_row('tomato', '₹35')], '400001')
+    store.append('DMart', 'tomato', [dmart_row('tomato', '₹42')], '122001')
+    assert sorted((row['Pincode'], row['DMart_Price']) for row in store.iter_rows('DMart')) == [
+        ('122001', '₹42'), ('400001', '₹35')]
+
+
+def test_resume_restores_every_pincode(tmp_path):
+    folder = str(tmp_path / 'run')
+    store = RunStore(folder, ['tomato', 'onion'], SITE_COLUMNS)
+    store.append('DMart', 'tomato', [dmart_row('tomato', '₹40')], '122001')
+    store.append('DMart', 'tomato', [dmart_row('tomato', '₹35')], '400001')
+    store.append('Hyperpure', 'tomato', [{'Search Term': 'tomato', 'Hyperpure_Price': '₹30'}])
+    assert resumable_pairs(folder, ['tomato', 'onion']) == 3
+    assert resumable_pairs(folder, ['tomato']) == 0
+
+    resumed = RunStore(folder, ['tomato', 'onion'], SITE_COLUMNS, resume=True)
+    assert resumed.completed_terms('DMart', '400001') == {'tomato'}
+    assert resumed.row_count('DMart') == 2
+    resumed.mark_finished()
+    assert resumable_pairs(folder, ['tomato', 'onion']) == 0
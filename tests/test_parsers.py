@@ -0,0 +1,60 @@
+"""The one-pass parsers against the recorded pages under fixtures/pages."""
+import os
+
+import parsers
+
+PAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'pages')
+
+
+def page(website, name):
+    with open(os.path.join(PAGES, website, f"{name}.html"), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_agmarknet_commodities_and_details():
+    html = page('agmarknet', 'tomato')
+    assert list(parsers.parse_agmarknet_commodities(html)) == ['Onion', 'Potato', 'Tomato']
+    details = parsers.parse_agmarknet_details(html)
+    assert details[0] == ['Red', '2600', '1800', '2200']
+    assert [variety for variety, *_ in details] == ['Red', 'Big', 'Desi', 'Hybrid', 'Local', 'Deshi']
+
+
+def test_bigbasket_cards_and_pack_sizes():
+    html = page('bigbasket', 'tomato')
+    cards = parsers.parse_bigbasket_cards(html)
+    assert cards[0] == {'index': 0, 'title': 'Fresho Tomato - Hybrid (Loose)', 'price': '₹32',
+                        'original_price': '₹40', 'discount': '20% OFF', 'pack_sizes': ['1 kg']}
+    assert [card['pack_sizes'] for card in cards[1:]] == [[], []]
+    assert parsers.parse_bigbasket_cards(html, limit=1) == cards[:1]
+    assert parsers.parse_bigbasket_dropdown(html) == '500 g: ₹17, 1 kg: ₹32, 2 kg: ₹62'
+
+
+def test_dmart_card_and_dropdown():
+    html = page('dmart', 'tomato')
+    assert parsers.parse_dmart_card(html) == {'title': 'Tomato Hybrid', 'mrp': '₹40', 'price': '₹29',
+                                              'offer': '₹11 OFF', 'has_dropdown': True}
+    assert parsers.parse_dmart_dropdown(html) == ['500 gm: ₹15', '1 kg: ₹29']
+
+
+def test_hyperpure_rows():
+    rows = parsers.parse_hyperpure(page('hyperpure', 'tomato'), 'tomato')
+    assert [row['Hyperpure_Product_Title'] for row in rows] == [
+        'Tomato Hybrid, 1 Kg', 'Tomato Local, 1 Kg', 'Cherry Tomato, 200 g']
+    assert rows[0]['Hyperpure_SUPERSAVER_Information'] == '₹28/kg on 5 kg+ | ₹27/kg on 10 kg+'
+    assert rows[1]['Hyperpure_SUPERSAVER_Information'] == 'N/A'
+    assert all(row['Search Term'] == 'tomato' for row in rows)
+
+
+def test_jiomart_card():
+    assert parsers.parse_jiomart_card(page('jiomart', 'tomato'), 'tomato') == {
+        'Search Term': 'tomato', 'JioMart_Title': 'Tomato Hybrid 1 kg', 'JioMart_Offer': '26% OFF',
+        'JioMart_Price': '₹31.00', 'JioMart_Real_Price': '₹42.00'}
+    assert parsers.parse_jiomart_card('<div class="plp-card-wrapper"></div>', 'tomato') is None
+
+
+def test_every_recorded_search_page_parses():
+    for term in ('tomato', 'onion'):
+        assert parsers.parse_bigbasket_cards(page('bigbasket', term))
+        assert parsers.parse_dmart_card(page('dmart', term))['title'] != 'N/A'
+        assert parsers.parse_hyperpure(page('hyperpure', term), term)
+        assert parsers.parse_jiomart_card(page('jiomart', term), term) is not None
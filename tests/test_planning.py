@@ -0,0 +1,52 @@
+"""Work items planned for several pincodes (site_searches, plan_site_tasks, store_pincode)."""
+from scraper import TermQueue, plan_site_tasks, site_searches, store_pincode
+
+
+def test_location_websites_are_searched_per_pincode():
+    searches = site_searches(['DMart', 'Hyperpure', 'JioMart'], ['tomato', 'onion', 'tomato'], ['122001', '400001'])
+    assert searches == {
+        ('DMart', '122001'): ['tomato', 'onion'],
+        ('DMart', '400001'): ['tomato', 'onion'],
+        ('Hyperpure', '122001'): ['tomato', 'onion'],
+        ('JioMart', '122001'): ['tomato', 'onion'],
+        ('JioMart', '400001'): ['tomato', 'onion'],
+    }
+
+
+def test_term_websites_and_pincodes_narrow_single_terms():
+    searches = site_searches(['DMart', 'Hyperpure'], ['tomato', 'onion', 'okra'], ['122001'],
+                             term_websites={'onion': ['Hyperpure']}, term_pincodes={'okra': ['560001']})
+    assert searches == {
+        ('DMart', '122001'): ['tomato'],
+        ('DMart', '560001'): ['okra'],
+        ('Hyperpure', '122001'): ['tomato', 'onion', 'okra'],
+    }
+
+
+def test_tasks_keep_their_pincode():
+    site_terms = {('DMart', '122001'): ['a', 'b', 'c'], ('DMart', '400001'): ['a'], ('Agmarknet', '122001'): ['a']}
+    tasks = plan_site_tasks(site_terms, shards=2)
+    assert [(website, pincode, index) for website, pincode, index, _ in tasks] == [
+        ('DMart', '122001', 0), ('DMart', '122001', 1), ('DMart', '400001', 0), ('Agmarknet', '122001', 0)]
+    assert sorted(term for _, pincode, _, terms in tasks if pincode == '122001' for term in terms) == \
+        ['a', 'a', 'b', 'c']
+
+
+def test_shared_shards_take_terms_from_one_queue():
+    tasks = plan_site_tasks({('JioMart', '122001'): ['a', 'b', 'c']}, shards=2, shared=True)
+    queues = [terms for _, _, _, terms in tasks]
+    assert len(queues) == 2 and queues[0] is queues[1] and isinstance(queues[0], TermQueue)
+    assert list(queues[0]) == ['a', 'b', 'c'] and list(queues[1]) == []
+
+
+def test_api_searches_stay_one_task_per_pincode():
+    tasks = plan_site_tasks({('DMart', '122001'): ['a', 'b'], ('DMart', '400001'): ['a', 'b']}, shards=4,
+                            use_api=True)
+    assert [(website, pincode, index) for website, pincode, index, _ in tasks] == [
+        ('DMart', '122001', 0), ('DMart', '400001', 0)]
+
+
+def test_only_location_websites_store_a_pincode():
+    assert store_pincode('DMart', '400001') == '400001'
+    assert store_pincode('JioMart', '400001') == '400001'
+    assert store_pincode('Hyperpure', '400001') == ''
@@ -0,0 +1,92 @@
+"""The price history: runs ingested once, and a term's daily trend across runs."""
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+from price_history import TREND_COLUMNS, PriceHistory
+from prices import combine_prices, normalize_prices
+
+BENCHMARK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks',
+                         'history_benchmark.py')
+
+
+def hyperpure_prices(days_ago, *title_prices, term='Tomato'):
+    scraped_at = (pd.Timestamp.now().floor('s') - pd.Timedelta(days=days_ago)).isoformat()
+    return normalize_prices('Hyperpure', [{'Search Term': term, 'Scraped At': scraped_at,
+                                           'Hyperpure_Product_Title': title, 'Hyperpure_Price': price}
+                                          for title, price in title_prices])
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = PriceHistory(str(tmp_path / 'history' / 'prices.sqlite3'))
+    yield history
+    history.close()
+
+
+def test_a_run_is_ingested_once(history):
+    prices = hyperpure_prices(0, ('Tomato Hybrid, 1 Kg', '₹30'), ('Tomato Local, 2 Kg', '₹50'))
+    assert history.ingest('run-1', prices) == 2
+    assert history.ingest('run-1', prices) == 0
+    assert history.ingest('run-2', prices) == 2
+    assert history.terms() == ['tomato']
+
+
+def test_trend_has_a_row_per_day_and_source(history):
+    history.ingest('run-1', hyperpure_prices(2, ('Tomato Hybrid, 1 Kg', '₹30'), ('Tomato Local, 2 Kg', '₹50')))
+    history.ingest('run-2', combine_prices([
+        hyperpure_prices(0, ('Tomato Hybrid, 1 Kg', '₹34')),
+        normalize_prices('DMart', [{'Search Term': 'tomato', 'DMart_Title': 'Tomato 1 kg', 'DMart_Price': '₹40',
+                                    'DMart_Dropdown_Options': ''}]),
+    ]))
+    history.ingest('run-3', hyperpure_prices(0, ('Onion, 1 Kg', '₹20'), term='Onion'))
+
+    trend = history.trend(' TOMATO ')
+    assert list(trend.columns) == TREND_COLUMNS
+    assert list(zip(trend['Source'], trend['Min Price per kg'], trend['Avg Price per kg'],
+                    trend['Max Price per kg'], trend['Products'])) == [
+        ('Hyperpure', 25.0, 27.5, 30.0, 2), ('DMart', 40.0, 40.0, 40.0, 1), ('Hyperpure', 34.0, 34.0, 34.0, 1)]
+    assert trend['Date'].is_monotonic_increasing
+
+    assert len(history.trend('tomato', days=1)) == 2
+    assert history.trend('tomato', sources=['DMart'])['Source'].tolist() == ['DMart']
+    assert history.trend('okra').empty
+
+
+def run_prices():
+    scraped_at = pd.Timestamp.now().floor('s').isoformat()
+    return combine_prices([
+        normalize_prices('DMart', [
+            {'Search Term': 'Tomato', 'Pincode': pincode, 'Scraped At': scraped_at, 'DMart_Title': 'Tomato 1 kg',
+             'DMart_Price': price, 'DMart_Dropdown_Options': ''}
+            for pincode, price in [('122001', '₹40'), ('400001', '₹35')]]),
+        normalize_prices('Hyperpure', [{'Search Term': 'Tomato', 'Pincode': '', 'Scraped At': scraped_at,
+                                        'Hyperpure_Product_Title': 'Tomato (1 kg)', 'Hyperpure_Price': '₹30'}]),
+    ])
+
+
+def test_rows_keep_their_own_pincode(history):
+    assert history.ingest('run-1', run_prices()) == 3
+    assert history.pincodes('tomato') == ['122001', '400001']
+
+    trend = history.trend('tomato')
+    assert list(zip(trend['Source'], trend['Pincode'], trend['Min Price per kg'])) == [
+        ('DMart', '122001', 40.0), ('DMart', '400001', 35.0), ('Hyperpure', '', 30.0)]
+
+
+def test_trend_for_a_pincode_keeps_location_free_websites(history):
+    history.ingest('run-1', run_prices())
+    trend = history.trend('tomato', pincode='400001')
+    assert list(zip(trend['Source'], trend['Pincode'], trend['Min Price per kg'])) == [
+        ('DMart', '400001', 35.0), ('Hyperpure', '', 30.0)]
+    assert history.trend('tomato', sources=['DMart'], pincode='560001').empty
+
+
+def test_history_benchmark_runs(capsys):
+    spec = importlib.util.spec_from_file_location('history_benchmark', BENCHMARK)
+    benchmark = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(benchmark)
+    benchmark.main(days=3, term_count=4)
+    assert 'Ingested 3 runs' in capsys.readouterr().out
@@ -0,0 +1,118 @@
+"""Typed, long-format prices built from the text the scrapers store."""
+import pandas as pd
+
+from prices import (
+    CATEGORY_COLUMNS,
+    PRICE_COLUMNS,
+    city_matrix,
+    combine_prices,
+    comparison_view,
+    normalize_batches,
+    normalize_prices,
+)
+
+BIGBASKET_ROW = {'Search Term': 'tomato', 'BigBasket_Title': 'Fresho Tomato - Hybrid (Loose)',
+                 'BigBasket_Price': '₹32', 'BigBasket_Original_Price': '₹40', 'BigBasket_Discount': '20% OFF',
+                 'BigBasket_Pack_Size': '1 kg', 'BigBasket_Dropdown_Prices': '500 g: ₹17, 1 kg: ₹32, 2 kg: ₹1,062'}
+
+
+def test_prices_are_numbers_with_a_price_per_kg():
+    prices = normalize_prices('JioMart', [{'Search Term': 'tomato', 'JioMart_Title': 'Tomato Hybrid 500 g',
+                                           'JioMart_Price': '₹1,031.50', 'JioMart_Real_Price': 'N/A',
+                                           'JioMart_Offer': '26% OFF'}])
+    assert list(prices.columns) == PRICE_COLUMNS
+    row = prices.iloc[0]
+    assert (row['Price'], row['Pack Qty'], row['Pack Unit'], row['Price per kg']) == (1031.5, 0.5, 'kg', 2063.0)
+    assert pd.isna(row['MRP'])
+    assert all(pd.api.types.is_float_dtype(prices[column]) for column in ['Pack Qty', 'Price', 'MRP', 'Price per kg'])
+
+
+def test_option_lists_become_one_row_per_pack():
+    prices = normalize_prices('BigBasket', [BIGBASKET_ROW, {**BIGBASKET_ROW, 'BigBasket_Pack_Size': '2 kg'}])
+    assert prices['Pack'].astype(object).tolist() == ['500 g', '1 kg', '2 kg']
+    assert prices['Price'].tolist() == [17.0, 32.0, 1062.0]
+    assert prices['Price per kg'].tolist() == [34.0, 32.0, 531.0]
+    # Only the pack sold at the card's price shows the card's MRP
+    assert prices['MRP'].isna().tolist() == [True, False, True]
+
+
+def test_packs_are_read_from_titles_and_default_per_website():
+    hyperpure = normalize_prices('Hyperpure', [{'Search Term': 'tomato', 'Hyperpure_Price': '₹30',
+                                                'Hyperpure_Product_Title': 'Tomato Hybrid, 2 x 500 gm'}])
+    assert (hyperpure['Pack Qty'][0], hyperpure['Price per kg'][0]) == (1.0, 30.0)
+
+    agmarknet = normalize_prices('Agmarknet', [{'Search Term': 'tomato', 'Agmarknet_Commodity': 'Tomato',
+                                                'Agmarknet_Variety': 'Hybrid', 'Agmarknet_Modal': '2,000'}])
+    assert agmarknet['Product'][0] == 'Tomato - Hybrid'
+    assert (agmarknet['Pack'][0], agmarknet['Price per kg'][0]) == ('1 quintal', 20.0)
+
+
+def test_packs_not_sold_by_weight_have_no_price_per_kg():
+    prices = normalize_prices('DMart', [{'Search Term': 'coconut', 'DMart_Title': 'Coconut 1 pc', 'DMart_Price': '₹35',
+                                         'DMart_MRP': '₹45', 'DMart_Offer': 'N/A', 'DMart_Dropdown_Options': ''}])
+    assert (prices['Pack Unit'][0], prices['Price'][0]) == ('pc', 35.0)
+    assert pd.isna(prices['Price per kg'][0]) and pd.isna(prices['Offer'][0])
+
+
+def test_no_rows_give_an_empty_typed_frame():
+    prices = normalize_prices('DMart', [])
+    assert prices.empty and list(prices.columns) == PRICE_COLUMNS
+
+
+def hyperpure_prices(term, title, price):
+    return normalize_prices('Hyperpure', [{'Search Term': term, 'Hyperpure_Product_Title': title,
+                                           'Hyperpure_Price': price}])
+
+
+def test_websites_combine_into_one_long_dataset():
+    prices = combine_prices([normalize_prices('BigBasket', [BIGBASKET_ROW]),
+                             hyperpure_prices('tomato', 'Tomato Hybrid, 1 Kg', '₹30'),
+                             normalize_prices('DMart', [])])
+    assert len(prices) == 4 and list(prices.columns) == PRICE_COLUMNS
+    assert prices['Source'].astype(object).tolist() == ['BigBasket'] * 3 + ['Hyperpure']
+    assert all(isinstance(prices[column].dtype, pd.CategoricalDtype) for column in CATEGORY_COLUMNS)
+    assert combine_prices([]).empty
+
+
+def test_comparison_view_has_each_website_cheapest_price_per_kg():
+    prices = combine_prices([normalize_prices('BigBasket', [BIGBASKET_ROW]),
+                             hyperpure_prices('tomato', 'Tomato Hybrid, 1 Kg', '₹30'),
+                             hyperpure_prices('onion', 'Onion, 5 Kg', '₹150')])
+    view = comparison_view(prices)
+    assert list(view.columns) == ['Search Term', 'BigBasket Price per kg', 'BigBasket Product',
+                                  'Hyperpure Price per kg', 'Hyperpure Product']
+    rows = view.set_index('Search Term')
+    assert rows.loc['tomato', 'BigBasket Price per kg'] == 32.0
+    assert rows.loc['tomato', 'Hyperpure Product'] == 'Tomato Hybrid, 1 Kg'
+    assert rows.loc['onion', 'Hyperpure Price per kg'] == 30.0
+    assert pd.isna(rows.loc['onion', 'BigBasket Price per kg'])
+
+
+def dmart_rows(term, pincode, price):
+    return [{'Search Term': term, 'Pincode': pincode, 'DMart_Title': f"{term} 1 kg", 'DMart_Price': price,
+             'DMart_MRP': '₹80', 'DMart_Offer': 'N/A', 'DMart_Dropdown_Options': ''}]
+
+
+def test_prices_keep_their_pincode():
+    prices = normalize_prices('DMart', dmart_rows('tomato', '122001', '₹40') + dmart_rows('tomato', '400001', '₹35'))
+    assert list(prices['Pincode'].astype(object)) == ['122001', '400001']
+    assert list(prices['Price per kg']) == [40.0, 35.0]
+
+
+def test_batches_match_one_pass():
+    rows = [row for index in range(30) for pincode in ['122001', '400001']
+            for row in dmart_rows(f"term {index}", pincode, f"₹{index + 10}")]
+    batched = normalize_batches('DMart', iter(rows), batch_rows=7)
+    pd.testing.assert_frame_equal(batched, normalize_prices('DMart', rows))
+    assert normalize_batches('DMart', iter([])).empty
+
+
+def test_city_matrix_has_a_column_per_website_and_pincode():
+    prices = combine_prices([
+        normalize_prices('DMart', dmart_rows('tomato', '122001', '₹40') + dmart_rows('tomato', '400001', '₹35')),
+        normalize_prices('Hyperpure', [{'Search Term': 'tomato', 'Pincode': '',
+                                        'Hyperpure_Product_Title': 'Tomato (1 kg)', 'Hyperpure_Price': '₹30'}]),
+    ])
+    matrix = city_matrix(prices)
+    assert list(matrix.columns) == ['Search Term', 'DMart 122001', 'DMart 400001', 'Hyperpure']
+    assert matrix.iloc[0].tolist() == ['tomato', 40.0, 35.0, 30.0]
@@ -0,0 +1,44 @@
+"""MatchIndex: linking website product titles to the Master_List vegetables."""
+import pandas as pd
+
+from prices import normalize_prices
+from product_matching import MIN_MATCH_SCORE, MatchIndex, normalize_names, with_vegetables
+
+TERMS = ['Tomato', 'Tomato Hybrid', 'Onion', 'Lady Finger', 'Potato']
+
+
+def test_names_drop_packs_noise_and_hindi_names():
+    names = normalize_names(pd.Series(['Fresho Tomato - Hybrid, 1 kg', 'Tamatar Desi 500 g',
+                                       'Organic Onions (Loose)', 'Bhindi']))
+    assert names.tolist() == ['tomato hybrid', 'tomato desi', 'organic onion', 'lady finger']
+
+
+def test_titles_match_the_closest_term():
+    matches = MatchIndex(TERMS).match(['Fresho Tomato - Hybrid, 1 kg', 'Tamatar Desi 500 g',
+                                       'Organic Onions (Loose)', 'Bhindi', 'Dish soap 1 l'])
+    assert matches['Vegetable'].tolist()[:4] == ['Tomato Hybrid', 'Tomato', 'Onion', 'Lady Finger']
+    assert pd.isna(matches['Vegetable'][4]) and matches['Match Score'][4] < MIN_MATCH_SCORE
+    assert matches['Match Score'][0] == 1.0
+    assert (matches['Match Score'][:4] >= MIN_MATCH_SCORE).all()
+
+
+def test_repeated_and_missing_titles():
+    titles = pd.Series(['Onion 1 kg', None, 'Onion 1 kg'], index=[10, 20, 30])
+    matches = MatchIndex(TERMS).match(titles)
+    assert list(matches.index) == [10, 20, 30]
+    assert matches['Vegetable'][10] == matches['Vegetable'][30] == 'Onion'
+    assert pd.isna(matches['Vegetable'][20]) and matches['Match Score'][20] == 0.0
+
+
+def test_no_terms_match_nothing():
+    matches = MatchIndex(['', None]).match(['Tomato 1 kg'])
+    assert pd.isna(matches['Vegetable'][0]) and matches['Match Score'][0] == 0.0
+
+
+def test_prices_get_their_vegetable_after_the_product():
+    prices = normalize_prices('Hyperpure', [{'Search Term': 'Tomato', 'Hyperpure_Product_Title': 'Tomato Local, 1 Kg',
+                                             'Hyperpure_Price': '₹26'}])
+    linked = with_vegetables(prices, TERMS)
+    columns = list(linked.columns)
+    assert columns[columns.index('Product') + 1:columns.index('Product') + 3] == ['Vegetable', 'Match Score']
+    assert linked['Vegetable'][0] == 'Tomato'
@@ -0,0 +1,100 @@
+"""SiteLimiter: token-bucket pacing, the browser cap and their AIMD adaptation."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import rate_limiter
+from jobs import ScrapeCancelled, ScrapeJob
+from rate_limiter import RateLimiter, SiteLimiter, blocked_marker
+
+
+def limiter(**limits):
+    return SiteLimiter('DMart', **{'rate': 1.0, 'min_rate': 0.1, 'max_rate': 5.0, 'burst': 3, **limits})
+
+
+def test_healthy_searches_raise_the_rate_and_let_browsers_back_in():
+    site = limiter(max_rate=1.25)
+    site.start_run(3)
+    site.back_off("timed out")
+    assert site.worker_limit == 1
+    for _ in range(rate_limiter.SUCCESSES_PER_WORKER):
+        site.succeeded()
+    assert site.worker_limit == 2
+    assert site.rate == pytest.approx(0.5 + rate_limiter.SUCCESSES_PER_WORKER * rate_limiter.RATE_INCREASE)
+    for _ in range(3 * rate_limiter.SUCCESSES_PER_WORKER):
+        site.succeeded()
+    assert (site.worker_limit, site.rate) == (3, 1.25)
+
+
+def test_pushback_halves_rate_and_browsers_down_to_their_floor():
+    site = limiter(rate=0.3, min_rate=0.1)
+    site.start_run(4)
+    site.back_off("'captcha' page")
+    assert (site.rate, site.worker_limit, site.backoffs) == (0.15, 2, 1)
+    site.back_off("timed out")
+    site.back_off("timed out")
+    assert (site.rate, site.worker_limit) == (0.1, 1)
+    assert site.stats()['Backoffs'] == 3
+
+
+def test_pace_spends_the_burst_then_waits_for_tokens():
+    site = limiter(rate=20.0, burst=2)
+    assert site.pace() == pytest.approx(0, abs=0.01)
+    assert site.pace() == pytest.approx(0, abs=0.01)
+    assert site.pace() == pytest.approx(1 / 20.0, abs=0.03)
+    assert site.stats()['Searches'] == 3
+
+
+def test_pace_waits_out_the_cooldown(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'COOLDOWN_SECONDS', 0.2)
+    site = limiter(rate=100.0, burst=5)
+    site.back_off("timed out")
+    assert site.pace() >= 0.19
+    assert asyncio.run(site.pace_async()) < 0.1
+
+
+def test_browser_cap_holds_back_the_next_worker():
+    site = limiter()
+    site.start_run(1)
+    entered = threading.Event()
+
+    def second():
+        with site.worker():
+            entered.set()
+
+    with site.worker():
+        thread = threading.Thread(target=second)
+        thread.start()
+        assert not entered.wait(0.2)
+    assert entered.wait(2)
+    thread.join()
+
+
+def test_stop_interrupts_pacing():
+    site = limiter(rate=0.1, burst=1)
+    site.pace()
+
+    def target(job):
+        job.stop()
+        with pytest.raises(ScrapeCancelled):
+            site.pace()
+        with pytest.raises(ScrapeCancelled):
+            asyncio.run(site.pace_async())
+
+    start = time.monotonic()
+    ScrapeJob(target).run()
+    assert time.monotonic() - start < 2
+
+
+def test_each_website_has_its_own_limiter():
+    limits = RateLimiter()
+    assert limits.site('DMart') is limits.site('DMart')
+    limits.start_run({'DMart': 4, 'JioMart': 2})
+    assert {row['Website']: row['Browsers'] for row in limits.report()} == {'DMart': 4, 'JioMart': 2}
+
+
+def test_blocked_pages_are_recognised():
+    assert blocked_marker("Access Denied\nYou don't have permission") == 'access denied'
+    assert blocked_marker("Tomato Hybrid 1 kg ₹31.00") is None
@@ -0,0 +1,75 @@
+"""ResultCache: freshness per website, eviction of the oldest entries and pincode keys."""
+import pytest
+
+import result_cache
+from result_cache import ResultCache
+
+ROWS = [{'Search Term': 'tomato', 'DMart_Title': 'Tomato 1 kg', 'DMart_Price': '₹40'}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = ResultCache(str(tmp_path / 'cache' / 'results.sqlite3'), ttl_hours={'DMart': 1, 'Agmarknet': 2})
+    yield cache
+    cache.close()
+
+
+def test_rows_are_returned_for_the_term_as_searched(cache):
+    cache.put('DMart', 'tomato', ROWS, '122001')
+    assert cache.get('DMart', ' Tomato ', '122001') == [{**ROWS[0], 'Search Term': ' Tomato '}]
+    assert cache.report() == {'DMart': {'Hits': 1, 'Misses': 0}}
+
+
+def test_rows_expire_after_the_website_ttl(cache, clock):
+    cache.put('DMart', 'tomato', ROWS, '122001')
+    cache.put('Agmarknet', 'tomato', ROWS)
+    clock.now += 1.5 * 3600
+    assert cache.get('DMart', 'tomato', '122001') is None
+    assert cache.get('Agmarknet', 'tomato') is not None
+    assert cache.report() == {'DMart': {'Hits': 0, 'Misses': 1}, 'Agmarknet': {'Hits': 1, 'Misses': 0}}
+
+
+def test_each_pincode_has_its_own_entry(cache):
+    cache.put('DMart', 'tomato', ROWS, '122001')
+    assert cache.get('DMart', 'tomato', '400001') is None
+    assert cache.get('DMart', 'tomato') is None
+    cache.put('DMart', 'tomato', [{**ROWS[0], 'DMart_Price': '₹35'}], '400001')
+    assert cache.get('DMart', 'tomato', '122001')[0]['DMart_Price'] == '₹40'
+    assert cache.get('DMart', 'tomato', '400001')[0]['DMart_Price'] == '₹35'
+
+
+def test_oldest_entries_are_evicted_past_max_entries(tmp_path, clock):
+    cache = ResultCache(str(tmp_path / 'results.sqlite3'), max_entries=2)
+    try:
+        for term in ('tomato', 'onion', 'okra'):
+            cache.put('BigBasket', term, ROWS)
+            clock.now += 60
+        assert cache.get('BigBasket', 'tomato') is None
+        assert cache.get('BigBasket', 'onion') is not None
+        assert cache.get('BigBasket', 'okra') is not None
+    finally:
+        cache.close()
+
+
+def test_entries_past_every_ttl_are_dropped_on_the_next_write(cache, clock):
+    cache.put('Agmarknet', 'tomato', ROWS)
+    # Longer than the longest TTL, the 6 hours of the websites left at their default
+    clock.now += 7 * 3600
+    cache.put('Agmarknet', 'onion', ROWS)
+    (count,) = cache._connection.execute("SELECT COUNT(*) FROM results").fetchone()
+    assert count == 1
@@ -0,0 +1,91 @@
+"""RunReport: per-term tallies, per-website totals and the CSV and JSON exports."""
+import asyncio
+import csv
+import json
+import threading
+
+from run_report import TERM_COLUMNS, RunReport, describe
+
+
+def test_terms_are_tallied_per_step_and_closed_with_their_status():
+    report = RunReport()
+    report.begin()
+    report.add('Page Load', 1.5)
+    report.add('Waits', 0.25)
+    report.retry('DMart', 'tomato', TimeoutError("slow"))
+    report.finished('DMart', 'tomato', 3)
+    report.add('Page Load', 0.5)
+    report.failed('DMart', 'onion', "No product card")
+    report.cached('DMart', 'okra', 2)
+
+    done, failed, cached = report.term_rows()
+    assert (done['Status'], done['Rows'], done['Retries']) == ('done', 3, 1)
+    assert (done['Page Load (s)'], done['Waits (s)']) == (1.5, 0.25)
+    # The next term's tally starts empty
+    assert (failed['Status'], failed['Retries'], failed['Page Load (s)']) == ('failed', 0, 0.5)
+    assert failed['Error'] == 'No product card'
+    assert (cached['Status'], cached['Rows'], cached['Page Load (s)']) == ('cached', 2, 0.0)
+
+    site, = report.site_rows()
+    assert (site['Terms'], site['Failed'], site['Cached'], site['Retries'], site['Rows']) == (3, 1, 1, 1, 5)
+    assert site['Page Load (s)'] == 2.0
+    assert [failure['Retried'] for failure in report.failures] == [True, False]
+
+
+def test_each_thread_and_task_keeps_its_own_tally():
+    report = RunReport()
+
+    def scrape(term, seconds):
+        report.begin()
+        report.add('Extract', seconds)
+        report.finished('JioMart', term, 1)
+
+    threads = [threading.Thread(target=scrape, args=(term, seconds)) for term, seconds in (('a', 1.0), ('b', 2.0))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    async def tasks():
+        async def scrape_async(term, seconds):
+            scrape(term, seconds)
+        await asyncio.gather(scrape_async('c', 3.0), scrape_async('d', 4.0))
+    asyncio.run(tasks())
+
+    assert {row['Search Term']: row['Extract (s)'] for row in report.term_rows()} == {
+        'a': 1.0, 'b': 2.0, 'c': 3.0, 'd': 4.0}
+
+
+def test_step_counts_the_time_inside_the_block():
+    report = RunReport()
+    report.begin()
+    with report.step('Write'):
+        pass
+    report.finished('Hyperpure', 'tomato', 1)
+    row, = report.term_rows()
+    assert 0 <= row['Write (s)'] <= row['Total (s)']
+
+
+def test_failure_reasons_drop_selenium_stack_traces():
+    assert describe(ValueError("Element not found\nStacktrace:\n#0 0x55d")) == "ValueError: Element not found"
+    assert describe(TimeoutError()) == 'TimeoutError'
+    assert describe("  plain   reason ") == 'plain reason'
+
+
+def test_exports_hold_every_term_and_failure(tmp_path):
+    report = RunReport()
+    report.begin()
+    report.finished('BigBasket', 'tomato', 4)
+    report.failed('BigBasket', 'onion', ValueError("captcha"))
+
+    with open(report.write_csv(str(tmp_path / 'terms.csv')), newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        assert reader.fieldnames == TERM_COLUMNS
+        assert [(row['Search Term'], row['Status']) for row in reader] == [('tomato', 'done'), ('onion', 'failed')]
+
+    with open(report.write_json(str(tmp_path / 'report.json'), engine='selenium'), encoding='utf-8') as f:
+        exported = json.load(f)
+    assert exported['engine'] == 'selenium'
+    assert exported['websites'][0]['Terms'] == 2
+    assert [term['Search Term'] for term in exported['terms']] == ['tomato', 'onion']
+    assert exported['failures'][0]['Reason'] == 'ValueError: captcha'
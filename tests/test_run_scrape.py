@@ -0,0 +1,74 @@
+"""A run over two pincodes with the websites' scrapers replaced by the fixture pages."""
+import contextlib
+import os
+import sqlite3
+
+import pandas as pd
+
+import jobs
+import parsers
+import scraper
+
+PAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'pages')
+PINCODE_PRICES = {'122001': '₹40', '400001': '₹35'}
+
+
+def fixture_page(website, term):
+    with open(os.path.join(PAGES, website, f"{term}.html"), encoding='utf-8') as f:
+        return f.read()
+
+
+class FakeDriver:
+    def execute_script(self, script, *args):
+        return 1
+
+    def execute_cdp_cmd(self, *args):
+        pass
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        pass
+
+
+async def scrape_dmart(page, search_terms, store, pincode=scraper.DELIVERY_PINCODE):
+    return sum(store.append('DMart', term, [{'Search Term': term, 'DMart_Title': f"{term} 1 kg",
+                                             'DMart_Price': PINCODE_PRICES[pincode]}])
+               for term in search_terms)
+
+
+async def scrape_hyperpure(page, search_terms, store):
+    return sum(store.append('Hyperpure', term, parsers.parse_hyperpure(fixture_page('hyperpure', term), term))
+               for term in search_terms)
+
+
+def test_run_prices_every_pincode(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper.DriverPool, '_start_driver', lambda pool: FakeDriver())
+    monkeypatch.setattr(scraper, 'cache_path', str(tmp_path / 'cache' / 'results.sqlite3'))
+    monkeypatch.setattr(scraper, 'history_path', str(tmp_path / 'history' / 'prices.sqlite3'))
+    monkeypatch.setattr(scraper, 'sessions_path', str(tmp_path / 'sessions' / 'locations.sqlite3'))
+    monkeypatch.setitem(scraper.SITE_SCRAPERS, 'DMart', scrape_dmart)
+    monkeypatch.setitem(scraper.SITE_SCRAPERS, 'Hyperpure', scrape_hyperpure)
+
+    output = tmp_path / 'output'
+    job = jobs.ScrapeJob(scraper.run_scrape, ['DMart', 'Hyperpure'], ['tomato', 'onion'], 2, force_refresh=True,
+                         pincodes=['122001', '400001'], output_dir=str(output), chunks_dir=str(output / 'chunks'))
+    job.run()
+    assert job.state == 'finished', job.error
+
+    sheets = pd.read_excel(output / 'master_output_for_all.xlsx', sheet_name=None, dtype={'Pincode': str})
+    assert 'City Matrix' in sheets
+    dmart = sheets['Prices'][sheets['Prices']['Source'] == 'DMart']
+    assert sorted(zip(dmart['Pincode'], dmart['Price per kg'])) == [
+        ('122001', 40.0), ('122001', 40.0), ('400001', 35.0), ('400001', 35.0)]
+    assert sheets['Prices'][sheets['Prices']['Source'] == 'Hyperpure']['Pincode'].isna().all()
+
+    with contextlib.closing(sqlite3.connect(scraper.history_path)) as history:
+        assert sorted(history.execute("SELECT source, pincode, COUNT(*) FROM prices "
+                                      "GROUP BY source, pincode").fetchall()) == [
+            ('DMart', '122001', 2), ('DMart', '400001', 2), ('Hyperpure', '', 6)]
+    with contextlib.closing(sqlite3.connect(scraper.cache_path)) as cache:
+        assert sorted(cache.execute("SELECT website, pincode FROM results").fetchall()) == [
+            ('DMart', '122001'), ('DMart', '122001'), ('DMart', '400001'), ('DMart', '400001'),
+            ('Hyperpure', ''), ('Hyperpure', '')]
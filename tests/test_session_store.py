@@ -0,0 +1,105 @@
+"""Saved delivery-location sessions, keyed by website, host and pincode, and loaded back into a page."""
+import asyncio
+
+import pytest
+
+import scraper
+from http_backend import usable_cookies
+from session_store import SessionStore, devtools_cookie, webdriver_cookie
+
+STORE_COOKIE = {'name': 'storeId', 'value': '10151', 'domain': '.dmart.in', 'path': '/', 'secure': True}
+
+
+def test_sessions_are_kept_per_host_and_pincode(tmp_path):
+    sessions = SessionStore(str(tmp_path / 'locations.sqlite3'))
+    try:
+        sessions.put('DMart', 'www.dmart.in', '122001', [STORE_COOKIE], {'pincode': '122001'}, 'agent')
+        saved = sessions.get('DMart', 'www.dmart.in', '122001')
+        assert saved == {'cookies': [STORE_COOKIE], 'local_storage': {'pincode': '122001'}, 'user_agent': 'agent'}
+        assert sessions.get('DMart', '127.0.0.1:8000', '122001') is None
+        assert sessions.get('DMart', 'www.dmart.in', '400001') is None
+
+        sessions.discard('DMart', 'www.dmart.in', '122001')
+        assert sessions.get('DMart', 'www.dmart.in', '122001') is None
+    finally:
+        sessions.close()
+
+
+def test_expired_sessions_are_not_returned(tmp_path):
+    sessions = SessionStore(str(tmp_path / 'locations.sqlite3'), max_age_hours=0)
+    try:
+        sessions.put('DMart', 'www.dmart.in', '122001', [STORE_COOKIE])
+        assert sessions.get('DMart', 'www.dmart.in', '122001') is None
+    finally:
+        sessions.close()
+
+
+def test_api_only_uses_cookies_of_its_site_with_the_store():
+    assert usable_cookies('DMart', [STORE_COOKIE])
+    assert not usable_cookies('DMart', [{**STORE_COOKIE, 'domain': '127.0.0.1'}])
+    assert not usable_cookies('DMart', [{**STORE_COOKIE, 'name': 'session'}])
+
+
+def test_cookies_convert_between_webdriver_and_devtools():
+    saved = {**STORE_COOKIE, 'expiry': 1900000000}
+    assert devtools_cookie(saved)['expires'] == 1900000000 and 'expiry' not in devtools_cookie(saved)
+    assert webdriver_cookie(devtools_cookie(saved)) == saved
+    # DevTools session cookies have no expiry in the WebDriver format
+    assert 'expiry' not in webdriver_cookie({**STORE_COOKIE, 'expires': -1, 'size': 12})
+
+
+class FakePage:
+    def __init__(self, accepted):
+        self.accepted = accepted
+        self.cookies_set = []
+        self.cookies_deleted = []
+        self.storage = {}
+        self.urls = []
+
+    async def goto(self, url):
+        self.urls.append(url)
+
+    async def evaluate(self, expression):
+        if expression == 'window.localStorage.clear()':
+            self.storage.clear()
+        return True
+
+    async def call(self, function, *args):
+        if scraper.RESTORE_STORAGE_SCRIPT in function:
+            self.storage.update(args[0])
+        return self.accepted
+
+    async def set_cookies(self, cookies):
+        self.cookies_set.extend(cookies)
+
+    async def delete_cookies(self, cookies):
+        self.cookies_deleted.extend(cookies)
+
+    async def pace(self, website):
+        return 0.0
+
+
+@pytest.fixture
+def saved_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, 'sessions_path', str(tmp_path / 'sessions' / 'locations.sqlite3'))
+    monkeypatch.setitem(scraper.WAIT_PROFILES, 'DMart', {'timeout': 0.2, 'poll': 0.01, 'settle': 0})
+    monkeypatch.setattr(scraper, 'LOCATION_CHECK_TIMEOUT', 0.05)
+    sessions = scraper.location_sessions()
+    sessions.put('DMart', scraper.site_host('DMart'), '122001', [STORE_COOKIE], {'pincode': '122001'}, 'agent')
+    return sessions
+
+
+def test_saved_session_is_loaded_into_the_page(saved_session):
+    page = FakePage(accepted=True)
+    assert asyncio.run(scraper.restore_location_session(page, 'DMart', '122001'))
+    assert page.cookies_set == [devtools_cookie(STORE_COOKIE)]
+    assert page.storage == {'pincode': '122001'}
+    assert page.urls == [scraper.site_url('DMart')] * 2
+
+
+def test_session_the_website_rejects_is_discarded(saved_session):
+    page = FakePage(accepted=False)
+    assert not asyncio.run(scraper.restore_location_session(page, 'DMart', '122001'))
+    assert page.cookies_deleted == page.cookies_set and page.storage == {}
+    assert saved_session.get('DMart', scraper.site_host('DMart'), '122001') is None
+    assert not asyncio.run(scraper.restore_location_session(FakePage(accepted=True), 'DMart', '122001'))